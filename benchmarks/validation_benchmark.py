@@ -0,0 +1,139 @@
+"""
+Validation throughput on large World Bank and nested payloads
+
+Compares the per-tool recursive validators the tools used to carry with
+the shared engine in src/tools/validation.py and the bulk column path.
+
+    python -m benchmarks.validation_benchmark [--records 200000]
+"""
+import argparse
+import random
+import time
+from src.tools.validation import ValidationReport, validate_frame, validate_payload
+from src.utils.indicator_frame import from_unicef, from_worldbank
+
+TOPICS = {
+    "education": "SE.PRM.ENRR",
+    "health": "SH.STA.MMRT",
+    "poverty": "SI.POV.NAHC",
+    "sanitation": "SH.STA.BASS.ZS",
+    "nutrition": "SH.STA.STNT.ZS"
+}
+
+class LegacyValidator:
+    """The recursive validator that was copy-pasted into each tool"""
+
+    def validate_data(self, data):
+        validated_data = {}
+        for topic, topic_data in data.items():
+            if "error" in topic_data:
+                continue
+            if isinstance(topic_data, list):
+                validated_data[topic] = [
+                    item for item in topic_data
+                    if self._validate_worldbank_item(item)
+                ]
+            else:
+                validated_data[topic] = {
+                    k: v for k, v in topic_data.items()
+                    if v is not None and self._validate_data_point(k, v)
+                }
+        return validated_data
+
+    def _validate_worldbank_item(self, item):
+        required_fields = ['indicator', 'country', 'value', 'date']
+        try:
+            return all(
+                field in item and item[field] is not None
+                for field in required_fields
+            )
+        except Exception:
+            return False
+
+    def _validate_data_point(self, key, value):
+        try:
+            if isinstance(value, (int, float)):
+                return True
+            elif isinstance(value, str):
+                return bool(value.strip())
+            elif isinstance(value, dict):
+                return all(self._validate_data_point(k, v) for k, v in value.items())
+            elif isinstance(value, list):
+                return all(self._validate_data_point(str(i), v) for i, v in enumerate(value))
+            return False
+        except Exception:
+            return False
+
+def worldbank_payload(records: int) -> dict:
+    """World Bank style {topic: [items]} with ~15% null values"""
+    rng = random.Random(42)
+    per_topic = records // len(TOPICS)
+    payload = {}
+    for topic, code in TOPICS.items():
+        items = []
+        for i in range(per_topic):
+            items.append({
+                "indicator": {"id": code, "value": topic},
+                "country": {"id": "GH", "value": "Ghana"},
+                "countryiso3code": "GHA",
+                "date": str(1960 + i % 64),
+                "value": None if rng.random() < 0.15 else rng.uniform(0, 100),
+                "unit": "",
+                "obs_status": "",
+                "decimal": 1
+            })
+        payload[topic] = items
+    return payload
+
+def nested_payload(records: int) -> dict:
+    """UNICEF style {topic: {indicator: {year: value}}}"""
+    rng = random.Random(7)
+    indicators = max(1, records // (len(TOPICS) * 64))
+    return {
+        topic: {
+            f"{topic}_indicator_{n}": {str(1960 + y): rng.uniform(0, 100) for y in range(64)}
+            for n in range(indicators)
+        }
+        for topic in TOPICS
+    }
+
+def timed(label: str, records: int, fn, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    print(f"  {label:<34} {best * 1000:9.1f} ms  {records / best / 1e6:7.2f} M records/s")
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--records', type=int, default=200000)
+    args = parser.parse_args()
+
+    legacy = LegacyValidator()
+
+    payload = worldbank_payload(args.records)
+    print(f"World Bank payload, {args.records} records")
+    baseline = timed("legacy per-item validator", args.records, lambda: legacy.validate_data(payload))
+    engine = timed("shared engine", args.records, lambda: validate_payload(payload, ValidationReport()))
+    frame = from_worldbank(payload)
+    columns = timed("bulk columns (pre-normalized)", args.records,
+                    lambda: validate_frame(frame, ValidationReport()))
+    print(f"  speedup: engine {baseline / engine:.1f}x, columns {baseline / columns:.1f}x")
+
+    report = ValidationReport()
+    validate_payload(payload, report)
+    print(f"  rejections: {dict(report.rejections)}")
+
+    payload = nested_payload(args.records)
+    print(f"Nested payload, {args.records} year values")
+    baseline = timed("legacy recursive validator", args.records, lambda: legacy.validate_data(payload))
+    engine = timed("shared engine", args.records, lambda: validate_payload(payload, ValidationReport()))
+    frame = from_unicef(payload)
+    columns = timed("bulk columns (pre-normalized)", args.records,
+                    lambda: validate_frame(frame, ValidationReport()))
+    print(f"  speedup: engine {baseline / engine:.1f}x, columns {baseline / columns:.1f}x")
+
+if __name__ == '__main__':
+    main()
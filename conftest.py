@@ -23,7 +23,10 @@ def app():
         'TESTING': True,
         'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
         'SECRET_KEY': 'test-key',
-        'LOGIN_DISABLED': True  # Disable login requirement for some tests
+        'LOGIN_DISABLED': True,  # Disable login requirement for some tests
+        'FETCH_CACHE_PATH': ':memory:',
+        'LLM_CACHE_PATH': ':memory:',
+        'PROGRESS_PATH': ':memory:'
     })
     
     with app.app_context():
@@ -220,13 +223,13 @@ def mock_gemini_service(monkeypatch):
     }
 
     class MockGeminiService:
-        async def analyze_data(self, data):
+        async def analyze_data(self, data, use_cache=True):
             return mock_analysis_result
 
-        async def generate_policy_brief(self, analysis):
+        async def generate_policy_brief(self, analysis, use_cache=True):
             return mock_policy_result
 
-        async def process_complete_pipeline(self, data):
+        async def process_complete_pipeline(self, data, use_cache=True):
             return {
                 "analysis": mock_analysis_result,
                 "policy_brief": mock_policy_result
@@ -236,7 +239,7 @@ def mock_gemini_service(monkeypatch):
     from src.chains import analysis_chain, policy_chain
 
     class MockAnalysisChain:
-        async def analyze(self, data):
+        async def analyze(self, data, use_cache=True):
             return mock_analysis_result
 
         def get_prompt(self):
@@ -246,7 +249,7 @@ def mock_gemini_service(monkeypatch):
             pass
 
     class MockPolicyChain:
-        async def generate(self, analysis):
+        async def generate(self, analysis, use_cache=True):
             return mock_policy_result
 
         def get_prompt(self):
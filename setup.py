@@ -14,6 +14,7 @@ setup(
         'python-dotenv==1.0.0',
         'requests==2.31.0',
         'pydantic==2.5.2',
+        'numpy==1.26.4',
         'flask-limiter==3.5.0',
         'bcrypt==4.0.1',
         'pytest==8.0.0',
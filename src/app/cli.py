@@ -0,0 +1,57 @@
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from src.services.ingest_service import IngestService
+
+ingest_cli = AppGroup('ingest', help='Bulk-load offline World Bank, WHO and UNICEF exports into the observation store.')
+
+def _ingest_options(command):
+    """Options shared by every ingest command"""
+    options = [
+        click.argument('path', type=click.Path(exists=True, dir_okay=False)),
+        click.option('--indicator', 'indicators', multiple=True,
+                     help='Indicator code to load (repeatable). Defaults to the codes the tool maps to topics.'),
+        click.option('--country', 'countries', multiple=True,
+                     help='Country or region code to load (repeatable). Defaults to all.'),
+        click.option('--all-indicators', is_flag=True, help='Load every indicator in the file.'),
+        click.option('--batch-size', type=int, default=None,
+                     help='Observations per committed batch (default: INGEST_BATCH_SIZE).'),
+        click.option('--restart', is_flag=True, help='Ignore saved progress and start from the first row.')
+    ]
+    for option in reversed(options):
+        command = option(command)
+    return command
+
+def _run(method: str, path: str, batch_size, restart: bool, **kwargs) -> None:
+    service = IngestService(batch_size or current_app.config.get('INGEST_BATCH_SIZE', 5000))
+
+    def report(stats):
+        click.echo(f"  committed batch {stats['batches']}: "
+                   f"{stats['rows_read']} rows, {stats['observations']} observations")
+
+    stats = getattr(service, method)(path, resume=not restart, on_batch=report, **kwargs)
+    if stats['resumed_from']:
+        click.echo(f"Resumed after row {stats['resumed_from']}")
+    click.echo(f"Loaded {stats['observations']} {stats['source']} observations "
+               f"from {stats['rows_read']} rows in {stats['batches']} batches")
+
+@ingest_cli.command('worldbank')
+@_ingest_options
+def ingest_worldbank(path, indicators, countries, all_indicators, batch_size, restart):
+    """Load a World Bank WDI bulk CSV (WDICSV.csv or API_*.csv)."""
+    _run('ingest_worldbank', path, batch_size, restart,
+         indicators=indicators, countries=countries, all_indicators=all_indicators)
+
+@ingest_cli.command('who')
+@_ingest_options
+def ingest_who(path, indicators, countries, all_indicators, batch_size, restart):
+    """Load a WHO Global Health Observatory CSV export."""
+    _run('ingest_who', path, batch_size, restart,
+         indicators=indicators, countries=countries, all_indicators=all_indicators)
+
+@ingest_cli.command('unicef')
+@_ingest_options
+def ingest_unicef(path, indicators, countries, all_indicators, batch_size, restart):
+    """Load a UNICEF Data Warehouse SDMX-CSV export."""
+    _run('ingest_unicef', path, batch_size, restart,
+         indicators=indicators, countries=countries, all_indicators=all_indicators)
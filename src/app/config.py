@@ -15,6 +15,83 @@ class Config:
     # Session
     PERMANENT_SESSION_LIFETIME = timedelta(days=1)
     
+    # Data fetching
+    DATA_FETCH_PARALLEL = os.getenv('DATA_FETCH_PARALLEL', 'True').lower() == 'true'
+    DATA_FETCH_MAX_WORKERS = int(os.getenv('DATA_FETCH_MAX_WORKERS', '8'))
+    SOURCE_FETCH_TIMEOUT = float(os.getenv('SOURCE_FETCH_TIMEOUT', '45'))
+    
+    # Fetch cache (FETCH_CACHE_PATH defaults to <instance>/fetch_cache.db)
+    FETCH_CACHE_ENABLED = os.getenv('FETCH_CACHE_ENABLED', 'True').lower() == 'true'
+    FETCH_CACHE_PATH = os.getenv('FETCH_CACHE_PATH')
+    FETCH_CACHE_TTL = int(os.getenv('FETCH_CACHE_TTL', '21600'))
+    FETCH_CACHE_MAX_ENTRIES = int(os.getenv('FETCH_CACHE_MAX_ENTRIES', '1024'))
+    # Expired entries are kept this long to fall back on when a source is down
+    FETCH_CACHE_MAX_STALE = int(os.getenv('FETCH_CACHE_MAX_STALE', '604800'))
+    # Serve expired entries younger than the window at once, refreshing them in the background
+    FETCH_SWR_ENABLED = os.getenv('FETCH_SWR_ENABLED', 'True').lower() == 'true'
+    FETCH_SWR_WINDOW = int(os.getenv('FETCH_SWR_WINDOW', '86400'))
+    
+    # Local observation store
+    OBSERVATION_STORE_ENABLED = os.getenv('OBSERVATION_STORE_ENABLED', 'True').lower() == 'true'
+    OBSERVATION_MAX_AGE = int(os.getenv('OBSERVATION_MAX_AGE', '604800'))
+    # Answer World Bank, WHO and UNICEF queries from the store only (see `flask ingest`)
+    DATA_OFFLINE = os.getenv('DATA_OFFLINE', 'False').lower() == 'true'
+    INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', '5000'))
+    # UNICEF and WHO answer from built-in sample series until API access is set up
+    SOURCE_MOCK_DATA = os.getenv('SOURCE_MOCK_DATA', 'True').lower() == 'true'
+    
+    # LLM response cache (LLM_CACHE_PATH defaults to <instance>/llm_cache.db)
+    LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'True').lower() == 'true'
+    LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH')
+    LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', '604800'))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '256'))
+    LLM_CACHE_MAX_DISK_ENTRIES = int(os.getenv('LLM_CACHE_MAX_DISK_ENTRIES', '5000'))
+    
+    # Analysis job queue: create_analysis answers 202 and worker threads run the pipeline
+    ANALYSIS_QUEUE_ENABLED = os.getenv('ANALYSIS_QUEUE_ENABLED', 'True').lower() == 'true'
+    ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', '2'))
+    ANALYSIS_POLL_INTERVAL = float(os.getenv('ANALYSIS_POLL_INTERVAL', '5'))
+    # Running jobs without a heartbeat for this long are requeued, up to the attempt limit
+    ANALYSIS_JOB_TIMEOUT = int(os.getenv('ANALYSIS_JOB_TIMEOUT', '600'))
+    ANALYSIS_JOB_MAX_ATTEMPTS = int(os.getenv('ANALYSIS_JOB_MAX_ATTEMPTS', '2'))
+    
+    # Progress events for SSE streams (PROGRESS_PATH defaults to <instance>/progress.db;
+    # the file lets streams follow pipelines running in other processes)
+    PROGRESS_PATH = os.getenv('PROGRESS_PATH')
+    PROGRESS_RETENTION = int(os.getenv('PROGRESS_RETENTION', '3600'))
+    PROGRESS_POLL_INTERVAL = float(os.getenv('PROGRESS_POLL_INTERVAL', '1'))
+    PROGRESS_KEEPALIVE = float(os.getenv('PROGRESS_KEEPALIVE', '15'))
+    PROGRESS_STREAM_TIMEOUT = float(os.getenv('PROGRESS_STREAM_TIMEOUT', '900'))
+    # Threads building reports for clients that asked for an event stream
+    REPORT_STREAM_WORKERS = int(os.getenv('REPORT_STREAM_WORKERS', '4'))
+    
+    # Background source refresh (one process should run the scheduler)
+    REFRESH_SCHEDULER_ENABLED = os.getenv('REFRESH_SCHEDULER_ENABLED', 'False').lower() == 'true'
+    REFRESH_INTERVAL = int(os.getenv('REFRESH_INTERVAL', '3600'))
+    REFRESH_JITTER = float(os.getenv('REFRESH_JITTER', '0.1'))
+    REFRESH_TICK = int(os.getenv('REFRESH_TICK', '30'))
+    REFRESH_WARM_PAIRS = int(os.getenv('REFRESH_WARM_PAIRS', '5'))
+    # Date range warmed when no analysis history says otherwise (the analysis routes' default)
+    REFRESH_START_DATE = os.getenv('REFRESH_START_DATE', '2023-01-01')
+    REFRESH_END_DATE = os.getenv('REFRESH_END_DATE', '2024-12-31')
+    
+    # Upstream HTTP connection pools
+    HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '10'))
+    HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '20'))
+    # Transport-level retries stay off by default: the circuit breaker
+    # retries with jitter and stops as soon as a source is marked down
+    HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '0'))
+    HTTP_BACKOFF_FACTOR = float(os.getenv('HTTP_BACKOFF_FACTOR', '0.5'))
+    HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+    HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '30'))
+    
+    # Per-source circuit breakers
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+    CIRCUIT_RESET_TIMEOUT = float(os.getenv('CIRCUIT_RESET_TIMEOUT', '60'))
+    CIRCUIT_MAX_RETRIES = int(os.getenv('CIRCUIT_MAX_RETRIES', '2'))
+    CIRCUIT_BACKOFF_BASE = float(os.getenv('CIRCUIT_BACKOFF_BASE', '0.5'))
+    CIRCUIT_BACKOFF_MAX = float(os.getenv('CIRCUIT_BACKOFF_MAX', '8'))
+    
     # API Versioning
     API_VERSION = '1.0'
     
@@ -31,9 +31,17 @@ def create_app():
     app.register_blueprint(analysis.bp)
     app.register_blueprint(reports.bp)
     app.register_blueprint(policy.bp)
-    
+
+    # Register CLI commands
+    from src.app.cli import ingest_cli
+    app.cli.add_command(ingest_cli)
+
     # Create database tables
     with app.app_context():
         db.create_all()
     
+    # Start background source refresh
+    from src.services.scheduler import init_scheduler
+    init_scheduler(app)
+    
     return app
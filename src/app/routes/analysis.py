@@ -1,15 +1,17 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app, url_for
 from flask_login import login_required, current_user
-from src.services.data_service import DataService
 from src.services.gemini_service import GeminiService
+from src.services.analysis_pipeline import get_analysis_pipeline
+from src.services.progress import progress_channel, sse_response
 from src.models import Analysis, db
+from src.utils.helpers import iterate_in_thread
 from src.utils.validators import validate_analysis_params
 from datetime import datetime
+import json
 import uuid
 
 bp = Blueprint('analysis', __name__, url_prefix='/api/analysis')
 
-data_service = DataService()
 gemini_service = GeminiService()
 
 def create_response(status="success", data=None, message=None, error=None):
@@ -73,8 +75,9 @@ async def create_analysis():
                 }
             ), 400
         
-        # Create analysis record without user_id
+        # Record the owner so they can poll the analysis while it runs
         analysis = Analysis(
+            user_id=current_user.id if current_user.is_authenticated else None,
             sources=data.get('sources', []),
             topics=data.get('topics', []),
             region=data.get('region', 'GHA'),
@@ -82,6 +85,28 @@ async def create_analysis():
             date_range_end=datetime.fromisoformat(data.get('end_date', '2024-12-31')),
             status='pending'
         )
+        params = {
+            'indicators': data.get('indicators'),
+            'use_cache': data.get('use_cache', True)
+        }
+        pipeline = get_analysis_pipeline()
+        
+        if current_app.config.get('ANALYSIS_QUEUE_ENABLED', True):
+            # Hand the work to the job workers; poll GET /api/analysis/<id> for progress
+            try:
+                job = pipeline.enqueue(analysis, params)
+            except Exception as e:
+                db.session.rollback()
+                raise Exception(f"Database error: {str(e)}")
+            
+            return create_response(
+                data={
+                    'analysis_id': analysis.id,
+                    'status': analysis.status,
+                    'job': job.to_dict()
+                },
+                message="Analysis queued"
+            ), 202, {'Location': url_for('analysis.get_analysis', analysis_id=analysis.id)}
         
         try:
             db.session.add(analysis)
@@ -90,44 +115,80 @@ async def create_analysis():
             db.session.rollback()
             raise Exception(f"Database error: {str(e)}")
         
-        try:
-            # Fetch data from sources
-            raw_data = data_service.get_data(
-                sources=analysis.sources,
-                topics=analysis.topics,
-                region=analysis.region,
-                start_date=analysis.date_range_start.isoformat(),
-                end_date=analysis.date_range_end.isoformat()
-            )
-            
-            # Store raw data
-            analysis.raw_data = raw_data
-            
-            # Process data through Gemini
-            analysis_results = await gemini_service.analyze_data(raw_data)
-            
-            # Update analysis record
-            analysis.analysis_results = analysis_results
-            analysis.status = 'completed'
-            analysis.updated_at = datetime.utcnow()
-            db.session.commit()
+        analysis_results = await pipeline.process(analysis, **params)
+        
+        return create_response(
+            data={
+                'analysis_id': analysis.id,
+                'status': analysis.status,
+                'results': analysis_results
+            },
+            message="Analysis completed successfully"
+        ), 201
             
+    except Exception as e:
+        current_app.logger.error(f"Analysis error: {str(e)}")
+        return create_response(
+            status="error",
+            error={
+                "code": "ANALYSIS_ERROR",
+                "message": "Analysis failed",
+                "details": str(e)
+            }
+        ), 500
+
+@bp.route('/stream', methods=['POST'])
+def stream_analysis():
+    """Run an analysis, streaming its sections as NDJSON while Gemini writes them"""
+    try:
+        data = request.get_json()
+        validation_error = validate_analysis_params(data)
+        if validation_error:
             return create_response(
-                data={
-                    'analysis_id': analysis.id,
-                    'status': analysis.status,
-                    'results': analysis_results
-                },
-                message="Analysis completed successfully"
-            ), 201
-            
-        except Exception as e:
-            analysis.status = 'failed'
-            analysis.error = str(e)
-            analysis.updated_at = datetime.utcnow()
+                status="error",
+                error={
+                    "code": "INVALID_PARAMETERS",
+                    "message": validation_error
+                }
+            ), 400
+        
+        analysis = Analysis(
+            user_id=current_user.id if current_user.is_authenticated else None,
+            sources=data.get('sources', []),
+            topics=data.get('topics', []),
+            region=data.get('region', 'GHA'),
+            date_range_start=datetime.fromisoformat(data.get('start_date', '2023-01-01')),
+            date_range_end=datetime.fromisoformat(data.get('end_date', '2024-12-31')),
+            status='pending'
+        )
+        try:
+            db.session.add(analysis)
             db.session.commit()
-            raise
-            
+        except Exception as e:
+            db.session.rollback()
+            raise Exception(f"Database error: {str(e)}")
+        
+        analysis_id = analysis.id
+        pipeline = get_analysis_pipeline()
+        events = iterate_in_thread(
+            current_app._get_current_object(),
+            lambda: pipeline.stream(
+                db.session.get(Analysis, analysis_id),
+                indicators=data.get('indicators'),
+                use_cache=data.get('use_cache', True)
+            )
+        )
+        
+        def generate():
+            yield json.dumps({'type': 'started', 'analysis_id': analysis_id}) + '\n'
+            for event in events:
+                yield json.dumps(event, default=str) + '\n'
+        
+        return Response(generate(), mimetype='application/x-ndjson', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+        
     except Exception as e:
         current_app.logger.error(f"Analysis error: {str(e)}")
         return create_response(
@@ -139,6 +200,26 @@ async def create_analysis():
             }
         ), 500
 
+@bp.route('/cache', methods=['GET'])
+@login_required
+def get_llm_cache_stats():
+    """Get LLM response cache hit, miss and bypass counters"""
+    try:
+        return create_response(
+            data=gemini_service.get_cache_stats(),
+            message="Successfully retrieved LLM cache statistics"
+        ), 200
+    except Exception as e:
+        current_app.logger.error(f"Error retrieving LLM cache statistics: {str(e)}")
+        return create_response(
+            status="error",
+            error={
+                "code": "CACHE_STATS_ERROR",
+                "message": "Failed to retrieve LLM cache statistics",
+                "details": str(e)
+            }
+        ), 500
+
 @bp.route('/<int:analysis_id>', methods=['GET'])
 def get_analysis(analysis_id):
     """Get analysis results"""
@@ -185,6 +266,8 @@ def get_analysis(analysis_id):
                     'end': analysis.date_range_end.isoformat()
                 },
                 'results': analysis.analysis_results,
+                'error': analysis.error,
+                'job': analysis.job.to_dict() if analysis.job else None,
                 'created_at': analysis.created_at.isoformat(),
                 'updated_at': analysis.updated_at.isoformat() if analysis.updated_at else None
             },
@@ -202,6 +285,55 @@ def get_analysis(analysis_id):
             }
         ), 500
 
+@bp.route('/<int:analysis_id>/events', methods=['GET'])
+@login_required
+def stream_analysis_events(analysis_id):
+    """Stream analysis progress as Server-Sent Events"""
+    try:
+        analysis = db.session.get(Analysis, analysis_id)
+        if not analysis:
+            return create_response(
+                status="error",
+                error={
+                    "code": "ANALYSIS_NOT_FOUND",
+                    "message": f"Analysis {analysis_id} not found"
+                }
+            ), 404
+            
+        # Check ownership
+        if analysis.user_id != current_user.id:
+            return create_response(
+                status="error",
+                error={
+                    "code": "UNAUTHORIZED",
+                    "message": "Not authorized to access this analysis"
+                }
+            ), 403
+        
+        # Current state first, so late subscribers need not replay history
+        if analysis.status in ('completed', 'failed'):
+            snapshot = {
+                'event': analysis.status,
+                'data': {'results': analysis.analysis_results} if analysis.status == 'completed' else {'error': analysis.error}
+            }
+        else:
+            snapshot = {
+                'event': 'snapshot',
+                'data': analysis.job.to_dict() if analysis.job else {'status': analysis.status}
+            }
+        return sse_response(progress_channel('analysis', analysis.id), snapshot)
+        
+    except Exception as e:
+        current_app.logger.error(f"Error streaming analysis {analysis_id}: {str(e)}")
+        return create_response(
+            status="error",
+            error={
+                "code": "STREAM_ERROR",
+                "message": "Failed to stream analysis progress",
+                "details": str(e)
+            }
+        ), 500
+
 @bp.route('/user/<int:user_id>', methods=['GET'])
 @login_required
 def get_user_analyses(user_id):
@@ -266,8 +398,16 @@ def delete_analysis(analysis_id):
                 }
             ), 403
             
+        digest = analysis.blob_digest
         db.session.delete(analysis)
         db.session.commit()
+        try:
+            Analysis.release_blobs([digest])
+            db.session.commit()
+        except Exception as e:
+            # The analysis is gone either way; an orphaned blob only costs space
+            db.session.rollback()
+            current_app.logger.warning(f"Releasing data of analysis {analysis_id} failed: {str(e)}")
         
         return create_response(
             message="Analysis deleted successfully"
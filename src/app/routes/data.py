@@ -15,14 +15,15 @@ def before_request():
     if 'X-Request-ID' not in request.headers:
         request.environ['HTTP_X_REQUEST_ID'] = str(uuid.uuid4())
 
-def create_response(status="success", data=None, message=None, error=None):
+def create_response(status="success", data=None, message=None, error=None, metadata=None):
     """Create standardized response"""
     response = {
         "status": status,
         "metadata": {
             "timestamp": datetime.utcnow().isoformat(),
             "version": current_app.config['API_VERSION'],
-            "request_id": request.headers.get('X-Request-ID')
+            "request_id": request.headers.get('X-Request-ID'),
+            **(metadata or {})
         }
     }
     
@@ -51,8 +52,8 @@ def fetch_source_data(source_id):
                 }
             ), 400
             
-        # Fetch data
-        data = data_service.get_data(
+        # Fetch data, serving recently seen payloads without an upstream wait
+        data, ages = data_service.get_data_with_age(
             sources=[source_id],
             topics=params.get('topics', '').split(','),
             region=params.get('region', 'GHA'),
@@ -63,7 +64,8 @@ def fetch_source_data(source_id):
         
         return create_response(
             data=data,
-            message=f"Successfully fetched data from {source_id}"
+            message=f"Successfully fetched data from {source_id}",
+            metadata={"data_age": ages}
         ), 200
     except Exception as e:
         current_app.logger.error(f"Error fetching data from {source_id}: {str(e)}")
@@ -96,3 +98,64 @@ def list_sources():
                 "details": str(e)
             }
         ), 500
+
+@bp.route('/cache', methods=['GET'])
+@login_required
+def get_cache_stats():
+    """Get fetch cache hit and miss counters"""
+    try:
+        return create_response(
+            data=data_service.get_cache_stats(),
+            message="Successfully retrieved cache statistics"
+        ), 200
+    except Exception as e:
+        current_app.logger.error(f"Error retrieving cache statistics: {str(e)}")
+        return create_response(
+            status="error",
+            error={
+                "code": "CACHE_STATS_ERROR",
+                "message": "Failed to retrieve cache statistics",
+                "details": str(e)
+            }
+        ), 500
+
+@bp.route('/stats', methods=['GET'])
+@login_required
+def get_fetch_stats():
+    """Get cache and request coalescing counters for upstream fetches"""
+    try:
+        return create_response(
+            data=data_service.get_fetch_stats(),
+            message="Successfully retrieved fetch statistics"
+        ), 200
+    except Exception as e:
+        current_app.logger.error(f"Error retrieving fetch statistics: {str(e)}")
+        return create_response(
+            status="error",
+            error={
+                "code": "FETCH_STATS_ERROR",
+                "message": "Failed to retrieve fetch statistics",
+                "details": str(e)
+            }
+        ), 500
+
+@bp.route('/cache', methods=['DELETE'])
+@login_required
+def clear_cache():
+    """Clear fetch cache entries, optionally matching a key pattern"""
+    try:
+        deleted = data_service.clear_cache(request.args.get('pattern'))
+        return create_response(
+            data={'deleted': deleted},
+            message=f"Cleared {deleted} cache entries"
+        ), 200
+    except Exception as e:
+        current_app.logger.error(f"Error clearing cache: {str(e)}")
+        return create_response(
+            status="error",
+            error={
+                "code": "CACHE_CLEAR_ERROR",
+                "message": "Failed to clear cache",
+                "details": str(e)
+            }
+        ), 500
@@ -95,7 +95,9 @@ async def generate_policy_brief():
             ), 404
             
         # Generate policy brief using Gemini
-        brief_content = await gemini_service.generate_policy_brief(analysis.analysis_results)
+        brief_content = await gemini_service.generate_policy_brief(
+            analysis.analysis_results, use_cache=data.get('use_cache', True)
+        )
         
         # Create policy brief record
         policy_brief = PolicyBrief(
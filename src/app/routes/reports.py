@@ -1,15 +1,23 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required, current_user
 from src.services.gemini_service import GeminiService
+from src.services.progress import get_progress_broker, progress_channel, sse_response
 from src.models import Report, Analysis, db
+from src.utils.helpers import app_extension
 from src.utils.validators import validate_report_params
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import Dict
+import asyncio
 import uuid
 
 bp = Blueprint('reports', __name__, url_prefix='/api/reports')
 
 gemini_service = GeminiService()
 
+# Progress reported for each report generation stage
+REPORT_STAGES = {'generating': 20, 'saving': 90, 'done': 100}
+
 def create_response(status="success", data=None, message=None, error=None):
     """Create standardized response"""
     response = {
@@ -103,10 +111,52 @@ async def generate_report():
         )
         db.session.add(report)
         db.session.commit()
+        use_cache = data.get('use_cache', True)
+        
+        # Clients asking for an event stream get progress while the report is built
+        if request.accept_mimetypes.best == 'text/event-stream':
+            get_report_executor().submit(
+                _generate_in_context, current_app._get_current_object(), report.id, use_cache
+            )
+            return sse_response(
+                progress_channel('report', report.id),
+                snapshot={'event': 'snapshot', 'data': {'report_id': report.id, 'status': report.status}}
+            )
+        
+        content = await _generate_content(report, analysis, use_cache)
+        
+        return create_response(
+            data={
+                'report_id': report.id,
+                'status': report.status,
+                'content': content
+            },
+            message="Report generated successfully"
+        ), 201
+        
+    except Exception as e:
+        current_app.logger.error(f"Report generation error: {str(e)}")
+        return create_response(
+            status="error",
+            error={
+                "code": "REPORT_GENERATION_ERROR",
+                "message": "Failed to generate report",
+                "details": str(e)
+            }
+        ), 500
+
+async def _generate_content(report: Report, analysis: Analysis, use_cache: bool = True) -> Dict:
+    """Build a report's content and store it, publishing progress to the report's channel"""
+    broker = get_progress_broker()
+    channel = progress_channel('report', report.id)
+    try:
+        broker.publish(channel, 'progress', {'stage': 'generating', 'progress': REPORT_STAGES['generating']})
         
         # Generate report content based on type
         if report.type == 'policy_brief':
-            content = await gemini_service.generate_policy_brief(analysis.analysis_results)
+            content = await gemini_service.generate_policy_brief(
+                analysis.analysis_results, use_cache=use_cache
+            )
         else:
             content = {
                 'summary': analysis.analysis_results.get('key_findings', []),
@@ -118,35 +168,81 @@ async def generate_report():
                     'topics': analysis.topics
                 }
             }
+        broker.publish(channel, 'progress', {'stage': 'saving', 'progress': REPORT_STAGES['saving']})
         
         # Update report with content
         report.content = content
         report.status = 'completed'
         report.updated_at = datetime.utcnow()
         db.session.commit()
-        
-        return create_response(
-            data={
-                'report_id': report.id,
-                'status': report.status,
-                'content': report.content
-            },
-            message="Report generated successfully"
-        ), 201
+        broker.publish(channel, 'completed', {'progress': REPORT_STAGES['done'], 'content': content})
+        return content
         
     except Exception as e:
-        current_app.logger.error(f"Report generation error: {str(e)}")
-        if 'report' in locals():
-            report.status = 'failed'
-            report.report_metadata['error'] = str(e)
-            report.updated_at = datetime.utcnow()
-            db.session.commit()
+        db.session.rollback()
+        report.status = 'failed'
+        report.report_metadata = {**(report.report_metadata or {}), 'error': str(e)}
+        report.updated_at = datetime.utcnow()
+        db.session.commit()
+        broker.publish(channel, 'failed', {'error': str(e)})
+        raise
+
+def _generate_in_context(app, report_id: int, use_cache: bool = True) -> None:
+    """Generate a report on a background thread"""
+    with app.app_context():
+        report = db.session.get(Report, report_id)
+        try:
+            asyncio.run(_generate_content(report, report.analysis, use_cache))
+        except Exception as e:
+            app.logger.error(f"Report {report_id} generation error: {str(e)}")
+
+def get_report_executor() -> ThreadPoolExecutor:
+    """Threads that build reports for event-stream clients"""
+    return app_extension('report_executor', lambda: ThreadPoolExecutor(
+        max_workers=current_app.config.get('REPORT_STREAM_WORKERS', 4),
+        thread_name_prefix='report'
+    ))
+
+@bp.route('/<int:report_id>/events', methods=['GET'])
+@login_required
+def stream_report_events(report_id):
+    """Stream report generation progress as Server-Sent Events"""
+    try:
+        report = db.session.get(Report, report_id)
+        if not report:
+            return create_response(
+                status="error",
+                error={
+                    "code": "REPORT_NOT_FOUND",
+                    "message": f"Report {report_id} not found"
+                }
+            ), 404
             
+        # Check ownership
+        if report.user_id != current_user.id:
+            return create_response(
+                status="error",
+                error={
+                    "code": "UNAUTHORIZED",
+                    "message": "Not authorized to access this report"
+                }
+            ), 403
+        
+        if report.status == 'completed':
+            snapshot = {'event': 'completed', 'data': {'content': report.content}}
+        elif report.status == 'failed':
+            snapshot = {'event': 'failed', 'data': {'error': (report.report_metadata or {}).get('error')}}
+        else:
+            snapshot = {'event': 'snapshot', 'data': {'report_id': report.id, 'status': report.status}}
+        return sse_response(progress_channel('report', report.id), snapshot)
+        
+    except Exception as e:
+        current_app.logger.error(f"Error streaming report {report_id}: {str(e)}")
         return create_response(
             status="error",
             error={
-                "code": "REPORT_GENERATION_ERROR",
-                "message": "Failed to generate report",
+                "code": "STREAM_ERROR",
+                "message": "Failed to stream report progress",
                 "details": str(e)
             }
         ), 500
@@ -3,14 +3,68 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import HumanMessage
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.runnables import RunnableSequence
-from typing import Dict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 import os
 import asyncio
+import logging
+from src.chains.compaction import compact_data, compact_json, compact_statistics
+from src.chains.json_sections import JSONSectionParser
+from src.chains.map_reduce import group_by_size, split_data
+from src.services.llm_cache import cached_completion, cached_sections
+
+def _chunk_text(chunk: Any) -> str:
+    """Text of a streamed message chunk, whether its content is a string or content blocks"""
+    content = getattr(chunk, 'content', chunk)
+    if isinstance(content, str):
+        return content
+    return ''.join(
+        block if isinstance(block, str) else block.get('text', '')
+        for block in content or ()
+    )
 
 class AnalysisChain:
-    """LangChain implementation for data analysis"""
+    """
+    LangChain implementation for data analysis
+    
+    Data is compacted into a table before it goes into a prompt (see
+    compact_data). Data whose table exceeds token_budget is analyzed
+    map-reduce style: it is split by source and topic, the pieces are
+    analyzed concurrently (at most map_concurrency LLM calls at a time),
+    and a reduce prompt merges the partial analyses into one with the
+    same sections. Precomputed statistics (see compute_statistics), when
+    given, go into the prompt that sees the whole dataset as exact facts,
+    using at most a third of token_budget.
+    """
+    
+    # Seconds a streamed answer may go without producing output
+    STREAM_IDLE_TIMEOUT = 30
+    # Seconds each single (non-streamed) LLM call may take
+    CALL_TIMEOUT = 30
+    SECTIONS = ('key_findings', 'trends', 'correlations', 'gaps', 'recommendations')
+    
+    REDUCE_PROMPT = """You are an expert in analyzing children's welfare data for UNICEF in Ghana.
+                Below are analyses of separate parts of one dataset, which was split by data source and topic.
+                Merge them into a single analysis of the whole dataset:
+                - Combine findings and remove duplicates
+                - Reconcile trends that conflict between parts
+                - Draw out correlations between metrics from different parts
+                - Keep gaps that no other part fills
+                - Consolidate and prioritize the recommendations
+                
+                Provide analysis in JSON format with these sections:
+                - key_findings: List of main findings about education, health, and welfare
+                - trends: Identified trends in the data
+                - correlations: Important relationships between different metrics
+                - gaps: Missing or incomplete data points
+                - recommendations: Specific, actionable recommendations for Ghana
+                
+                Partial analyses: {partials}"""
     
     def __init__(self):
+        # Estimated tokens of data (or partial analyses) a single prompt may carry
+        self.token_budget = int(os.getenv('ANALYSIS_TOKEN_BUDGET', '6000'))
+        self.logger = logging.getLogger(__name__)
+        self.map_concurrency = int(os.getenv('ANALYSIS_MAP_CONCURRENCY', '4'))
         try:
             self.llm = ChatGoogleGenerativeAI(
                 model="gemini-pro",
@@ -38,25 +92,186 @@ class AnalysisChain:
                 Data to analyze: {data}""")
             ])
             
-            # Create analysis chain
-            self.chain = self.analysis_prompt | self.llm | JsonOutputParser()
+            # Create analysis chain, and the raw-text chain astream parses itself
+            self._build_chains()
+            self.reduce_prompt = ChatPromptTemplate.from_template(self.REDUCE_PROMPT)
+            self.reduce_chain = self.reduce_prompt | self.llm | JsonOutputParser()
+            self.reduce_stream_chain = self.reduce_prompt | self.llm
             
         except Exception as e:
             raise Exception(f"Failed to initialize analysis chain: {str(e)}")
     
-    async def analyze(self, data: Dict) -> Dict:
-        """Run analysis chain on data"""
+    async def analyze(self, data: Dict, use_cache: bool = True, statistics: Optional[Dict] = None) -> Dict:
+        """
+        Run analysis chain on data, with optional precomputed statistics
+        
+        Identical requests are answered from the LLM response cache unless
+        use_cache is off; so are the map and reduce calls of a split
+        analysis, so changing one source only re-analyzes its own pieces.
+        Every call is keyed on the prompt text it renders, so anything that
+        changes a prompt (statistics, token_budget) is a miss.
+        """
         try:
-            result = await asyncio.wait_for(
-                self.chain.ainvoke({"data": data}),
-                timeout=30
+            texts, facts = self._render(data, statistics)
+            return await cached_completion(
+                "analysis", self.get_prompt(), self.llm, {'data': texts, 'facts': facts},
+                lambda: self._analyze(texts, facts, use_cache),
+                use_cache
             )
-            return result
         except asyncio.TimeoutError:
-            raise Exception("Analysis timed out after 30 seconds")
+            raise Exception(f"Analysis timed out after {self.CALL_TIMEOUT} seconds")
         except Exception as e:
             raise Exception(f"Analysis chain failed: {str(e)}")
     
+    def _render(self, data: Dict, statistics: Optional[Dict]) -> Tuple[List[str], str]:
+        """
+        Compacted prompt data of each piece of the data, and the facts text
+        
+        A single piece is analyzed directly; several are analyzed map-reduce.
+        """
+        return [self._prompt_data(chunk) for chunk in self._split(data)], self._prompt_facts(statistics)
+    
+    async def _analyze(self, texts: List[str], facts: str, use_cache: bool) -> Dict:
+        if len(texts) <= 1:
+            return await asyncio.wait_for(self.chain.ainvoke({"data": self._with_facts(texts[0], facts)}), timeout=self.CALL_TIMEOUT)
+        
+        semaphore = asyncio.BoundedSemaphore(self.map_concurrency)
+        partials = await self._combine(await self._map(texts, semaphore, use_cache), semaphore, use_cache)
+        if len(partials) == 1:
+            return partials[0]
+        return await self._reduce(partials, semaphore, use_cache, facts)
+    
+    async def _map(self, texts: List[str], semaphore: asyncio.BoundedSemaphore, use_cache: bool) -> List[Dict]:
+        """Analyze each piece of the data, at most map_concurrency at a time"""
+        return list(await asyncio.gather(*(
+            self._bounded(semaphore, lambda text=text: cached_completion(
+                "analysis_map", self.get_prompt(), self.llm, {'data': text},
+                lambda: asyncio.wait_for(self.chain.ainvoke({"data": text}), timeout=self.CALL_TIMEOUT),
+                use_cache
+            ))
+            for text in texts
+        )))
+    
+    async def _combine(self, partials: List[Dict], semaphore: asyncio.BoundedSemaphore, use_cache: bool) -> List[Dict]:
+        """Reduce partial analyses in rounds until the rest fit in one reduce prompt"""
+        batches = group_by_size(partials, self.token_budget, self._partials_tokens)
+        while len(batches) > 1:
+            partials = list(await asyncio.gather(*(
+                self._bounded(semaphore, lambda batch=batch: self._reduce(batch, None, use_cache))
+                if len(batch) > 1 else self._passthrough(batch[0])
+                for batch in batches
+            )))
+            batches = group_by_size(partials, self.token_budget, self._partials_tokens)
+        return partials
+    
+    async def _reduce(self, partials: List[Dict], semaphore, use_cache: bool, facts: str = '') -> Dict:
+        """Merge partial analyses into one with the standard sections"""
+        text = self._prompt_partials(partials, facts)
+        
+        async def call() -> Dict:
+            return await cached_completion(
+                "analysis_reduce", self.REDUCE_PROMPT, self.llm, {'partials': text},
+                lambda: asyncio.wait_for(self.reduce_chain.ainvoke({"partials": text}), timeout=self.CALL_TIMEOUT),
+                use_cache
+            )
+        merged = await (self._bounded(semaphore, call) if semaphore is not None else call())
+        return self._conform(merged)
+    
+    def _split(self, data: Dict) -> List[Dict]:
+        """Pieces of the data whose compacted table fits the token budget"""
+        return split_data(data, self.token_budget, lambda piece: compact_data(piece)[1]['tokens_after'])
+    
+    @staticmethod
+    def _partials_tokens(partial: Dict) -> int:
+        return compact_json(partial)[1]['tokens_after']
+    
+    @staticmethod
+    def _with_facts(text: str, facts: str) -> str:
+        return f"{text}\n\n{facts}" if facts else text
+    
+    def _prompt_data(self, data: Dict) -> str:
+        """Compact data for one analysis prompt, logging its token estimate"""
+        text, stats = compact_data(data, self.token_budget)
+        self.logger.info(
+            f"Analysis prompt data: {stats['tokens_before']} -> {stats['tokens_after']} tokens "
+            f"({stats['series']} series, {stats['summarized']} summarized, "
+            f"{stats['dropped']} empty dropped, {stats['untabulated']} untabulated, {stats['omitted']} omitted)"
+        )
+        return text
+    
+    def _prompt_partials(self, partials: List[Dict], facts: str = '') -> str:
+        """Compact partial analyses for one reduce prompt, logging its token estimate"""
+        text, stats = compact_json(partials, self.token_budget)
+        self.logger.info(f"Reduce prompt partials: {stats['tokens_before']} -> {stats['tokens_after']} tokens")
+        return self._with_facts(text, facts)
+    
+    def _prompt_facts(self, statistics: Optional[Dict]) -> str:
+        """Compact precomputed statistics for the prompt that sees the whole dataset"""
+        text, stats = compact_statistics(statistics, self.token_budget // 3)
+        if text:
+            self.logger.info(f"Analysis prompt statistics: {stats['tokens_before']} -> {stats['tokens_after']} tokens")
+        return text
+    
+    @staticmethod
+    async def _bounded(semaphore: asyncio.BoundedSemaphore, call: Callable[[], Awaitable[Any]]) -> Any:
+        async with semaphore:
+            return await call()
+    
+    @staticmethod
+    async def _passthrough(value: Any) -> Any:
+        return value
+    
+    def _conform(self, result: Any) -> Dict:
+        """Ensure a merged analysis has every standard section"""
+        result = dict(result) if isinstance(result, dict) else {}
+        for section in self.SECTIONS:
+            result.setdefault(section, [])
+        return result
+    
+    async def astream(self, data: Dict, use_cache: bool = True, statistics: Optional[Dict] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Run analysis chain on data, yielding each section as soon as it is complete
+        
+        Yields (section, value) pairs such as ("key_findings", [...]) in the
+        order the model writes them. Instead of analyze()'s 30-second limit
+        on the whole answer, the limit applies to each gap between streamed
+        chunks, so a slow but steady answer is not cut off. The complete
+        answer shares its cache entry with analyze().
+        """
+        try:
+            texts, facts = self._render(data, statistics)
+            async for section in cached_sections(
+                "analysis", self.get_prompt(), self.llm, {'data': texts, 'facts': facts},
+                lambda: self._stream_sections(texts, facts, use_cache),
+                use_cache
+            ):
+                yield section
+        except asyncio.TimeoutError:
+            raise Exception(f"Analysis stalled with no output for {self.STREAM_IDLE_TIMEOUT} seconds")
+        except Exception as e:
+            raise Exception(f"Analysis chain failed: {str(e)}")
+    
+    async def _stream_sections(self, texts: List[str], facts: str, use_cache: bool = True) -> AsyncIterator[Tuple[str, Any]]:
+        if len(texts) <= 1:
+            chunks = self.stream_chain.astream({"data": self._with_facts(texts[0], facts)})
+        else:
+            # Map and pre-reduce as in analyze(), then stream the final merge
+            semaphore = asyncio.BoundedSemaphore(self.map_concurrency)
+            partials = await self._combine(await self._map(texts, semaphore, use_cache), semaphore, use_cache)
+            chunks = self.reduce_stream_chain.astream({"partials": self._prompt_partials(partials, facts)})
+        
+        parser = JSONSectionParser()
+        chunks = chunks.__aiter__()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), timeout=self.STREAM_IDLE_TIMEOUT)
+            except StopAsyncIteration:
+                break
+            for section in parser.feed(_chunk_text(chunk)):
+                yield section
+        if not parser.done:
+            raise ValueError("Model output ended before the JSON object was complete")
+    
     def get_prompt(self) -> str:
         """Get the current prompt template"""
         return self.analysis_prompt.messages[0].content
@@ -66,4 +281,10 @@ class AnalysisChain:
         self.analysis_prompt = ChatPromptTemplate.from_messages([
             HumanMessage(content=new_prompt)
         ])
-        self.chain = self.analysis_prompt | self.llm | JsonOutputParser()
+        self._build_chains()
+    
+    def _build_chains(self) -> None:
+        # The message holds the template text; it is compiled so {data} is filled in
+        prompt = ChatPromptTemplate.from_template(self.get_prompt())
+        self.chain = prompt | self.llm | JsonOutputParser()
+        self.stream_chain = prompt | self.llm
@@ -0,0 +1,265 @@
+import json
+import math
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from src.utils.indicator_frame import NORMALIZERS, frame_from_sources
+
+# Series with more points than this are summarized, at each compaction level
+COMPACTION_LEVELS = (
+    {'max_points': 10, 'decimals': 2},
+    {'max_points': 5, 'decimals': 1},
+    {'max_points': 1, 'decimals': 1}
+)
+DROPPED_KEYS = ('metadata',)
+
+LEGEND = ("One line per indicator under its ## SOURCE/topic: year=value, or for long series "
+          "the years, n points, first/last/min/max values and least-squares slope per year")
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a prompt fragment (about four characters per token)"""
+    return math.ceil(len(text) / 4)
+
+def _is_series(node: Dict) -> bool:
+    """Whether a node is year-keyed, as the frame normalizers read it"""
+    return bool(node) and all(len(str(key)) >= 4 and str(key)[:4].isdigit() for key in node)
+
+def _dump(node: Any) -> str:
+    return json.dumps(node, separators=(',', ':'), default=str)
+
+def _unread(data: Dict) -> Tuple[List[str], List[str]]:
+    """
+    What the frame normalizers leave out of source data
+
+    Returns:
+        (notes, untabulated): source and topic errors, and "path: JSON"
+        lines for any other content that is not a year series (such as
+        lists of raw values), so it is never silently lost
+    """
+    notes, untabulated = [], []
+
+    def keep(path: Tuple[str, ...], node: Any) -> None:
+        if node not in (None, '', [], {}):
+            untabulated.append(f"{'/'.join(path)}: {_dump(node)}")
+
+    def walk(node: Dict, path: Tuple[str, ...]) -> None:
+        for key, child in node.items():
+            if key == 'error':
+                notes.append(f"{'/'.join(path)}: {child}")
+            elif key in DROPPED_KEYS:
+                continue
+            elif not isinstance(child, dict):
+                keep(path + (str(key),), child)
+            elif not _is_series(child):
+                walk(child, path + (str(key),))
+
+    for source, payload in data.items():
+        if not isinstance(payload, dict):
+            keep((source,), payload)
+        elif 'error' in payload:
+            notes.append(f"{source}: {payload['error']}")
+        elif source.lower() not in NORMALIZERS:
+            keep((source,), payload)
+        elif source.lower() == 'worldbank':
+            # {topic: [World Bank items]}, or {topic: {"error"}} for a failed topic
+            for topic, items in payload.items():
+                if isinstance(items, dict) and 'error' in items:
+                    notes.append(f"{source}/{topic}: {items['error']}")
+                elif not isinstance(items, list) and topic not in DROPPED_KEYS:
+                    keep((source, topic), items)
+        else:
+            walk(payload, (source,))
+    return notes, untabulated
+
+def collect_series(data: Dict, region: str = "GHA") -> Tuple[List[Tuple[Tuple[str, ...], List[Tuple[int, float]]]], int]:
+    """
+    Normalize source data into year series, as frame_from_sources reads it
+
+    Series are keyed like the precomputed statistics: (SOURCE, topic,
+    indicator), with @region on the indicator when several regions occur.
+
+    Returns:
+        (series, dropped): each series as (path, sorted (year, value)
+        points), and the number of series without a single numeric value
+    """
+    frame = frame_from_sources(data, region)
+    frame = frame.filter(frame['year'] > 0)
+    several = len(np.unique(frame['region'])) > 1
+    groups = {}
+    for source, topic, indicator, where, year, value in zip(
+            frame['source'].tolist(), frame['topic'].tolist(), frame['indicator'].tolist(),
+            frame['region'].tolist(), frame['year'].tolist(), frame['value'].tolist()):
+        points = groups.setdefault((source, topic, f"{indicator}@{where}" if several else indicator), {})
+        if math.isfinite(value):
+            points[year] = value
+    series = [(path, sorted(points.items())) for path, points in groups.items() if points]
+    return series, sum(1 for points in groups.values() if not points)
+
+def _fmt(value: float, decimals: int) -> str:
+    text = f"{round(value, decimals):.{decimals}f}"
+    return text.rstrip('0').rstrip('.') if '.' in text else text
+
+def _slope(points: List[Tuple[int, float]]) -> float:
+    """Least-squares change per year"""
+    n = len(points)
+    mean_x = sum(year for year, _ in points) / n
+    mean_y = sum(value for _, value in points) / n
+    var = sum((year - mean_x) ** 2 for year, _ in points)
+    if not var:
+        return 0.0
+    return sum((year - mean_x) * (value - mean_y) for year, value in points) / var
+
+def format_series(points: List[Tuple[int, float]], max_points: int, decimals: int) -> str:
+    """Render a series in full, or as trend statistics when it is longer than max_points"""
+    if len(points) <= max_points:
+        return ' '.join(f"{year}={_fmt(value, decimals)}" for year, value in points)
+    values = [value for _, value in points]
+    slope = _slope(points)
+    return (f"{points[0][0]}-{points[-1][0]} n={len(points)} first={_fmt(values[0], decimals)} "
+            f"last={_fmt(values[-1], decimals)} min={_fmt(min(values), decimals)} "
+            f"max={_fmt(max(values), decimals)} slope={'+' if slope >= 0 else ''}{_fmt(slope, decimals + 1)}/yr")
+
+def _render(series, max_points: int, decimals: int) -> List[str]:
+    lines, group = [], None
+    for (source, topic, indicator), points in series:
+        if (source, topic) != group:
+            group = (source, topic)
+            lines.append(f"## {source}/{topic}")
+        lines.append(f"{indicator}: {format_series(points, max_points, decimals)}")
+    return lines
+
+def compact_data(data: Dict, budget: Optional[int] = None, region: str = "GHA") -> Tuple[str, Dict]:
+    """
+    Render source data as compact text for a prompt, within a token budget
+
+    Data is normalized through the indicator frame, so UNICEF, WHO and
+    World Bank payloads alike become one line per series. Empty series and
+    metadata are dropped, confidence intervals reduced to their point
+    value, numbers rounded and long series summarized into trend
+    statistics. Each compaction level rounds harder and summarizes more;
+    if even the last one exceeds the budget, trailing lines are left out
+    and counted. Notes (such as source errors) come first; content that is
+    not a year series follows the series as JSON.
+
+    Args:
+        data: DataService.get_data output ({source: payload})
+        budget: Maximum estimated tokens (None: no limit, first level only)
+        region: Region of payloads that do not name their own
+
+    Returns:
+        (text, stats) with token estimates before (as a Python dict repr)
+        and after, and counts of series kept, summarized, dropped and
+        omitted, and of untabulated entries
+    """
+    series, dropped = collect_series(data, region)
+    notes, untabulated = _unread(data)
+    stats = {
+        'tokens_before': estimate_tokens(str(data)),
+        'series': len(series),
+        'dropped': dropped,
+        'untabulated': len(untabulated),
+        'omitted': 0
+    }
+
+    head = ([LEGEND] if series else []) + (["## notes"] + notes if notes else [])
+    tail = ["## other data (not year series)"] + untabulated if untabulated else []
+    for level in COMPACTION_LEVELS:
+        lines = head + _render(series, **level) + tail
+        text = '\n'.join(lines)
+        if budget is None or estimate_tokens(text) <= budget:
+            break
+    else:
+        text, stats['omitted'] = _fit_lines(lines, budget, keep=len(head))
+
+    stats['summarized'] = sum(1 for _, points in series if len(points) > level['max_points'])
+    stats['tokens_after'] = estimate_tokens(text)
+    return text, stats
+
+def _fit_lines(lines: List[str], budget: Optional[int], keep: int = 0) -> Tuple[str, int]:
+    """
+    Join whole lines up to the budget, always keeping the first keep lines
+
+    Returns:
+        (text, omitted): omitted counts the left-out lines that are not ## headers
+    """
+    text = '\n'.join(lines)
+    if budget is None or estimate_tokens(text) <= budget:
+        return text, 0
+    kept, used = [], 0
+    for line in lines:
+        cost = estimate_tokens(line + '\n')
+        if len(kept) >= keep and used + cost > budget - 12:
+            break
+        kept.append(line)
+        used += cost
+    omitted = sum(1 for line in lines[len(kept):] if not line.startswith('## '))
+    kept.append(f"({omitted} more lines omitted to fit the prompt budget)")
+    return '\n'.join(kept), omitted
+
+def compact_statistics(statistics: Optional[Dict], budget: Optional[int] = None) -> Tuple[str, Dict]:
+    """
+    Render precomputed statistics (see compute_statistics) as prompt facts
+
+    One line per indicator with its latest value, latest year-over-year
+    change, CAGR and slope, then the strong correlations and the gaps.
+    Lines past the budget are left out, gaps first.
+    """
+    if not statistics or not statistics.get('indicators') and not statistics.get('gaps'):
+        return '', {'tokens_before': 0, 'tokens_after': 0, 'omitted': 0}
+    lines = ["## precomputed statistics (exact, computed from the data above; use them instead of recalculating)"]
+    for label, facts in statistics['indicators'].items():
+        line = f"{label}: {facts['first_year']}-{facts['last_year']} n={facts['points']} latest={_fmt(facts['latest'], 2)}"
+        if facts['yoy']:
+            year = max(facts['yoy'])
+            pct = facts['yoy_pct'].get(year)
+            line += f" yoy{year}={facts['yoy'][year]:+g}" + (f" ({pct:+g}%)" if pct is not None else '')
+        if facts['cagr'] is not None:
+            line += f" cagr={100 * facts['cagr']:+.2f}%"
+        if facts['slope'] is not None:
+            line += f" slope={facts['slope']:+g}/yr"
+        lines.append(line)
+    strong = (statistics.get('correlations') or {}).get('strong') or []
+    if strong:
+        lines.append("## strong correlations (Pearson r over shared years)")
+        lines.extend(f"{pair['a']} ~ {pair['b']}: r={pair['r']:+g} over {pair['years']} years" for pair in strong)
+    if statistics.get('gaps'):
+        lines.append("## missing years")
+        lines.extend(f"{label}: {', '.join(years)}" for label, years in statistics['gaps'].items())
+
+    text, omitted = _fit_lines(lines, budget, keep=1)
+    return text, {'tokens_before': estimate_tokens(str(statistics)), 'tokens_after': estimate_tokens(text), 'omitted': omitted}
+
+def compact_json(payload: Any, budget: Optional[int] = None) -> Tuple[str, Dict]:
+    """
+    Render LLM output (analyses, partial analyses) as compact JSON within a token budget
+
+    Empty sections are dropped. Over budget, the longest lists are cut
+    from the end, since each section lists its most important items first.
+    """
+    def prune(node: Any) -> Any:
+        if isinstance(node, dict):
+            pruned = {key: prune(value) for key, value in node.items()}
+            return {key: value for key, value in pruned.items() if value not in (None, '', [], {})}
+        if isinstance(node, list):
+            return [prune(item) for item in node if item not in (None, '', [], {})]
+        return node
+
+    stats = {'tokens_before': estimate_tokens(str(payload))}
+    pruned = prune(payload)
+    text = json.dumps(pruned, separators=(',', ':'), default=str)
+    while budget is not None and estimate_tokens(text) > budget:
+        longest = _longest_list(pruned)
+        if longest is None or len(longest) <= 1:
+            break
+        del longest[-1]
+        text = json.dumps(pruned, separators=(',', ':'), default=str)
+    stats['tokens_after'] = estimate_tokens(text)
+    return text, stats
+
+def _longest_list(node: Any) -> Optional[list]:
+    best = node if isinstance(node, list) else None
+    children = node.values() if isinstance(node, dict) else node if isinstance(node, list) else ()
+    for child in children:
+        candidate = _longest_list(child)
+        if candidate is not None and (best is None or len(candidate) > len(best)):
+            best = candidate
+    return best
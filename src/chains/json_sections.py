@@ -0,0 +1,131 @@
+import json
+from typing import Any, Dict, List, Tuple
+
+class JSONSectionParser:
+    """
+    Incrementally parse the top-level members of a streamed JSON object
+
+    Text is fed in chunks as the model produces it; every member of the
+    outermost object ("key_findings", "trends", ...) is returned by feed()
+    as soon as its value closes. Each character is scanned once, so the
+    cost stays linear in the length of the answer. Text before the opening
+    brace or after the closing one (such as a ```json fence) is ignored.
+    """
+
+    def __init__(self):
+        self._buffer = ''
+        self._pos = 0
+        self._start = 0
+        self._state = 'start'
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key = None
+        self.sections: Dict[str, Any] = {}
+
+    @property
+    def done(self) -> bool:
+        """Whether the closing brace of the object has been seen"""
+        return self._state == 'done'
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Add a chunk of text
+
+        Returns:
+            (key, value) for each member completed by this chunk
+
+        Raises:
+            ValueError: If a completed member is not valid JSON
+        """
+        self._buffer += chunk
+        completed = []
+        while self._pos < len(self._buffer) and self._state != 'done':
+            member = self._step(self._buffer[self._pos])
+            if member is not None:
+                self.sections[member[0]] = member[1]
+                completed.append(member)
+        # Drop text no pending token refers to
+        keep = self._start if self._state in ('key', 'value') else self._pos
+        self._buffer = self._buffer[keep:]
+        self._start -= keep
+        self._pos -= keep
+        return completed
+
+    def _step(self, char: str):
+        """Consume one character, returning a member if it completed one"""
+        state = self._state
+        if state == 'value':
+            return self._scan_value(char)
+
+        self._pos += 1
+        if state == 'start':
+            if char == '{':
+                self._state = 'member'
+        elif state in ('member', 'after_value') and char.isspace():
+            pass
+        elif state == 'member' and char == '"':
+            self._start, self._state = self._pos - 1, 'key'
+            self._in_string, self._escape = True, False
+        elif state == 'key':
+            if self._escape:
+                self._escape = False
+            elif char == '\\':
+                self._escape = True
+            elif char == '"':
+                self._key = json.loads(self._buffer[self._start:self._pos])
+                self._state = 'colon'
+        elif state == 'colon':
+            if char == ':':
+                self._state = 'value_start'
+            elif not char.isspace():
+                raise ValueError(f"Malformed JSON: expected ':' after {self._key!r}")
+        elif state == 'value_start':
+            if not char.isspace():
+                self._start, self._state, self._depth = self._pos - 1, 'value', 0
+                self._in_string, self._escape = False, False
+                self._pos -= 1
+        elif state == 'after_value' and char == ',':
+            self._state = 'member'
+        elif state in ('member', 'after_value') and char == '}':
+            self._state = 'done'
+        else:
+            raise ValueError(f"Malformed JSON: unexpected {char!r}")
+        return None
+
+    def _scan_value(self, char: str):
+        """Track strings and nesting until the current value closes"""
+        if self._in_string:
+            self._pos += 1
+            if self._escape:
+                self._escape = False
+            elif char == '\\':
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                if self._depth == 0:
+                    return self._close_value(self._pos)
+            return None
+
+        if self._depth == 0 and self._pos > self._start and (char in ',}' or char.isspace()):
+            # A bare number or literal ends at the first delimiter, which is not consumed
+            return self._close_value(self._pos)
+
+        self._pos += 1
+        if char == '"':
+            self._in_string = True
+        elif char in '[{':
+            self._depth += 1
+        elif char in ']}':
+            self._depth -= 1
+            if self._depth == 0:
+                return self._close_value(self._pos)
+        return None
+
+    def _close_value(self, end: int) -> Tuple[str, Any]:
+        text = self._buffer[self._start:end]
+        self._state = 'after_value'
+        try:
+            return self._key, json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Malformed JSON in section {self._key!r}: {str(e)}")
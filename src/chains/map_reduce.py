@@ -0,0 +1,68 @@
+import json
+from typing import Any, Callable, Dict, Iterator, List
+
+def payload_size(payload: Any) -> int:
+    """Length of a payload's compact JSON, the text a prompt carries for it"""
+    return len(json.dumps(payload, separators=(',', ':'), default=str))
+
+def _merge(base: Dict, piece: Dict) -> Dict:
+    """Deep-merge two nested dicts without modifying either"""
+    merged = dict(base)
+    for key, value in piece.items():
+        if isinstance(merged.get(key), dict) and isinstance(value, dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+def _split(data: Any, limit: int, size: Callable[[Any], int]) -> Iterator[Any]:
+    if not isinstance(data, dict) or len(data) == 0 or size(data) <= limit:
+        yield data
+        return
+    for key, value in data.items():
+        for piece in _split(value, limit, lambda value, key=key: size({key: value})):
+            yield {key: piece}
+
+def split_data(data: Dict, limit: int, size: Callable[[Any], int] = payload_size) -> List[Dict]:
+    """
+    Split nested data into pieces whose size() stays within limit
+
+    Data is split along its nesting (source, then topic, then indicator),
+    and each piece keeps the keys leading to it, so it still says where it
+    came from. Neighbouring pieces are packed back together up to the
+    limit. A single value too large to split becomes a piece of its own.
+    Size defaults to JSON characters; subtrees are measured together with
+    the keys leading to them.
+    """
+    pieces = list(_split(data, limit, size))
+    if len(pieces) <= 1:
+        return pieces
+    packed, current, total = [], {}, 0
+    for piece in pieces:
+        piece_size = size(piece)
+        if current and total + piece_size > limit:
+            packed.append(current)
+            current, total = {}, 0
+        current = _merge(current, piece)
+        total += piece_size
+    packed.append(current)
+    return packed
+
+def group_by_size(items: List[Any], limit: int, size: Callable[[Any], int] = payload_size) -> List[List[Any]]:
+    """
+    Group items in order into batches whose combined size stays within limit
+
+    Every batch but the last holds at least two items even when they are
+    over the limit, so reducing each batch always shrinks the list.
+    """
+    batches, current, total = [], [], 0
+    for item in items:
+        item_size = size(item)
+        if len(current) >= 2 and total + item_size > limit:
+            batches.append(current)
+            current, total = [], 0
+        current.append(item)
+        total += item_size
+    if current:
+        batches.append(current)
+    return batches
@@ -5,11 +5,17 @@ from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.runnables import RunnableSequence
 from typing import Dict
 import os
+import logging
+from src.chains.compaction import compact_json
+from src.services.llm_cache import cached_completion
 
 class PolicyChain:
     """LangChain implementation for policy brief generation"""
     
     def __init__(self):
+        # Estimated tokens of analysis a policy prompt may carry
+        self.token_budget = int(os.getenv('POLICY_TOKEN_BUDGET', '6000'))
+        self.logger = logging.getLogger(__name__)
         try:
             self.llm = ChatGoogleGenerativeAI(
                 model="gemini-pro",
@@ -29,19 +35,33 @@ class PolicyChain:
             ])
             
             # Create policy chain
-            self.chain = self.policy_prompt | self.llm | JsonOutputParser()
+            self._build_chain()
             
         except Exception as e:
             raise Exception(f"Failed to initialize policy chain: {str(e)}")
     
-    async def generate(self, analysis: Dict) -> Dict:
-        """Run policy generation chain on analysis results"""
+    async def generate(self, analysis: Dict, use_cache: bool = True) -> Dict:
+        """
+        Run policy generation chain on analysis results
+        
+        Briefs already generated for the same analysis are answered from the
+        LLM response cache unless use_cache is off.
+        """
         try:
-            result = await self.chain.ainvoke({"analysis": analysis})
-            return result
+            return await cached_completion(
+                "policy", self.get_prompt(), self.llm, analysis,
+                lambda: self.chain.ainvoke({"analysis": self._prompt_analysis(analysis)}),
+                use_cache
+            )
         except Exception as e:
             raise Exception(f"Policy chain failed: {str(e)}")
     
+    def _prompt_analysis(self, analysis: Dict) -> str:
+        """Compact the analysis for the prompt, logging its token estimate"""
+        text, stats = compact_json(analysis, self.token_budget)
+        self.logger.info(f"Policy prompt analysis: {stats['tokens_before']} -> {stats['tokens_after']} tokens")
+        return text
+    
     def get_prompt(self) -> str:
         """Get the current prompt template"""
         return self.policy_prompt.messages[0].content
@@ -51,4 +71,8 @@ class PolicyChain:
         self.policy_prompt = ChatPromptTemplate.from_messages([
             HumanMessage(content=new_prompt)
         ])
-        self.chain = self.policy_prompt | self.llm | JsonOutputParser()
+        self._build_chain()
+    
+    def _build_chain(self) -> None:
+        # The message holds the template text; it is compiled so {analysis} is filled in
+        self.chain = ChatPromptTemplate.from_template(self.get_prompt()) | self.llm | JsonOutputParser()
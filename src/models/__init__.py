@@ -8,6 +8,9 @@ from src.models.data_source import DataSource
 from src.models.analysis import Analysis
 from src.models.report import Report
 from src.models.policy import PolicyBrief
+from src.models.observation import Observation
+from src.models.data_blob import DataBlob
+from src.models.analysis_job import AnalysisJob
 
 # Register models with SQLAlchemy
-__all__ = ['db', 'User', 'DataSource', 'Analysis', 'Report', 'PolicyBrief']
+__all__ = ['db', 'User', 'DataSource', 'Analysis', 'Report', 'PolicyBrief', 'Observation', 'DataBlob', 'AnalysisJob']
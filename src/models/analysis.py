@@ -1,5 +1,7 @@
 from datetime import datetime
+from typing import Any, Iterable, Optional
 from src.models import db
+from src.models.data_blob import DataBlob
 
 class Analysis(db.Model):
     """Model for storing analysis results"""
@@ -18,7 +20,55 @@ class Analysis(db.Model):
     region = db.Column(db.String(100), nullable=True)
     date_range_start = db.Column(db.DateTime, nullable=True)
     date_range_end = db.Column(db.DateTime, nullable=True)
-    raw_data = db.Column(db.JSON, nullable=True)
+    # Fetched payloads live in data_blobs; the column holds {"$blob": digest}.
+    # Rows written before that hold the payload itself.
+    raw_data_ref = db.Column('raw_data', db.JSON, nullable=True)
     
     # Define relationships
     reports = db.relationship('Report', backref='analysis', lazy=True, cascade="all, delete-orphan")
+    job = db.relationship('AnalysisJob', backref='analysis', lazy=True, uselist=False, cascade="all, delete-orphan")
+    
+    @property
+    def raw_data(self) -> Optional[Any]:
+        """The fetched payload, loaded from blob storage on access"""
+        ref = self.raw_data_ref
+        if isinstance(ref, dict) and set(ref) == {'$blob'}:
+            return DataBlob.load(ref['$blob'])
+        return ref
+    
+    @property
+    def blob_digest(self) -> Optional[str]:
+        """Digest of the stored payload, if raw_data lives in data_blobs"""
+        ref = self.raw_data_ref
+        return ref['$blob'] if isinstance(ref, dict) and set(ref) == {'$blob'} else None
+    
+    def store_raw_data(self, payload: Optional[Any]) -> Optional[str]:
+        """
+        Store the payload once by content and keep only its reference
+        
+        The blob is written in the current transaction; the caller commits,
+        then releases the replaced payload (see release_blobs).
+        
+        Returns:
+            Digest of the payload this replaced, if any
+        """
+        replaced = self.blob_digest
+        self.raw_data_ref = None if payload is None else {'$blob': DataBlob.put(payload)}
+        return replaced if replaced != self.blob_digest else None
+    
+    @classmethod
+    def release_blobs(cls, digests: Iterable[Optional[str]]) -> int:
+        """
+        Delete stored payloads that no analysis references any more
+        
+        Runs in the current transaction; the caller commits.
+        
+        Returns:
+            Number of blobs deleted
+        """
+        referenced = db.func.json_extract(cls.raw_data_ref, '$."$blob"')
+        deleted = 0
+        for digest in set(filter(None, digests)):
+            if db.session.query(cls.id).filter(referenced == digest).first() is None:
+                deleted += DataBlob.query.filter_by(digest=digest).delete(synchronize_session=False)
+        return deleted
@@ -0,0 +1,46 @@
+from datetime import datetime
+from typing import Dict
+from src.models import db
+
+class AnalysisJob(db.Model):
+    """Model for queued analysis runs; the table doubles as the worker queue"""
+
+    __tablename__ = 'analysis_jobs'
+
+    # Progress reported for each pipeline stage
+    STAGES = {
+        'queued': 0,
+        'fetching': 10,
+        'validating': 35,
+        'analyzing': 40,
+        'saving': 90,
+        'done': 100
+    }
+
+    id = db.Column(db.Integer, primary_key=True)
+    analysis_id = db.Column(db.Integer, db.ForeignKey('analyses.id', ondelete='CASCADE'), nullable=False, unique=True)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued, running, completed, failed
+    stage = db.Column(db.String(20), nullable=False, default='queued')
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    params = db.Column(db.JSON, nullable=True)  # Request options the pipeline needs (indicators, use_cache)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    worker = db.Column(db.String(100), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    # Refreshed at every stage; a running job that stops beating is requeued
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self) -> Dict:
+        """Progress fields for API responses"""
+        return {
+            'status': self.status,
+            'stage': self.stage,
+            'progress': self.progress,
+            'attempts': self.attempts,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
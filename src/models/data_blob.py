@@ -0,0 +1,59 @@
+import hashlib
+import json
+import zlib
+from datetime import datetime
+from typing import Any, Optional
+from sqlalchemy.dialects.sqlite import insert
+from src.models import db
+
+class DataBlob(db.Model):
+    """Model for storing large JSON payloads once, keyed by the SHA-256 of their content"""
+
+    __tablename__ = 'data_blobs'
+
+    CODEC = 'zlib'
+    COMPRESSION_LEVEL = 6
+
+    digest = db.Column(db.String(64), primary_key=True)
+    codec = db.Column(db.String(10), nullable=False, default=CODEC)
+    size = db.Column(db.Integer, nullable=False)  # Uncompressed bytes
+    content = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    @staticmethod
+    def serialize(payload: Any) -> bytes:
+        """Canonical JSON, so equal payloads hash alike whatever their key order"""
+        return json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8')
+
+    @classmethod
+    def put(cls, payload: Any) -> str:
+        """
+        Store a payload unless an identical one is already stored
+
+        The row is written in the current transaction; the caller commits.
+
+        Returns:
+            The payload's digest
+        """
+        raw = cls.serialize(payload)
+        digest = hashlib.sha256(raw).hexdigest()
+        stmt = insert(cls).values(
+            digest=digest,
+            codec=cls.CODEC,
+            size=len(raw),
+            content=zlib.compress(raw, cls.COMPRESSION_LEVEL),
+            created_at=datetime.utcnow()
+        ).on_conflict_do_nothing(index_elements=['digest'])
+        db.session.execute(stmt)
+        return digest
+
+    @classmethod
+    def load(cls, digest: str) -> Optional[Any]:
+        """Decompress and parse a stored payload (None if it is missing)"""
+        row = db.session.query(cls.codec, cls.content).filter(cls.digest == digest).first()
+        if row is None:
+            return None
+        codec, content = row
+        if codec != 'zlib':
+            raise ValueError(f"Unsupported blob codec: {codec}")
+        return json.loads(zlib.decompress(content))
@@ -0,0 +1,116 @@
+from datetime import datetime
+from typing import Iterable, Optional
+from sqlalchemy.dialects.sqlite import insert
+from src.models import db
+from src.utils.indicator_frame import IndicatorFrame, FrameBuilder
+
+class Observation(db.Model):
+    """Model for storing individual indicator observations fetched from sources"""
+
+    __tablename__ = 'observations'
+    __table_args__ = (
+        db.UniqueConstraint('source', 'indicator', 'region', 'year', name='uq_observations_cell'),
+        db.Index('ix_observations_indicator_region_year', 'indicator', 'region', 'year'),
+        db.Index('ix_observations_source_topic_region_year', 'source', 'topic', 'region', 'year'),
+    )
+
+    UPSERT_CHUNK_SIZE = 500
+
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(50), nullable=False)  # UNICEF, WHO, WORLDBANK
+    topic = db.Column(db.String(100), nullable=False)
+    indicator = db.Column(db.String(100), nullable=False)
+    region = db.Column(db.String(10), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    value = db.Column(db.Float, nullable=True)
+    ci_low = db.Column(db.Float, nullable=True)
+    ci_high = db.Column(db.Float, nullable=True)
+    fetched_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    @classmethod
+    def upsert_frame(cls, frame: IndicatorFrame, fetched_at: Optional[datetime] = None) -> int:
+        """
+        Insert or update observations in chunked multi-row statements
+
+        Returns:
+            Number of rows written
+        """
+        fetched_at = fetched_at or datetime.utcnow()
+        return cls.upsert_rows((
+            {
+                'source': record['source'],
+                'topic': record['topic'],
+                'indicator': record['indicator'],
+                'region': record['region'],
+                'year': record['year'],
+                'value': record['value'],
+                'ci_low': record['ci_low'],
+                'ci_high': record['ci_high'],
+                'fetched_at': fetched_at
+            }
+            for record in frame.to_records()
+        ))
+
+    @classmethod
+    def upsert_rows(cls, rows: Iterable[dict]) -> int:
+        """Upsert row dicts keyed on (source, indicator, region, year) and commit"""
+        written = 0
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= cls.UPSERT_CHUNK_SIZE:
+                written += cls._upsert_chunk(chunk)
+                chunk = []
+        if chunk:
+            written += cls._upsert_chunk(chunk)
+        db.session.commit()
+        return written
+
+    @classmethod
+    def _upsert_chunk(cls, chunk: list) -> int:
+        # One statement may not touch the same row twice, so the last
+        # occurrence of a repeated cell wins
+        unique = {(row['source'], row['indicator'], row['region'], row['year']): row for row in chunk}
+        chunk = list(unique.values())
+        stmt = insert(cls).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['source', 'indicator', 'region', 'year'],
+            set_={
+                'topic': stmt.excluded.topic,
+                'value': stmt.excluded.value,
+                'ci_low': stmt.excluded.ci_low,
+                'ci_high': stmt.excluded.ci_high,
+                'fetched_at': stmt.excluded.fetched_at
+            }
+        )
+        db.session.execute(stmt)
+        return len(chunk)
+
+    @classmethod
+    def load_frame(cls,
+                   source: str,
+                   topics: Iterable[str],
+                   regions: Iterable[str],
+                   start_year: int,
+                   end_year: int,
+                   fetched_after: Optional[datetime] = None,
+                   indicators: Optional[Iterable[str]] = None) -> IndicatorFrame:
+        """Load stored observations for a source as an IndicatorFrame"""
+        query = db.session.query(
+            cls.source, cls.topic, cls.indicator, cls.region, cls.year,
+            cls.value, cls.ci_low, cls.ci_high
+        ).filter(
+            cls.source == source,
+            cls.topic.in_(list(topics)),
+            cls.region.in_(list(regions)),
+            cls.year.between(start_year, end_year)
+        )
+        if fetched_after is not None:
+            query = query.filter(cls.fetched_at >= fetched_after)
+        if indicators is not None:
+            query = query.filter(cls.indicator.in_(list(indicators)))
+
+        builder = FrameBuilder()
+        for row in query.yield_per(1000):
+            builder.append(*row)
+        return builder.build()
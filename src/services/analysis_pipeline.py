@@ -0,0 +1,376 @@
+from typing import AsyncIterator, Dict, List, Optional
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import os
+import socket
+import threading
+from flask import current_app
+from src.models import Analysis, AnalysisJob, db
+from src.services.data_service import DataService
+from src.services.progress import ProgressBroker, get_progress_broker, progress_channel
+from src.utils.helpers import app_extension
+from src.utils.indicator_stats import compute_statistics
+
+class AnalysisPipeline:
+    """
+    Fetch, analyze and persist analyses on a bounded pool of worker threads
+
+    create_analysis only stores the analysis with a queued AnalysisJob and
+    answers 202; ANALYSIS_WORKERS daemon threads claim queued rows from the
+    analysis_jobs table and run the pipeline, recording stage and progress
+    on the job as they go and publishing each step to the analysis's
+    progress channel for SSE clients. The queue is the table itself, so queued jobs
+    survive a restart and the workers of every process running the app
+    share it. Idle workers poll it every ANALYSIS_POLL_INTERVAL seconds for
+    jobs queued by other processes, and requeue running jobs whose
+    heartbeat is older than ANALYSIS_JOB_TIMEOUT (their worker died).
+    """
+
+    def __init__(self, app, data_service: Optional[DataService] = None, gemini_service=None):
+        self.app = app
+        self.data_service = data_service or DataService()
+        self._gemini_service = gemini_service
+        self._broker = None
+        self.logger = logging.getLogger(__name__)
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self._ready = threading.Condition()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def gemini_service(self):
+        if self._gemini_service is None:
+            from src.services.gemini_service import GeminiService
+            self._gemini_service = GeminiService()
+        return self._gemini_service
+
+    @property
+    def broker(self) -> ProgressBroker:
+        """The app's progress broker, shared with the SSE endpoints"""
+        if self._broker is None:
+            with self.app.app_context():
+                self._broker = get_progress_broker()
+        return self._broker
+
+    def start(self) -> None:
+        """Start the worker threads"""
+        if any(thread.is_alive() for thread in self._threads):
+            return
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._run, name=f'analysis-worker-{i}', daemon=True)
+            for i in range(max(1, self.app.config.get('ANALYSIS_WORKERS', 2)))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the workers once their current job finishes"""
+        self._stop.set()
+        with self._ready:
+            self._ready.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def enqueue(self, analysis: Analysis, params: Optional[Dict] = None) -> AnalysisJob:
+        """
+        Store an analysis together with its queued job and wake a worker
+
+        Args:
+            analysis: New analysis in 'pending' status
+            params: Request options the pipeline needs (indicators, use_cache)
+        """
+        analysis.job = AnalysisJob(params=params or {})
+        db.session.add(analysis)
+        db.session.commit()
+        self._publish(progress_channel('analysis', analysis.id), 'progress',
+                      stage='queued', progress=AnalysisJob.STAGES['queued'])
+        with self._ready:
+            self._ready.notify()
+        return analysis.job
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.requeue_stale()
+                job_id = self.run_next()
+            except Exception as e:
+                self.logger.error(f"Analysis worker failed: {str(e)}")
+                job_id = None
+            if job_id is None and not self._stop.is_set():
+                with self._ready:
+                    self._ready.wait(self.app.config.get('ANALYSIS_POLL_INTERVAL', 5))
+
+    def run_next(self) -> Optional[int]:
+        """
+        Claim the oldest queued job and run it to completion
+
+        Returns:
+            The job's id, or None when the queue is empty
+        """
+        with self.app.app_context():
+            job = self._claim()
+            if job is None:
+                return None
+            params = job.params or {}
+            try:
+                asyncio.run(self.process(
+                    job.analysis,
+                    job=job,
+                    indicators=params.get('indicators'),
+                    use_cache=params.get('use_cache', True)
+                ))
+            except Exception as e:
+                self.logger.error(f"Analysis {job.analysis_id} failed: {str(e)}")
+            return job.id
+
+    def _claim(self) -> Optional[AnalysisJob]:
+        """Move the oldest queued job to running; another worker may win the race for it"""
+        while True:
+            job_id = db.session.query(AnalysisJob.id).filter_by(status='queued').order_by(AnalysisJob.id).limit(1).scalar()
+            if job_id is None:
+                return None
+            now = datetime.utcnow()
+            claimed = AnalysisJob.query.filter_by(id=job_id, status='queued').update({
+                'status': 'running',
+                'worker': self.name,
+                'attempts': AnalysisJob.attempts + 1,
+                'started_at': now,
+                'heartbeat_at': now
+            }, synchronize_session=False)
+            db.session.commit()
+            if claimed:
+                return db.session.get(AnalysisJob, job_id)
+
+    async def process(self,
+                      analysis: Analysis,
+                      job: Optional[AnalysisJob] = None,
+                      indicators: Optional[List[str]] = None,
+                      use_cache: bool = True) -> Dict:
+        """
+        Fetch the analysis's data, run it through Gemini and store the results
+
+        Statistics computed from the data before Gemini is called go into
+        the prompt and the results ('statistics'). Each stage, every source
+        as it arrives, the statistics (with the 'analyzing' stage) and the
+        final results are published to the analysis's progress channel. The analysis ends up
+        completed, or failed with its error recorded. Without a job
+        (synchronous mode) no progress is written to the database.
+
+        Returns:
+            The analysis results
+        """
+        channel = progress_channel('analysis', analysis.id)
+        try:
+            raw_data = await self._fetch(analysis, job, channel, indicators)
+            statistics = self._precompute(analysis, job, channel, raw_data)
+            analysis_results = await self.gemini_service.analyze_data(raw_data, use_cache=use_cache, statistics=statistics)
+            analysis_results = {**analysis_results, 'statistics': statistics}
+            self._complete(analysis, job, channel, analysis_results)
+            return analysis_results
+        except Exception as e:
+            self._fail(analysis, job, channel, e)
+            raise
+
+    async def stream(self,
+                     analysis: Analysis,
+                     indicators: Optional[List[str]] = None,
+                     use_cache: bool = True) -> AsyncIterator[Dict]:
+        """
+        Run the pipeline like process(), yielding the analysis as Gemini writes it
+
+        Yields {'type': 'statistics', 'value'} as soon as the data is in,
+        {'type': 'section', 'name', 'value'} for each section of the
+        answer as soon as it is complete (also published as 'section'
+        progress events), then {'type': 'completed', 'analysis_id',
+        'results'}, or {'type': 'failed', 'error'} once the analysis has
+        been marked failed.
+        """
+        channel = progress_channel('analysis', analysis.id)
+        results = {}
+        try:
+            raw_data = await self._fetch(analysis, None, channel, indicators)
+            statistics = self._precompute(analysis, None, channel, raw_data)
+            yield {'type': 'statistics', 'value': statistics}
+            async for name, value in self.gemini_service.stream_analysis(raw_data, use_cache=use_cache, statistics=statistics):
+                results[name] = value
+                self._publish(channel, 'section', name=name, value=value)
+                yield {'type': 'section', 'name': name, 'value': value}
+            results['statistics'] = statistics
+            self._complete(analysis, None, channel, results)
+        except Exception as e:
+            self._fail(analysis, None, channel, e)
+            yield {'type': 'failed', 'error': str(e)}
+            return
+        yield {'type': 'completed', 'analysis_id': analysis.id, 'results': results}
+
+    async def _fetch(self,
+                     analysis: Analysis,
+                     job: Optional[AnalysisJob],
+                     channel: str,
+                     indicators: Optional[List[str]] = None) -> Dict:
+        """Fetch and store the analysis's data, reporting each source as it arrives"""
+        self._advance(channel, job, 'fetching')
+        # Sources report from a fetch thread, so nothing here touches the session
+        fetched, total = [], max(len(analysis.sources or ()), 1)
+        span = AnalysisJob.STAGES['validating'] - AnalysisJob.STAGES['fetching']
+
+        def on_source(source: str, data: Dict, ages: Dict) -> None:
+            fetched.append(source)
+            self._publish(
+                channel, 'source',
+                source=source,
+                data=data,
+                data_age=ages,
+                progress=AnalysisJob.STAGES['fetching'] + span * min(len(fetched), total) // total
+            )
+
+        raw_data = await self.data_service.get_data_async(
+            sources=analysis.sources,
+            topics=analysis.topics,
+            region=analysis.region,
+            start_date=analysis.date_range_start.isoformat(),
+            end_date=analysis.date_range_end.isoformat(),
+            indicators=indicators,
+            on_source=on_source
+        )
+        self._advance(channel, job, 'validating', sources=self._summarize(raw_data))
+        # Committed here, so no write lock is held through the LLM call
+        replaced = analysis.store_raw_data(raw_data)
+        db.session.commit()
+        if replaced:
+            self._release(replaced)
+        return raw_data
+
+    def _release(self, digest: str) -> None:
+        """Delete a replaced payload unless still referenced; cleanup never fails the pipeline"""
+        try:
+            Analysis.release_blobs([digest])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            self.logger.warning(f"Releasing data blob {digest} failed: {str(e)}")
+
+    def _precompute(self, analysis: Analysis, job: Optional[AnalysisJob], channel: str, raw_data: Dict) -> Dict:
+        """Compute the data's statistics and publish them with the 'analyzing' stage"""
+        try:
+            statistics = compute_statistics(raw_data, analysis.region or 'GHA')
+        except Exception as e:
+            # Gemini can still analyze the data without them
+            self.logger.error(f"Statistics for analysis {analysis.id} failed: {str(e)}")
+            statistics = {}
+        self._advance(channel, job, 'analyzing', statistics=statistics)
+        return statistics
+
+    def _complete(self, analysis: Analysis, job: Optional[AnalysisJob], channel: str, results: Dict) -> None:
+        self._advance(channel, job, 'saving')
+        analysis.analysis_results = results
+        analysis.status = 'completed'
+        analysis.updated_at = datetime.utcnow()
+        self._finish(job, 'completed')
+        db.session.commit()
+        self._publish(channel, 'completed', progress=AnalysisJob.STAGES['done'], results=results)
+
+    def _fail(self, analysis: Analysis, job: Optional[AnalysisJob], channel: str, error: Exception) -> None:
+        db.session.rollback()
+        analysis.status = 'failed'
+        analysis.error = str(error)
+        analysis.updated_at = datetime.utcnow()
+        self._finish(job, 'failed', str(error))
+        db.session.commit()
+        self._publish(channel, 'failed', error=str(error))
+
+    @staticmethod
+    def _summarize(raw_data: Dict) -> Dict:
+        """Topics each source returned, and its error if it failed"""
+        summary = {}
+        for source, payload in raw_data.items():
+            payload = payload if isinstance(payload, dict) else {}
+            summary[source] = {
+                'topics': [topic for topic in payload if topic != 'error'],
+                'error': payload.get('error')
+            }
+        return summary
+
+    def _publish(self, channel: str, event: str, **data) -> None:
+        """Publish a progress event; progress reporting never fails the pipeline"""
+        try:
+            self.broker.publish(channel, event, data)
+        except Exception as e:
+            self.logger.error(f"Publishing {event} to {channel} failed: {str(e)}")
+
+    def _advance(self, channel: str, job: Optional[AnalysisJob], stage: str, **details) -> None:
+        """Record and publish the stage an analysis reached, committing so pollers see it"""
+        self._publish(channel, 'progress', stage=stage, progress=AnalysisJob.STAGES[stage], **details)
+        if job is None:
+            return
+        job.stage = stage
+        job.progress = AnalysisJob.STAGES[stage]
+        job.heartbeat_at = datetime.utcnow()
+        db.session.commit()
+
+    def _finish(self, job: Optional[AnalysisJob], status: str, error: Optional[str] = None) -> None:
+        if job is None:
+            return
+        now = datetime.utcnow()
+        job.status = status
+        job.error = error
+        job.finished_at = now
+        job.heartbeat_at = now
+        if status == 'completed':
+            job.stage = 'done'
+            job.progress = AnalysisJob.STAGES['done']
+
+    def requeue_stale(self) -> int:
+        """
+        Requeue running jobs whose worker stopped reporting
+
+        A job that has used up ANALYSIS_JOB_MAX_ATTEMPTS fails instead.
+
+        Returns:
+            Number of jobs requeued or failed
+        """
+        with self.app.app_context():
+            cutoff = datetime.utcnow() - timedelta(seconds=self.app.config.get('ANALYSIS_JOB_TIMEOUT', 600))
+            max_attempts = self.app.config.get('ANALYSIS_JOB_MAX_ATTEMPTS', 2)
+            stale = AnalysisJob.query.filter(
+                AnalysisJob.status == 'running',
+                AnalysisJob.heartbeat_at < cutoff
+            ).all()
+            failed = []
+            for job in stale:
+                if job.attempts >= max_attempts:
+                    self._finish(job, 'failed', "Analysis worker stopped responding")
+                    job.analysis.status = 'failed'
+                    job.analysis.error = job.error
+                    job.analysis.updated_at = datetime.utcnow()
+                    failed.append(job)
+                else:
+                    job.status = 'queued'
+                    job.stage = 'queued'
+                    job.progress = AnalysisJob.STAGES['queued']
+                    job.worker = None
+            if stale:
+                db.session.commit()
+                self.logger.warning(f"Recovered {len(stale)} stalled analysis jobs")
+            for job in failed:
+                self._publish(progress_channel('analysis', job.analysis_id), 'failed', error=job.error)
+            return len(stale)
+
+def _build_analysis_pipeline() -> AnalysisPipeline:
+    app = current_app._get_current_object()
+    pipeline = AnalysisPipeline(app)
+    if app.config.get('ANALYSIS_QUEUE_ENABLED', True) and not app.testing:
+        pipeline.start()
+    return pipeline
+
+def get_analysis_pipeline() -> AnalysisPipeline:
+    """
+    The app's analysis pipeline
+
+    Its workers start with the first use in each process, so CLI commands
+    and processes that never serve analyses run none.
+    """
+    return app_extension('analysis_pipeline', _build_analysis_pipeline)
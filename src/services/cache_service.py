@@ -0,0 +1,284 @@
+from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict
+import fnmatch
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+def fetch_cache_key(source: str,
+                    topic: str,
+                    region: str,
+                    start_date: Optional[str] = None,
+                    end_date: Optional[str] = None,
+                    indicators: Optional[List[str]] = None,
+                    **kwargs) -> str:
+    """
+    Build the cache key for one (source, topic, region, date range) fetch
+
+    Keys are laid out as data:<region>:<source>:<topic>:<start>:<end>:<indicators>
+    so that glob patterns such as "data:GHA:*" or "data:*:WHO:*" select them.
+    """
+    indicator_part = ','.join(sorted(indicators)) if indicators else 'all'
+    return ':'.join([
+        'data',
+        region or '',
+        source.upper(),
+        topic,
+        start_date or '',
+        end_date or '',
+        indicator_part
+    ])
+
+class CacheService:
+    """
+    Two-tier cache: a size-bounded in-process LRU in front of a shared SQLite file
+
+    Invalidations bump a generation number stored in the file; every lookup
+    checks it first, and a process that sees it changed drops its memory
+    tier, so deleted entries are not served by any worker.
+    """
+
+    PURGE_EVERY = 500  # Purge expired disk entries every N writes
+
+    def __init__(self,
+                 path: Optional[str] = None,
+                 max_entries: int = 1024,
+                 default_ttl: int = 21600,
+                 max_stale: int = 0,
+                 max_disk_entries: int = 0):
+        """
+        Args:
+            path: SQLite file shared across workers (None disables the disk tier)
+            max_entries: Maximum number of entries held in memory
+            default_ttl: Time to live in seconds when set() is not given one
+            max_stale: Seconds expired entries stay readable through get_stale()
+            max_disk_entries: Maximum number of entries on disk, oldest evicted first (0: unbounded)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.default_ttl = default_ttl
+        self.max_stale = max_stale
+
+        # key -> (serialized value, stored_at, expires_at)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._generation = 0
+        self._stats = {
+            'hits': 0,
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'stale_hits': 0,
+            'sets': 0,
+            'evictions': 0
+        }
+
+        self._disk = None
+        if path:
+            self._disk = sqlite3.connect(path, timeout=10, check_same_thread=False)
+            if path != ':memory:':
+                self._disk.execute('PRAGMA journal_mode=WAL')
+            self._disk.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    stored_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            self._disk.execute(
+                'CREATE INDEX IF NOT EXISTS ix_cache_entries_expires_at ON cache_entries (expires_at)'
+            )
+            self._disk.execute(
+                'CREATE TABLE IF NOT EXISTS cache_meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)'
+            )
+            self._disk.execute("INSERT OR IGNORE INTO cache_meta (name, value) VALUES ('generation', 0)")
+            self._disk.commit()
+            self._generation = self._disk_generation() or 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a cached value, or None if missing or expired"""
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key: str) -> Optional[Tuple[Any, float]]:
+        """
+        Get an unexpired value with its age
+
+        Returns:
+            (value, age in seconds since it was stored), or None
+        """
+        now = time.time()
+        with self._lock:
+            self._sync_generation()
+            entry = self._memory.get(key)
+            if entry is not None and entry[2] > now:
+                self._memory.move_to_end(key)
+                self._stats['hits'] += 1
+                self._stats['memory_hits'] += 1
+                return json.loads(entry[0]), now - entry[1]
+
+            row = self._disk_get(key, now)
+            if row is None:
+                self._stats['misses'] += 1
+                return None
+
+            # Promote to the memory tier with its remaining lifetime
+            self._memory_put(key, row)
+            self._stats['hits'] += 1
+            self._stats['disk_hits'] += 1
+            return json.loads(row[0]), now - row[1]
+
+    def get_stale(self, key: str) -> Optional[Tuple[Any, float]]:
+        """
+        Get a value even if it has expired, as long as it is within max_stale
+        
+        Returns:
+            (value, age in seconds since it was stored), or None
+        """
+        now = time.time()
+        with self._lock:
+            self._sync_generation()
+            entry = self._memory.get(key)
+            if entry is None or entry[2] + self.max_stale <= now:
+                entry = self._disk_get(key, now - self.max_stale)
+            if entry is None or entry[2] + self.max_stale <= now:
+                return None
+            self._stats['stale_hits'] += 1
+            return json.loads(entry[0]), now - entry[1]
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        """Store a JSON-serializable value in both tiers"""
+        now = time.time()
+        entry = (json.dumps(value), now, now + (ttl if ttl is not None else self.default_ttl))
+        with self._lock:
+            self._memory_put(key, entry)
+            self._stats['sets'] += 1
+            if self._disk is not None:
+                try:
+                    self._disk.execute(
+                        'INSERT OR REPLACE INTO cache_entries (key, value, stored_at, expires_at) '
+                        'VALUES (?, ?, ?, ?)',
+                        (key, *entry)
+                    )
+                    self._writes += 1
+                    if self._writes % self.PURGE_EVERY == 0:
+                        self._disk.execute(
+                            'DELETE FROM cache_entries WHERE expires_at <= ?', (now - self.max_stale,)
+                        )
+                    if self.max_disk_entries:
+                        self._disk_trim()
+                    self._disk.commit()
+                except sqlite3.Error as e:
+                    # The memory tier still holds the value; a busy shared file must not fail the caller
+                    self._disk_rollback()
+                    self.logger.error(f"Cache disk tier write failed for {key}: {str(e)}")
+
+    def delete_pattern(self, pattern: str) -> int:
+        """Delete all entries whose key matches a glob pattern, in every worker"""
+        with self._lock:
+            keys = [key for key in self._memory if fnmatch.fnmatchcase(key, pattern)]
+            for key in keys:
+                del self._memory[key]
+            deleted = set(keys)
+
+            if self._disk is not None:
+                try:
+                    rows = self._disk.execute(
+                        'SELECT key FROM cache_entries WHERE key GLOB ?', (pattern,)
+                    ).fetchall()
+                    self._disk.execute('DELETE FROM cache_entries WHERE key GLOB ?', (pattern,))
+                    # Other workers drop their memory tier when they see the new generation
+                    self._disk.execute("UPDATE cache_meta SET value = value + 1 WHERE name = 'generation'")
+                    generation = self._disk.execute(
+                        "SELECT value FROM cache_meta WHERE name = 'generation'"
+                    ).fetchone()[0]
+                    self._disk.commit()
+                    self._generation = generation
+                    deleted.update(row[0] for row in rows)
+                except sqlite3.Error as e:
+                    self._disk_rollback()
+                    self.logger.error(f"Cache disk tier delete failed for {pattern}: {str(e)}")
+
+            return len(deleted)
+
+    def clear(self) -> int:
+        """Delete every entry from both tiers"""
+        return self.delete_pattern('*')
+
+    def get_stats(self) -> Dict:
+        """Get hit/miss counters and tier sizes"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+            if self._disk is not None:
+                stats['disk_entries'] = self._disk.execute(
+                    'SELECT COUNT(*) FROM cache_entries'
+                ).fetchone()[0]
+
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+    def _memory_put(self, key: str, entry: tuple) -> None:
+        """Insert into the LRU tier, evicting the least recently used entries"""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def _disk_trim(self) -> None:
+        """Evict the oldest disk entries beyond max_disk_entries"""
+        count = self._disk.execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0]
+        excess = count - self.max_disk_entries
+        if excess > 0:
+            self._disk.execute(
+                'DELETE FROM cache_entries WHERE key IN '
+                '(SELECT key FROM cache_entries ORDER BY stored_at LIMIT ?)',
+                (excess,)
+            )
+            self._stats['evictions'] += excess
+
+    def _disk_rollback(self) -> None:
+        """Abandon a failed disk transaction so the connection stays usable"""
+        try:
+            self._disk.rollback()
+        except sqlite3.Error:
+            pass
+
+    def _disk_generation(self) -> Optional[int]:
+        """Current invalidation generation of the shared file (None if unreadable)"""
+        try:
+            row = self._disk.execute("SELECT value FROM cache_meta WHERE name = 'generation'").fetchone()
+        except sqlite3.Error as e:
+            self.logger.error(f"Cache disk tier generation read failed: {str(e)}")
+            return None
+        return row[0] if row is not None else None
+
+    def _sync_generation(self) -> None:
+        """Drop the memory tier if another worker invalidated entries since the last lookup"""
+        if self._disk is None:
+            return
+        generation = self._disk_generation()
+        if generation is not None and generation != self._generation:
+            self._memory.clear()
+            self._generation = generation
+
+    def _disk_get(self, key: str, now: float) -> Optional[tuple]:
+        """Read an entry from the disk tier that expires after now"""
+        if self._disk is None:
+            return None
+        try:
+            return self._disk.execute(
+                'SELECT value, stored_at, expires_at FROM cache_entries '
+                'WHERE key = ? AND expires_at > ?',
+                (key, now)
+            ).fetchone()
+        except sqlite3.Error as e:
+            self.logger.error(f"Cache disk tier read failed for {key}: {str(e)}")
+            return None
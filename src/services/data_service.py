@@ -1,10 +1,22 @@
-from typing import List, Dict, Optional
-from datetime import datetime
+from typing import Callable, List, Dict, Optional, Tuple
+from collections import Counter
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+import asyncio
+import os
+import threading
+import time
+import numpy as np
 from flask import current_app
+from src.services.cache_service import CacheService, fetch_cache_key
+from src.services.single_flight import SingleFlight
+from src.tools.validation import ValidationReport
 from src.tools.unicef_tool import UNICEFDataTool
 from src.tools.who_tool import WHODataTool
 from src.tools.worldbank_tool import WorldBankTool
-from src.models import DataSource, db
+from src.models import Analysis, DataSource, Observation, db
+from src.utils.circuit_breaker import CircuitBreaker, get_breaker
+from src.utils.helpers import app_extension, parse_regions, parse_year_range
 
 class DataService:
     """Service for managing data fetching from multiple sources"""
@@ -13,6 +25,8 @@ class DataService:
         self._unicef_tool = None
         self._who_tool = None
         self._worldbank_tool = None
+        self._executor = None
+        self._executor_lock = threading.Lock()
     
     @property
     def unicef_tool(self):
@@ -32,10 +46,63 @@ class DataService:
             self._worldbank_tool = WorldBankTool()
         return self._worldbank_tool
     
+    @property
+    def source_tools(self) -> Dict:
+        """Tool instance for each supported source type"""
+        return {
+            'UNICEF': self.unicef_tool,
+            'WHO': self.who_tool,
+            'WORLDBANK': self.worldbank_tool
+        }
+    
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Bounded thread pool shared by concurrent source fetches"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=current_app.config.get('DATA_FETCH_MAX_WORKERS', 8),
+                        thread_name_prefix='data-fetch'
+                    )
+        return self._executor
+    
+    @property
+    def cache(self) -> Optional[CacheService]:
+        """
+        Fetch cache configured from the app, or None when disabled
+        
+        One cache is shared by every DataService of an app, so entries warmed
+        by the refresh scheduler are visible to request handlers.
+        """
+        if not current_app.config.get('FETCH_CACHE_ENABLED', True):
+            return None
+        return app_extension('fetch_cache', self._build_cache)
+    
+    @staticmethod
+    def _build_cache() -> CacheService:
+        path = current_app.config.get('FETCH_CACHE_PATH')
+        if path is None:
+            os.makedirs(current_app.instance_path, exist_ok=True)
+            path = os.path.join(current_app.instance_path, 'fetch_cache.db')
+        return CacheService(
+            path=path,
+            max_entries=current_app.config.get('FETCH_CACHE_MAX_ENTRIES', 1024),
+            default_ttl=current_app.config.get('FETCH_CACHE_TTL', 21600),
+            max_stale=current_app.config.get('FETCH_CACHE_MAX_STALE', 604800)
+        )
+    
+    @property
+    def flights(self) -> SingleFlight:
+        """In-flight upstream fetches, shared by every DataService of an app"""
+        return app_extension('fetch_flights', SingleFlight)
+    
     def get_data(self,
                 sources: List[str],
                 topics: List[str],
                 region: str = "GHA",
+                parallel: Optional[bool] = None,
+                use_cache: bool = True,
                 **kwargs) -> Dict:
         """
         Get data from multiple sources for specified topics
@@ -44,34 +111,365 @@ class DataService:
             sources: List of data sources to use (UNICEF, WHO, WORLDBANK)
             topics: List of topics to fetch
             region: Country/region code
+            parallel: Query all sources at the same time (defaults to DATA_FETCH_PARALLEL)
+            use_cache: Serve and store per-topic results through the fetch cache
             **kwargs: Additional parameters for data fetching
         """
+        return self.get_data_with_age(sources, topics, region, parallel, use_cache, **kwargs)[0]
+    
+    def get_data_with_age(self,
+                          sources: List[str],
+                          topics: List[str],
+                          region: str = "GHA",
+                          parallel: Optional[bool] = None,
+                          use_cache: bool = True,
+                          stale_while_revalidate: Optional[bool] = None,
+                          on_source: Optional[Callable[[str, Dict, Dict], None]] = None,
+                          **kwargs) -> Tuple[Dict, Dict]:
+        """
+        Get data like get_data, along with how old each topic's payload is
+        
+        In stale-while-revalidate mode (defaults to FETCH_SWR_ENABLED) an
+        expired cache entry younger than FETCH_SWR_WINDOW seconds is returned
+        at once and refreshed in the background, so the caller never waits
+        on the upstream for data it has seen recently.
+        
+        on_source, if given, is called with (source, data, ages) as each
+        source finishes, in completion order, so callers can report partial
+        results before the slowest source is done.
+        
+        Returns:
+            (data, ages) where ages maps source -> topic -> seconds since the
+            payload was fetched upstream (None when served from the local
+            observation store)
+        """
         # Fetch fresh data from each source
         data = {}
-        source_tools = {
-            'UNICEF': self.unicef_tool,
-            'WHO': self.who_tool,
-            'WORLDBANK': self.worldbank_tool
-        }
+        ages = {}
+        source_tools = self.source_tools
+        requested = [source for source in sources if source in source_tools]
+        cache = self.cache if use_cache else None
         
-        for source in sources:
-            if source not in source_tools:
-                continue
-                
-            try:
-                source_data = source_tools[source].fetch_data(
-                    topics=topics,
-                    region=region,
-                    **kwargs
+        if parallel is None:
+            parallel = current_app.config.get('DATA_FETCH_PARALLEL', True)
+        if stale_while_revalidate is None:
+            stale_while_revalidate = current_app.config.get('FETCH_SWR_ENABLED', True)
+        swr_window = current_app.config.get('FETCH_SWR_WINDOW', 86400) if stale_while_revalidate else 0
+        
+        if not parallel or len(requested) < 2:
+            for source in requested:
+                ages[source.lower()] = {}
+                data[source.lower()] = self._fetch_source(
+                    source, source_tools[source], topics, region, cache,
+                    swr_window=swr_window, ages=ages[source.lower()], **kwargs
                 )
-                validated_data = source_tools[source].validate_data(source_data)
-                data[source.lower()] = validated_data
-                
+                if on_source is not None:
+                    on_source(source.lower(), data[source.lower()], ages[source.lower()])
+            return data, ages
+        
+        # Fan out to all sources and wait at most SOURCE_FETCH_TIMEOUT for each
+        app = current_app._get_current_object()
+        deadline = current_app.config.get('SOURCE_FETCH_TIMEOUT', 45)
+        futures = {}
+        for source in requested:
+            ages[source.lower()] = {}
+            futures[self.executor.submit(
+                self._fetch_source_in_context,
+                app, source, source_tools[source], topics, region, cache,
+                swr_window=swr_window, ages=ages[source.lower()], **kwargs
+            )] = source
+        
+        try:
+            for future in as_completed(futures, timeout=deadline):
+                source = futures[future].lower()
+                data[source] = future.result()
+                if on_source is not None:
+                    on_source(source, data[source], ages[source])
+        except FutureTimeoutError:
+            for future, source in futures.items():
+                if source.lower() in data:
+                    continue
+                if future.done():
+                    data[source.lower()] = future.result()
+                    continue
+                # The worker keeps running; its result is simply discarded
+                future.cancel()
+                data[source.lower()] = {"error": f"{source} fetch timed out after {deadline} seconds"}
+                ages[source.lower()] = {}
+        
+        # Keep the requested source order whatever order they finished in
+        return {source.lower(): data[source.lower()] for source in requested}, ages
+    
+    async def get_data_async(self, *args, **kwargs) -> Dict:
+        """
+        get_data for async callers
+        
+        Runs on a worker thread so the event loop keeps serving other tasks;
+        concurrent asyncio tasks asking for the same data still share one
+        upstream fetch through the single-flight layer.
+        """
+        app = current_app._get_current_object()
+        return await asyncio.to_thread(self._get_data_in_context, app, *args, **kwargs)
+    
+    def _get_data_in_context(self, app, *args, **kwargs) -> Dict:
+        with app.app_context():
+            return self.get_data(*args, **kwargs)
+    
+    def _fetch_source(self,
+                      source: str,
+                      tool,
+                      topics: List[str],
+                      region: str,
+                      cache: Optional[CacheService] = None,
+                      refresh: bool = False,
+                      swr_window: float = 0,
+                      ages: Optional[Dict] = None,
+                      **kwargs) -> Dict:
+        """
+        Fetch and validate data from a single source, isolating its errors
+        
+        Topics are served from the fetch cache first, then from the local
+        observation store, and only the remainder is fetched upstream.
+        With refresh set every topic is fetched upstream and re-cached.
+        
+        While the source's circuit is open, or when the upstream fetch fails,
+        topics fall back to expired cache entries instead of waiting on it.
+        Expired entries younger than swr_window are served outright and
+        refreshed in the background.
+        
+        The age in seconds of each returned topic is recorded in ages. Any
+        error, wherever it arises, becomes {"error": ...} for this source
+        alone.
+        """
+        try:
+            return self._fetch_topics(source, tool, topics, region, cache, refresh, swr_window, ages, **kwargs)
+        except Exception as e:
+            current_app.logger.error(f"{source} fetch failed: {str(e)}")
+            return {"error": str(e)}
+    
+    def _fetch_topics(self,
+                      source: str,
+                      tool,
+                      topics: List[str],
+                      region: str,
+                      cache: Optional[CacheService],
+                      refresh: bool,
+                      swr_window: float,
+                      ages: Optional[Dict],
+                      **kwargs) -> Dict:
+        """Serve topics from the cache, the observation store or upstream (see _fetch_source)"""
+        data = {}
+        ages = ages if ages is not None else {}
+        missing = list(topics)
+        
+        if cache is not None and not refresh:
+            missing, revalidate = [], []
+            for topic in topics:
+                key = fetch_cache_key(source, topic, region, **kwargs)
+                entry = cache.get_entry(key)
+                if entry is None and swr_window:
+                    entry = cache.get_stale(key)
+                    if entry is not None and entry[1] <= swr_window:
+                        revalidate.append(topic)
+                    else:
+                        entry = None
+                if entry is None:
+                    missing.append(topic)
+                else:
+                    data[topic], ages[topic] = entry[0], round(entry[1], 1)
+            if revalidate:
+                self._revalidate(source, tool, revalidate, region, cache, **kwargs)
+            if not missing:
+                return data
+        
+        stored = {} if refresh else self._load_stored(source, tool, missing, region, **kwargs)
+        for topic, topic_data in stored.items():
+            data[topic] = topic_data
+            ages[topic] = None
+            if cache is not None:
+                cache.set(fetch_cache_key(source, topic, region, **kwargs), topic_data)
+        missing = [topic for topic in missing if topic not in stored]
+        if not missing:
+            return data
+        
+        breaker = get_breaker(source)
+        if breaker.state == CircuitBreaker.OPEN:
+            error = f"{source} is unavailable; retry in {breaker.retry_after():.0f} seconds"
+            return self._serve_stale(source, missing, region, None if refresh else cache, data, error,
+                                     ages=ages, **kwargs)
+        
+        # Topics another caller is already fetching are joined, not refetched
+        led, joined = self.flights.claim({
+            topic: fetch_cache_key(source, topic, region, **kwargs) for topic in missing
+        })
+        error = None
+        if led:
+            try:
+                error = self._fetch_upstream(source, tool, list(led), region, cache, data, led, **kwargs)
+            finally:
+                self.flights.release(led.values())
+        
+        for topic, flight in joined.items():
+            try:
+                result = flight.result()
             except Exception as e:
-                data[source.lower()] = {"error": str(e)}
+                error = str(e)
+                continue
+            if result is not None:
+                data[topic] = result
         
+        for topic in missing:
+            if topic in data:
+                ages[topic] = 0.0
+        if error is not None:
+            failed = [topic for topic in missing if topic not in data]
+            return self._serve_stale(source, failed, region, None if refresh else cache, data, error,
+                                     ages=ages, **kwargs)
         return data
     
+    def _fetch_upstream(self,
+                        source: str,
+                        tool,
+                        topics: List[str],
+                        region: str,
+                        cache: Optional[CacheService],
+                        data: Dict,
+                        flights: Dict,
+                        **kwargs) -> Optional[str]:
+        """
+        Fetch and validate topics from the source itself into data
+        
+        Resolves the single-flight entries this caller leads so that joined
+        callers get the same result.
+        
+        Returns:
+            The error message if the fetch failed, else None
+        """
+        try:
+            source_data = tool.fetch_data(
+                topics=topics,
+                region=region,
+                **kwargs
+            )
+            report = ValidationReport()
+            validated_data = tool.validate_data(source_data, report)
+            
+        except Exception as e:
+            self.flights.fail(flights, e)
+            return str(e)
+        
+        if report.rejected:
+            current_app.logger.debug(f"{source} validation rejected: {report.to_dict()['rejections']}")
+        
+        if cache is not None:
+            for topic in topics:
+                if topic in validated_data:
+                    cache.set(fetch_cache_key(source, topic, region, **kwargs), validated_data[topic])
+        
+        data.update(validated_data)
+        self.flights.resolve(flights, validated_data)
+        return None
+    
+    def _serve_stale(self,
+                     source: str,
+                     topics: List[str],
+                     region: str,
+                     cache: Optional[CacheService],
+                     data: Dict,
+                     error: str,
+                     ages: Optional[Dict] = None,
+                     **kwargs) -> Dict:
+        """Fill topics a failing source cannot serve from expired cache entries"""
+        ages = ages if ages is not None else {}
+        if cache is not None:
+            for topic in topics:
+                entry = cache.get_stale(fetch_cache_key(source, topic, region, **kwargs))
+                if entry is not None:
+                    data[topic], ages[topic] = entry[0], round(entry[1], 1)
+        if not data:
+            return {"error": error}
+        current_app.logger.warning(f"{source} fetch failed, serving cached data: {error}")
+        return data
+    
+    def _revalidate(self,
+                    source: str,
+                    tool,
+                    topics: List[str],
+                    region: str,
+                    cache: CacheService,
+                    **kwargs) -> None:
+        """Refresh stale cached topics on the fetch pool, unless already in flight"""
+        topics = [
+            topic for topic in topics
+            if not self.flights.in_flight(fetch_cache_key(source, topic, region, **kwargs))
+        ]
+        if not topics:
+            return
+        self.executor.submit(
+            self._fetch_source_in_context,
+            current_app._get_current_object(), source, tool, topics, region, cache,
+            refresh=True, **kwargs
+        )
+    
+    def _load_stored(self,
+                     source: str,
+                     tool,
+                     topics: List[str],
+                     region: str,
+                     start_date: Optional[str] = None,
+                     end_date: Optional[str] = None,
+                     indicators: Optional[List[str]] = None,
+                     **kwargs) -> Dict:
+        """
+        Serve topics from the local observation store
+        
+        A topic is only served locally when fresh observations exist for every
+        series the tool would fetch for it (its planned indicators) in every
+        requested region and year; otherwise it is left for the upstream fetch.
+        """
+        if not current_app.config.get('OBSERVATION_STORE_ENABLED', True):
+            return {}
+        
+        planned = tool.stored_series(topics, indicators)
+        if not planned:
+            return {}
+        start_year, end_year = parse_year_range(start_date, end_date)
+        regions = parse_regions(region)
+        max_age = current_app.config.get('OBSERVATION_MAX_AGE', 604800)
+        
+        try:
+            frame = Observation.load_frame(
+                source, {key[0] for keys in planned.values() for key in keys}, regions, start_year, end_year,
+                fetched_after=datetime.utcnow() - timedelta(seconds=max_age),
+                indicators={key[1] for keys in planned.values() for key in keys}
+            )
+        except Exception as e:
+            current_app.logger.error(f"Observation store lookup failed for {source}: {str(e)}")
+            return {}
+        if not len(frame):
+            return {}
+        
+        cells = set(zip(frame['topic'].tolist(), frame['indicator'].tolist(),
+                        frame['region'].tolist(), frame['year'].tolist()))
+        covered = {
+            topic: keys for topic, keys in planned.items()
+            if all((*key, r, year) in cells
+                   for key in keys for r in regions for year in range(start_year, end_year + 1))
+        }
+        if not covered:
+            return {}
+        # Cells stored without a value were checked upstream and count as
+        # covered, but only real values of the planned series are served
+        keys = np.array([f"{key[0]}/{key[1]}" for keys in covered.values() for key in keys])
+        served = np.isin(np.char.add(np.char.add(frame['topic'], '/'), frame['indicator']), keys)
+        payload = tool.from_frame(frame.filter(served & frame.valid_mask()))
+        return {topic: payload[topic] for topic in covered if topic in payload}
+    
+    def _fetch_source_in_context(self, app, *args, **kwargs) -> Dict:
+        """Run a single source fetch on a worker thread with its own app context"""
+        with app.app_context():
+            return self._fetch_source(*args, **kwargs)
+    
     def get_available_sources(self) -> List[Dict]:
         """Get list of available data sources and their status"""
         sources = DataSource.query.all()
@@ -81,7 +479,8 @@ class DataService:
             'type': source.type,
             'status': source.status,
             'last_fetch': source.last_fetch.isoformat() if source.last_fetch else None,
-            'metadata': source.source_metadata
+            'metadata': source.source_metadata,
+            'circuit': get_breaker(source.type).to_dict()
         } for source in sources]
     
     def get_source_metadata(self, source_type: str) -> Dict:
@@ -99,47 +498,115 @@ class DataService:
         }
     
     def refresh_data_sources(self) -> Dict[str, str]:
-        """Refresh all data sources and return their status"""
-        sources = DataSource.query.all()
-        status = {}
+        """Refresh all data sources in parallel and return their status"""
+        source_tools = self.source_tools
+        sources = [(source.type, source.name) for source in DataSource.query.all()
+                   if source.type in source_tools]
         
-        source_tools = {
-            'UNICEF': self.unicef_tool,
-            'WHO': self.who_tool,
-            'WORLDBANK': self.worldbank_tool
+        app = current_app._get_current_object()
+        futures = {
+            name: self.executor.submit(self._refresh_source_in_context, app, source_type)
+            for source_type, name in sources
         }
         
-        for source in sources:
-            try:
-                if source.type in source_tools:
-                    # Fetch sample data to verify source is working
-                    data = source_tools[source.type].fetch_data(
-                        topics=list(source_tools[source.type].ENDPOINTS.keys())[:1],
-                        region="GHA"
-                    )
-                    source.status = 'active' if data else 'error'
-                    source.last_fetch = datetime.utcnow()
-                    status[source.name] = source.status
-                    
-            except Exception as e:
-                source.status = 'error'
-                source.metadata = {
-                    **source.metadata,
-                    'last_error': str(e),
-                    'last_error_time': datetime.utcnow().isoformat()
-                }
-                status[source.name] = f"error: {str(e)}"
-        
-        db.session.commit()
+        status = {}
+        for name, future in futures.items():
+            result = future.result()
+            status[name] = (f"error: {result['error']}" if result['status'] == 'error'
+                            else result['status'])
         return status
     
+    def refresh_source(self,
+                       source_type: str,
+                       pairs: Optional[List[Tuple[str, ...]]] = None) -> Dict:
+        """
+        Re-fetch a source upstream, warm the fetch cache and record the outcome
+        
+        Args:
+            source_type: Source to refresh (UNICEF, WHO, WORLDBANK)
+            pairs: (topic, region) or (topic, region, start_date, end_date)
+                tuples to fetch; dates default to REFRESH_START_DATE and
+                REFRESH_END_DATE (default: the most requested ones)
+        Returns:
+            Refresh outcome with status, duration_ms, pairs and any error
+        """
+        tool = self.source_tools[source_type]
+        if pairs is None:
+            pairs = self.get_hot_pairs(
+                source_type, current_app.config.get('REFRESH_WARM_PAIRS', 5)
+            ) or [(topic, 'GHA') for topic in tool.ENDPOINTS]
+        
+        # Warm the same cache keys the analysis pipeline reads, dates included
+        default_window = tuple(
+            datetime.fromisoformat(current_app.config.get(name, default)).isoformat()
+            for name, default in (('REFRESH_START_DATE', '2023-01-01'), ('REFRESH_END_DATE', '2024-12-31'))
+        )
+        topics_by_request = {}
+        for topic, region, *window in pairs:
+            start_date, end_date = window or default_window
+            topics_by_request.setdefault((region, start_date, end_date), []).append(topic)
+        
+        started = time.monotonic()
+        errors = []
+        for (region, start_date, end_date), topics in topics_by_request.items():
+            result = self._fetch_source(source_type, tool, topics, region, self.cache, refresh=True,
+                                        start_date=start_date, end_date=end_date)
+            if 'error' in result:
+                errors.append(f"{region}: {result['error']}")
+        
+        outcome = {
+            'status': 'error' if errors else 'active',
+            'started_at': datetime.utcnow().isoformat(),
+            'duration_ms': round((time.monotonic() - started) * 1000, 1),
+            'pairs': len(pairs),
+            'error': '; '.join(errors) or None
+        }
+        
+        # The tool's own commits may have expired the row, so load it fresh
+        source = DataSource.query.filter_by(type=source_type).first()
+        if source is not None:
+            metadata = {**(source.source_metadata or {}), 'last_refresh': outcome}
+            if errors:
+                metadata['last_error'] = outcome['error']
+                metadata['last_error_time'] = outcome['started_at']
+            else:
+                source.last_fetch = datetime.utcnow()
+            source.status = outcome['status']
+            source.source_metadata = metadata
+            db.session.commit()
+        return outcome
+    
+    def _refresh_source_in_context(self, app, *args, **kwargs) -> Dict:
+        """Run a source refresh on a worker thread with its own app context"""
+        with app.app_context():
+            return self.refresh_source(*args, **kwargs)
+    
+    def get_hot_pairs(self, source_type: str, limit: int = 5, history: int = 500) -> List[Tuple[str, ...]]:
+        """
+        Most frequently requested (topic, region, start_date, end_date) for a source
+        
+        Counted over the most recent analyses, which record the sources,
+        topics, region and date range each request asked for. Dates are
+        formatted the way the analysis pipeline passes them to get_data, so
+        they name the same cache keys; analyses without dates count as
+        (topic, region).
+        """
+        counts = Counter()
+        recent = db.session.query(
+            Analysis.sources, Analysis.topics, Analysis.region,
+            Analysis.date_range_start, Analysis.date_range_end
+        ).order_by(Analysis.created_at.desc()).limit(history)
+        for sources, topics, region, start, end in recent:
+            if source_type not in [str(source).upper() for source in sources or []]:
+                continue
+            window = (start.isoformat(), end.isoformat()) if start and end else ()
+            for topic in topics or []:
+                counts[(topic, region or 'GHA', *window)] += 1
+        return [pair for pair, _ in counts.most_common(limit)]
+    
     def get_source_indicators(self, source_type: str) -> Dict[str, List[str]]:
         """Get available indicators for a specific data source"""
-        source_tools = {
-            'UNICEF': self.unicef_tool,
-            'WHO': self.who_tool,
-            'WORLDBANK': self.worldbank_tool
-        }
+        source_tools = self.source_tools
         
         if source_type not in source_tools:
             return {}
@@ -151,14 +618,25 @@ class DataService:
         Clear cache entries matching pattern
         
         Args:
-            pattern: Redis key pattern to match (e.g., "data:GHA:*")
+            pattern: Cache key glob pattern to match (e.g., "data:GHA:*")
         Returns:
             Number of keys deleted
         """
+        if self.cache is None:
+            return 0
         if pattern:
-            keys = self.redis_client.keys(pattern)
-            if keys:
-                return self.redis_client.delete(*keys)
-        else:
-            return self.redis_client.flushdb()
-        return 0
+            return self.cache.delete_pattern(pattern)
+        return self.cache.clear()
+    
+    def get_cache_stats(self) -> Dict:
+        """Get fetch cache hit and miss counters"""
+        if self.cache is None:
+            return {'enabled': False}
+        return {'enabled': True, **self.cache.get_stats()}
+    
+    def get_fetch_stats(self) -> Dict:
+        """Get cache and request coalescing counters for upstream fetches"""
+        return {
+            'cache': self.get_cache_stats(),
+            'coalescing': self.flights.get_stats()
+        }
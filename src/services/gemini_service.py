@@ -1,6 +1,8 @@
-from typing import Dict
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
 from src.chains.analysis_chain import AnalysisChain
 from src.chains.policy_chain import PolicyChain
+from src.services.llm_cache import get_llm_cache
+from src.utils.indicator_stats import compute_statistics
 import os
 
 class GeminiService:
@@ -14,54 +16,88 @@ class GeminiService:
         if not os.getenv('GOOGLE_API_KEY'):
             raise EnvironmentError("GOOGLE_API_KEY environment variable is required")
     
-    async def analyze_data(self, data: Dict) -> Dict:
+    async def analyze_data(self, data: Dict, use_cache: bool = True, statistics: Optional[Dict] = None) -> Dict:
         """
         Analyze children's welfare data
         
         Args:
             data: Dictionary containing data from various sources
+            use_cache: Reuse a cached response for identical input
+            statistics: Precomputed statistics of the data (computed here if not given)
             
         Returns:
             Dictionary containing analysis results
         """
         try:
-            analysis_result = await self.analysis_chain.analyze(data)
+            if statistics is None:
+                statistics = compute_statistics(data)
+            analysis_result = await self.analysis_chain.analyze(data, use_cache=use_cache, statistics=statistics)
             return analysis_result
         except Exception as e:
             raise Exception(f"Analysis failed: {str(e)}")
     
-    async def generate_policy_brief(self, analysis: Dict) -> Dict:
+    async def stream_analysis(self,
+                              data: Dict,
+                              use_cache: bool = True,
+                              statistics: Optional[Dict] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Analyze children's welfare data, yielding each section as soon as it is complete
+        
+        Args:
+            data: Dictionary containing data from various sources
+            use_cache: Replay a cached response for identical input
+            statistics: Precomputed statistics of the data (computed here if not given)
+            
+        Yields:
+            (section, value) pairs such as ("key_findings", [...])
+        """
+        try:
+            if statistics is None:
+                statistics = compute_statistics(data)
+            async for section in self.analysis_chain.astream(data, use_cache=use_cache, statistics=statistics):
+                yield section
+        except Exception as e:
+            raise Exception(f"Analysis failed: {str(e)}")
+    
+    async def generate_policy_brief(self, analysis: Dict, use_cache: bool = True) -> Dict:
         """
         Generate policy brief from analysis
         
         Args:
             analysis: Dictionary containing analysis results
+            use_cache: Reuse a cached brief for identical analysis results
             
         Returns:
             Dictionary containing policy brief
         """
         try:
-            brief_result = await self.policy_chain.generate(analysis)
+            brief_result = await self.policy_chain.generate(analysis, use_cache=use_cache)
             return brief_result
         except Exception as e:
             raise Exception(f"Policy brief generation failed: {str(e)}")
     
-    async def process_complete_pipeline(self, data: Dict) -> Dict:
+    async def process_complete_pipeline(self, data: Dict, use_cache: bool = True) -> Dict:
         """
         Run complete analysis and policy brief generation pipeline
         
         Args:
             data: Raw data from various sources
+            use_cache: Reuse cached responses for identical input
             
         Returns:
             Dictionary containing both analysis and policy brief
         """
         try:
-            analysis_result = await self.analyze_data(data)
-            brief_result = await self.generate_policy_brief(analysis_result)
+            analysis_result = await self.analyze_data(data, use_cache=use_cache)
+            brief_result = await self.generate_policy_brief(analysis_result, use_cache=use_cache)
             return {
                 "analysis": analysis_result,
                 "policy_brief": brief_result
             }
         except Exception as e:
             raise Exception(f"Pipeline processing failed: {str(e)}")
+    
+    def get_cache_stats(self) -> Dict:
+        """Get LLM response cache counters (empty when the cache is disabled)"""
+        cache = get_llm_cache()
+        return cache.get_stats() if cache is not None else {}
@@ -0,0 +1,340 @@
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+from datetime import datetime
+import csv
+import json
+import logging
+import math
+import os
+from src.models import DataSource, Observation, db
+from src.tools.sdmx import sdmx_row_parser
+from src.tools.unicef_tool import UNICEFDataTool
+from src.tools.who_tool import WHODataTool
+from src.tools.worldbank_tool import WorldBankTool
+
+# Column names accepted for WHO exports: GHO OData CSV first, then the
+# GHO website's "(CODE)" style download
+WHO_COLUMNS = {
+    'indicator': ('IndicatorCode', 'GHO (CODE)'),
+    'region': ('SpatialDim', 'COUNTRY (CODE)', 'REGION (CODE)'),
+    'year': ('TimeDim', 'YEAR (CODE)'),
+    'value': ('NumericValue', 'Numeric'),
+    'low': ('Low',),
+    'high': ('High',)
+}
+WHO_DIMENSION_COLUMNS = ('Dim1', 'Dim2', 'Dim3', 'SEX (CODE)', 'RESIDENCEAREATYPE (CODE)')
+
+# Dimension codes of aggregate rows; the store keeps one value per cell, so
+# per-sex or per-area breakdowns are skipped in favour of the totals
+WHO_TOTAL_CODES = WHODataTool.GHO_TOTAL_CODES
+
+class IngestService:
+    """Stream bulk World Bank, WHO and UNICEF exports from local files into the observation store"""
+
+    PROGRESS_SUFFIX = '.ingest-progress'
+
+    def __init__(self, batch_size: int = 5000):
+        self.batch_size = batch_size
+        self.logger = logging.getLogger(__name__)
+
+    def ingest_worldbank(self,
+                         path: str,
+                         indicators: Optional[Iterable[str]] = None,
+                         countries: Optional[Iterable[str]] = None,
+                         all_indicators: bool = False,
+                         resume: bool = True,
+                         on_batch: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        Load a World Development Indicators bulk CSV (WDICSV.csv or an API_*.csv download)
+
+        Each row holds one country and indicator with a column per year.
+
+        Args:
+            path: CSV file to read
+            indicators: Indicator codes to load (default: the codes in WorldBankTool.INDICATOR_CODES)
+            countries: ISO3 country codes to load (default: all)
+            all_indicators: Load every indicator; codes without a topic are filed under "wdi"
+            resume: Continue after the last committed batch of an interrupted run
+            on_batch: Called with progress stats after every committed batch
+        Returns:
+            Ingestion stats
+        """
+        topic_by_code = {
+            code: topic
+            for topic, codes in WorldBankTool.INDICATOR_CODES.items()
+            for code in codes.values()
+        }
+        wanted = None if all_indicators else set(indicators or topic_by_code)
+        countries = {code.upper() for code in countries} if countries else None
+
+        def parse(header: List[str]) -> Callable[[List[str]], Iterator[Dict]]:
+            country_col = header.index('Country Code')
+            code_col = header.index('Indicator Code')
+            year_cols = [(i, int(name)) for i, name in enumerate(header) if name.strip().isdigit()]
+
+            def rows(row: List[str]) -> Iterator[Dict]:
+                if len(row) <= code_col:
+                    return
+                code, country = row[code_col].strip(), row[country_col].strip().upper()
+                if (wanted is not None and code not in wanted) or (countries and country not in countries):
+                    return
+                topic = topic_by_code.get(code, 'wdi')
+                for i, year in year_cols:
+                    value = _to_number(row[i]) if i < len(row) else None
+                    if value is not None:
+                        yield _observation('WORLDBANK', topic, code, country, year, value)
+            return rows
+
+        return self._ingest('WORLDBANK', path, ('Country Code', 'Indicator Code'), parse, resume, on_batch)
+
+    def ingest_who(self,
+                   path: str,
+                   indicators: Optional[Iterable[str]] = None,
+                   countries: Optional[Iterable[str]] = None,
+                   all_indicators: bool = False,
+                   resume: bool = True,
+                   on_batch: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        Load a WHO Global Health Observatory CSV export
+
+        Each row holds one indicator, place and period. Indicators known to
+        WHODataTool are stored under their topic and indicator name.
+
+        Args:
+            path: CSV file to read
+            indicators: GHO indicator codes to load (default: the codes in WHODataTool.GHO_INDICATORS)
+            countries: Country or region codes to load (default: all)
+            all_indicators: Load every indicator; unknown codes are filed under "gho"
+            resume: Continue after the last committed batch of an interrupted run
+            on_batch: Called with progress stats after every committed batch
+        Returns:
+            Ingestion stats
+        """
+        names = {
+            code: (topic, name)
+            for topic, codes in WHODataTool.GHO_INDICATORS.items()
+            for name, code in codes.items()
+        }
+        wanted = None if all_indicators else set(indicators or names)
+        countries = {code.upper() for code in countries} if countries else None
+
+        def parse(header: List[str]) -> Callable[[List[str]], Iterator[Dict]]:
+            cols = {field: _find_column(header, aliases) for field, aliases in WHO_COLUMNS.items()}
+            missing = [field for field in ('indicator', 'region', 'year', 'value') if cols[field] is None]
+            if missing:
+                raise ValueError(f"WHO export is missing columns for: {', '.join(missing)}")
+            dimension_cols = [i for i, name in enumerate(header) if name in WHO_DIMENSION_COLUMNS]
+
+            def cell(row: List[str], field: str) -> str:
+                i = cols[field]
+                return row[i].strip() if i is not None and i < len(row) else ''
+
+            def rows(row: List[str]) -> Iterator[Dict]:
+                code, region = cell(row, 'indicator'), cell(row, 'region').upper()
+                if (wanted is not None and code not in wanted) or (countries and region not in countries):
+                    return
+                if any(i < len(row) and row[i].strip() not in WHO_TOTAL_CODES for i in dimension_cols):
+                    return
+                year, value = cell(row, 'year'), _to_number(cell(row, 'value'))
+                if value is None or not year[:4].isdigit() or not region:
+                    return
+                topic, name = names.get(code, ('gho', code))
+                yield _observation('WHO', topic, name, region, int(year[:4]), value,
+                                   _to_number(cell(row, 'low')), _to_number(cell(row, 'high')))
+            return rows
+
+        return self._ingest('WHO', path, ('IndicatorCode', 'GHO (CODE)'), parse, resume, on_batch)
+
+    def ingest_unicef(self,
+                      path: str,
+                      indicators: Optional[Iterable[str]] = None,
+                      countries: Optional[Iterable[str]] = None,
+                      all_indicators: bool = False,
+                      resume: bool = True,
+                      on_batch: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        Load a UNICEF Data Warehouse SDMX-CSV export
+
+        Id-only and labelled exports are both accepted. Only total rows are
+        kept, and indicators known to UNICEFDataTool are stored under their
+        topic and indicator name.
+
+        Args:
+            path: CSV file to read
+            indicators: SDMX indicator codes to load (default: the codes in UNICEFDataTool.SDMX_INDICATORS)
+            countries: Country or region codes to load (default: all)
+            all_indicators: Load every indicator; unknown codes are filed under "sdmx"
+            resume: Continue after the last committed batch of an interrupted run
+            on_batch: Called with progress stats after every committed batch
+        Returns:
+            Ingestion stats
+        """
+        names = {
+            code: (topic, name)
+            for topic, codes in UNICEFDataTool.SDMX_INDICATORS.items()
+            for name, code in codes.items()
+        }
+        wanted = None if all_indicators else set(indicators or names)
+        countries = {code.upper() for code in countries} if countries else None
+
+        def parse(header: List[str]) -> Callable[[List[str]], Iterator[Dict]]:
+            parse_row = sdmx_row_parser(header)
+
+            def rows(row: List[str]) -> Iterator[Dict]:
+                observation = parse_row(row)
+                if observation is None:
+                    return
+                code, region, year, value, low, high = observation
+                if (wanted is not None and code not in wanted) or (countries and region not in countries):
+                    return
+                topic, name = names.get(code, ('sdmx', code))
+                yield _observation('UNICEF', topic, name, region, year, value, low, high)
+            return rows
+
+        return self._ingest('UNICEF', path, ('DATAFLOW', 'REF_AREA'), parse, resume, on_batch)
+
+    def _ingest(self,
+                source: str,
+                path: str,
+                header_markers: Sequence[str],
+                parse: Callable[[List[str]], Callable[[List[str]], Iterator[Dict]]],
+                resume: bool,
+                on_batch: Optional[Callable[[Dict], None]]) -> Dict:
+        """
+        Stream a CSV through a row parser into batched upserts
+
+        Only the current batch is held in memory. After every committed
+        batch the number of consumed rows is checkpointed next to the file,
+        so a rerun skips straight past work that is already stored.
+        """
+        fingerprint = self._fingerprint(path)
+        skip = self._read_progress(path, source, fingerprint) if resume else 0
+        stats = {
+            'source': source,
+            'path': path,
+            'resumed_from': skip,
+            'rows_read': 0,
+            'observations': 0,
+            'batches': 0
+        }
+        fetched_at = datetime.utcnow()
+
+        with open(path, newline='', encoding='utf-8-sig') as handle:
+            reader = csv.reader(handle)
+            header = self._find_header(reader, header_markers)
+            rows = parse(header)
+
+            batch = []
+            for row in reader:
+                stats['rows_read'] += 1
+                if stats['rows_read'] <= skip:
+                    continue
+                for observation in rows(row):
+                    observation['fetched_at'] = fetched_at
+                    batch.append(observation)
+                if len(batch) >= self.batch_size:
+                    self._commit_batch(batch, stats, path, fingerprint, on_batch)
+                    batch = []
+            if batch:
+                self._commit_batch(batch, stats, path, fingerprint, on_batch)
+
+        self._clear_progress(path)
+        self._mark_fetched(source, fetched_at)
+        self.logger.info(
+            f"Ingested {stats['observations']} {source} observations from {path} "
+            f"({stats['rows_read']} rows, resumed from row {skip})"
+        )
+        return stats
+
+    def _mark_fetched(self, source: str, fetched_at: datetime) -> None:
+        """Record the load as the source's last fetch so tools treat its cells as fresh"""
+        data_source = DataSource.query.filter_by(type=source).first()
+        if data_source is None:
+            return
+        if data_source.last_fetch is None or data_source.last_fetch < fetched_at:
+            data_source.last_fetch = fetched_at
+            db.session.commit()
+
+    def _commit_batch(self,
+                      batch: List[Dict],
+                      stats: Dict,
+                      path: str,
+                      fingerprint: Dict,
+                      on_batch: Optional[Callable[[Dict], None]]) -> None:
+        stats['observations'] += Observation.upsert_rows(batch)
+        stats['batches'] += 1
+        self._write_progress(path, stats['source'], fingerprint, stats['rows_read'])
+        if on_batch is not None:
+            on_batch(stats)
+
+    @staticmethod
+    def _find_header(reader: Iterator[List[str]], markers: Sequence[str]) -> List[str]:
+        """Skip preamble lines (API_*.csv downloads carry four) up to the header row"""
+        for row in reader:
+            cells = [cell.strip() for cell in row]
+            if any(marker in cells for marker in markers):
+                return cells
+        raise ValueError(f"No header row with any of {', '.join(markers)} found")
+
+    @staticmethod
+    def _fingerprint(path: str) -> Dict:
+        stat = os.stat(path)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    @classmethod
+    def _progress_path(cls, path: str) -> str:
+        return path + cls.PROGRESS_SUFFIX
+
+    def _read_progress(self, path: str, source: str, fingerprint: Dict) -> int:
+        """Rows already committed by an earlier run over the same, unchanged file"""
+        try:
+            with open(self._progress_path(path)) as handle:
+                progress = json.load(handle)
+        except (OSError, ValueError):
+            return 0
+        if progress.get('source') != source or progress.get('fingerprint') != fingerprint:
+            self.logger.info(f"Ignoring stale ingest progress for {path}")
+            return 0
+        return int(progress.get('rows', 0))
+
+    def _write_progress(self, path: str, source: str, fingerprint: Dict, rows: int) -> None:
+        # Write then rename so an interrupted run never leaves a torn checkpoint
+        progress_path = self._progress_path(path)
+        with open(progress_path + '.tmp', 'w') as handle:
+            json.dump({'source': source, 'fingerprint': fingerprint, 'rows': rows}, handle)
+        os.replace(progress_path + '.tmp', progress_path)
+
+    def _clear_progress(self, path: str) -> None:
+        try:
+            os.remove(self._progress_path(path))
+        except FileNotFoundError:
+            pass
+
+def _find_column(header: List[str], aliases: Sequence[str]) -> Optional[int]:
+    for alias in aliases:
+        if alias in header:
+            return header.index(alias)
+    return None
+
+def _to_number(text: str) -> Optional[float]:
+    """Parse a numeric cell, treating blanks and non-finite values as missing"""
+    text = (text or '').strip()
+    if not text:
+        return None
+    try:
+        number = float(text)
+    except ValueError:
+        return None
+    return number if math.isfinite(number) else None
+
+def _observation(source: str, topic: str, indicator: str, region: str, year: int,
+                 value: float, ci_low: Optional[float] = None, ci_high: Optional[float] = None) -> Dict:
+    return {
+        'source': source,
+        'topic': topic,
+        'indicator': indicator,
+        'region': region,
+        'year': year,
+        'value': value,
+        'ci_low': ci_low,
+        'ci_high': ci_high
+    }
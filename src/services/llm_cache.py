@@ -0,0 +1,159 @@
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+import hashlib
+import json
+import os
+import threading
+from flask import current_app, has_app_context
+from src.services.cache_service import CacheService
+from src.utils.helpers import app_extension
+
+def llm_cache_key(kind: str, template: str, model: str, temperature: Optional[float], inputs: Any) -> str:
+    """
+    Build the cache key for one LLM call
+
+    The prompt template, model, temperature and canonical JSON of the
+    inputs are hashed together, so any change to one of them is a miss.
+    Keys are laid out as llm:<kind>:<sha256>.
+    """
+    material = json.dumps(
+        {'template': template, 'model': model, 'temperature': temperature, 'inputs': inputs},
+        sort_keys=True, separators=(',', ':'), default=str
+    )
+    return f"llm:{kind}:{hashlib.sha256(material.encode('utf-8')).hexdigest()}"
+
+class LLMResponseCache:
+    """Exact-match cache of parsed LLM responses with per-kind hit counters"""
+
+    def __init__(self, cache: CacheService, ttl: Optional[int] = None):
+        """
+        Args:
+            cache: Storage for responses; its disk tier makes them outlive the process
+            ttl: Seconds a response is reused (default: the cache's default TTL)
+        """
+        self.cache = cache
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    async def get_or_call(self,
+                          kind: str,
+                          key: str,
+                          call: Callable[[], Awaitable[Any]],
+                          use_cache: bool = True) -> Any:
+        """
+        Return the cached response for key, or await call and cache its result
+
+        With use_cache off the cache is not read, but the fresh response
+        still replaces the stored one. Failed calls are never cached.
+        """
+        cached = self.lookup(kind, key, use_cache)
+        if cached is not None:
+            return cached
+        result = await call()
+        self.store(key, result)
+        return result
+
+    def lookup(self, kind: str, key: str, use_cache: bool = True) -> Optional[Any]:
+        """Read and count a cached response (None on a miss or when use_cache is off)"""
+        if not use_cache:
+            self._count(kind, 'bypassed')
+            return None
+        cached = self.cache.get(key)
+        self._count(kind, 'hits' if cached is not None else 'misses')
+        return cached
+
+    def store(self, key: str, result: Any) -> None:
+        """Cache a complete response"""
+        self.cache.set(key, result, ttl=self.ttl)
+
+    def _count(self, kind: str, counter: str) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(kind, {'hits': 0, 'misses': 0, 'bypassed': 0})
+            stats[counter] += 1
+
+    def get_stats(self) -> Dict:
+        """Hit, miss and bypass counters overall and per kind, with hit rates"""
+        with self._lock:
+            by_kind = {kind: dict(stats) for kind, stats in self._stats.items()}
+        totals = {'hits': 0, 'misses': 0, 'bypassed': 0}
+        for stats in by_kind.values():
+            for counter in totals:
+                totals[counter] += stats[counter]
+            lookups = stats['hits'] + stats['misses']
+            stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        lookups = totals['hits'] + totals['misses']
+        totals['hit_rate'] = round(totals['hits'] / lookups, 4) if lookups else 0.0
+        cache_stats = self.cache.get_stats()
+        return {
+            **totals,
+            'by_kind': by_kind,
+            'evictions': cache_stats['evictions'],
+            'memory_entries': cache_stats['memory_entries'],
+            'disk_entries': cache_stats.get('disk_entries', 0)
+        }
+
+def _build_llm_cache() -> LLMResponseCache:
+    path = current_app.config.get('LLM_CACHE_PATH')
+    if path is None:
+        os.makedirs(current_app.instance_path, exist_ok=True)
+        path = os.path.join(current_app.instance_path, 'llm_cache.db')
+    ttl = current_app.config.get('LLM_CACHE_TTL', 604800)
+    return LLMResponseCache(
+        CacheService(
+            path=path,
+            max_entries=current_app.config.get('LLM_CACHE_MAX_ENTRIES', 256),
+            default_ttl=ttl,
+            max_disk_entries=current_app.config.get('LLM_CACHE_MAX_DISK_ENTRIES', 5000)
+        ),
+        ttl=ttl
+    )
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """The app's LLM response cache, or None when disabled or outside an app context"""
+    if not has_app_context() or not current_app.config.get('LLM_CACHE_ENABLED', True):
+        return None
+    return app_extension('llm_cache', _build_llm_cache)
+
+async def cached_completion(kind: str,
+                            template: str,
+                            llm: Any,
+                            inputs: Any,
+                            call: Callable[[], Awaitable[Any]],
+                            use_cache: bool = True) -> Any:
+    """Run an LLM chain call through the app's response cache, if there is one"""
+    cache = get_llm_cache()
+    if cache is None:
+        return await call()
+    key = llm_cache_key(kind, template, getattr(llm, 'model', ''), getattr(llm, 'temperature', None), inputs)
+    return await cache.get_or_call(kind, key, call, use_cache)
+
+async def cached_sections(kind: str,
+                          template: str,
+                          llm: Any,
+                          inputs: Any,
+                          stream: Callable[[], AsyncIterator[Tuple[str, Any]]],
+                          use_cache: bool = True) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Stream (section, value) pairs of a JSON answer through the app's response cache
+
+    A cached answer is replayed section by section. A streamed one is
+    cached whole once the stream has finished, under the same key
+    cached_completion uses, so streaming and non-streaming calls share
+    entries.
+    """
+    cache = get_llm_cache()
+    key = None
+    if cache is not None:
+        key = llm_cache_key(kind, template, getattr(llm, 'model', ''), getattr(llm, 'temperature', None), inputs)
+        cached = cache.lookup(kind, key, use_cache)
+        if cached is not None:
+            for section, value in cached.items():
+                yield section, value
+            return
+
+    result = {}
+    async for section, value in stream():
+        result[section] = value
+        yield section, value
+    if cache is not None:
+        cache.store(key, result)
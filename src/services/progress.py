@@ -0,0 +1,245 @@
+from typing import Dict, Iterator, List, Optional
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from flask import Response, current_app, request
+from src.utils.helpers import app_extension
+
+# Events after which a channel publishes nothing more
+TERMINAL_EVENTS = ('completed', 'failed')
+
+class ProgressBroker:
+    """
+    Publish/subscribe for pipeline progress events, one channel per subject
+
+    Channels are named "<kind>:<id>" (e.g. "analysis:12"). Subscribers in
+    the publishing process are woken as soon as an event is published.
+    With a SQLite file the events are also logged there, so subscribers in
+    other processes see them by polling every poll_interval seconds, and
+    clients can resume after a reconnect from the last event id they saw.
+    Events are kept for retention seconds.
+    """
+
+    PURGE_EVERY = 200  # Purge expired events every N publishes
+
+    def __init__(self, path: Optional[str] = None, retention: int = 3600, poll_interval: float = 1.0):
+        """
+        Args:
+            path: SQLite file shared across workers (None keeps events in this process only)
+            retention: Seconds events stay available to subscribers
+            poll_interval: Seconds between checks for events from other processes
+        """
+        self.logger = logging.getLogger(__name__)
+        self.retention = retention
+        self.poll_interval = poll_interval
+
+        # channel -> [event]; event = {'id', 'event', 'data', 'published_at'}
+        self._channels: Dict[str, List[Dict]] = {}
+        self._changed = threading.Condition()
+        self._next_id = 1
+        self._publishes = 0
+
+        self._disk = None
+        if path:
+            self._disk = sqlite3.connect(path, timeout=10, check_same_thread=False)
+            if path != ':memory:':
+                self._disk.execute('PRAGMA journal_mode=WAL')
+            self._disk.execute("""
+                CREATE TABLE IF NOT EXISTS progress_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    channel TEXT NOT NULL,
+                    event TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    published_at REAL NOT NULL
+                )
+            """)
+            self._disk.execute(
+                'CREATE INDEX IF NOT EXISTS ix_progress_events_channel ON progress_events (channel, id)'
+            )
+            self._disk.commit()
+
+    def publish(self, channel: str, event: str, data: Optional[Dict] = None) -> int:
+        """
+        Publish one event and wake the channel's subscribers
+
+        Returns:
+            The event id, increasing within a channel
+        """
+        now = time.time()
+        payload = json.dumps(data or {}, default=str)
+        with self._changed:
+            event_id = self._next_id
+            if self._disk is not None:
+                try:
+                    event_id = self._disk.execute(
+                        'INSERT INTO progress_events (channel, event, data, published_at) VALUES (?, ?, ?, ?)',
+                        (channel, event, payload, now)
+                    ).lastrowid
+                    self._publishes += 1
+                    if self._publishes % self.PURGE_EVERY == 0:
+                        self._disk.execute('DELETE FROM progress_events WHERE published_at <= ?', (now - self.retention,))
+                    self._disk.commit()
+                except sqlite3.Error as e:
+                    self.logger.error(f"Progress log write failed for {channel}: {str(e)}")
+            self._next_id = max(self._next_id, event_id) + 1
+
+            self._purge_memory(now)
+            self._channels.setdefault(channel, []).append({
+                'id': event_id,
+                'event': event,
+                'data': json.loads(payload),
+                'published_at': now
+            })
+            self._changed.notify_all()
+        return event_id
+
+    def events(self, channel: str, after: int = 0) -> List[Dict]:
+        """Events of a channel newer than the given id, from this process or the shared log"""
+        with self._changed:
+            return self._events(channel, after)
+
+    def subscribe(self, channel: str, after: int = 0, timeout: Optional[float] = None) -> Iterator[Optional[Dict]]:
+        """
+        Yield a channel's events from after the given id until a terminal one
+
+        None is yielded whenever poll_interval passes without an event, so
+        callers can send keep-alives or give up. The stream also ends after
+        timeout seconds.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while deadline is None or time.monotonic() < deadline:
+            with self._changed:
+                pending = self._events(channel, after)
+                if not pending:
+                    self._changed.wait(self.poll_interval)
+                    pending = self._events(channel, after)
+            if not pending:
+                yield None
+                continue
+            for event in pending:
+                after = event['id']
+                yield event
+                if event['event'] in TERMINAL_EVENTS:
+                    return
+
+    def _events(self, channel: str, after: int) -> List[Dict]:
+        """Read new events from memory, then from the shared log if nothing is held locally"""
+        local = [event for event in self._channels.get(channel, ()) if event['id'] > after]
+        if local or self._disk is None:
+            return local
+        try:
+            rows = self._disk.execute(
+                'SELECT id, event, data, published_at FROM progress_events '
+                'WHERE channel = ? AND id > ? ORDER BY id',
+                (channel, after)
+            ).fetchall()
+        except sqlite3.Error as e:
+            self.logger.error(f"Progress log read failed for {channel}: {str(e)}")
+            return []
+        return [
+            {'id': row[0], 'event': row[1], 'data': json.loads(row[2]), 'published_at': row[3]}
+            for row in rows
+        ]
+
+    def _purge_memory(self, now: float) -> None:
+        """Forget channels whose last event is older than the retention period"""
+        expired = [
+            channel for channel, events in self._channels.items()
+            if events[-1]['published_at'] <= now - self.retention
+        ]
+        for channel in expired:
+            del self._channels[channel]
+
+def progress_channel(kind: str, subject_id: int) -> str:
+    """Channel name for one analysis or report"""
+    return f"{kind}:{subject_id}"
+
+def format_sse(event: Optional[Dict]) -> str:
+    """
+    Encode an event as a Server-Sent Events message
+
+    Events without an id (snapshots) leave the client's Last-Event-ID alone;
+    None encodes a keep-alive comment.
+    """
+    if event is None:
+        return ': keep-alive\n\n'
+    lines = []
+    if event.get('id') is not None:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['event']}")
+    lines.append(f"data: {json.dumps(event.get('data') or {}, default=str)}")
+    return '\n'.join(lines) + '\n\n'
+
+def sse_stream(broker: ProgressBroker,
+               channel: str,
+               after: int = 0,
+               snapshot: Optional[Dict] = None,
+               keepalive: float = 15,
+               timeout: Optional[float] = None) -> Iterator[str]:
+    """
+    Stream a channel as Server-Sent Events
+
+    Args:
+        broker: Broker to subscribe to
+        channel: Channel to stream
+        after: Last event id the client saw (its Last-Event-ID)
+        snapshot: Current state, sent first; a terminal snapshot ends the stream
+        keepalive: Seconds between keep-alive comments while nothing happens
+        timeout: Seconds after which the stream ends (the client may reconnect)
+    """
+    yield 'retry: 3000\n\n'
+    if snapshot is not None:
+        yield format_sse(snapshot)
+        if snapshot['event'] in TERMINAL_EVENTS:
+            return
+    idle_since = time.monotonic()
+    for event in broker.subscribe(channel, after, timeout=timeout):
+        if event is not None:
+            idle_since = time.monotonic()
+            yield format_sse(event)
+        elif time.monotonic() - idle_since >= keepalive:
+            idle_since = time.monotonic()
+            yield format_sse(None)
+
+def sse_response(channel: str, snapshot: Optional[Dict] = None) -> Response:
+    """
+    Streaming text/event-stream response for a progress channel
+
+    Resumes after the Last-Event-ID header (or last_event_id query
+    parameter) that browsers send when they reconnect.
+    """
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0
+    try:
+        after = int(last_id)
+    except ValueError:
+        after = 0
+    stream = sse_stream(
+        get_progress_broker(),
+        channel,
+        after=after,
+        snapshot=snapshot,
+        keepalive=current_app.config.get('PROGRESS_KEEPALIVE', 15),
+        timeout=current_app.config.get('PROGRESS_STREAM_TIMEOUT', 900)
+    )
+    return Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Keep reverse proxies from buffering the stream
+    })
+
+def _build_progress_broker() -> ProgressBroker:
+    path = current_app.config.get('PROGRESS_PATH')
+    if path is None:
+        os.makedirs(current_app.instance_path, exist_ok=True)
+        path = os.path.join(current_app.instance_path, 'progress.db')
+    return ProgressBroker(
+        path=path or None,
+        retention=current_app.config.get('PROGRESS_RETENTION', 3600),
+        poll_interval=current_app.config.get('PROGRESS_POLL_INTERVAL', 1.0)
+    )
+
+def get_progress_broker() -> ProgressBroker:
+    """The app's progress broker, shared by publishers and SSE streams"""
+    return app_extension('progress_broker', _build_progress_broker)
@@ -0,0 +1,116 @@
+from typing import Dict, List, Optional
+from concurrent.futures import Future
+from datetime import timezone
+import logging
+import random
+import threading
+import time
+from src.models import DataSource
+from src.services.data_service import DataService
+
+class RefreshScheduler:
+    """
+    Refresh every data source in the background, each on its own interval
+
+    A daemon thread wakes every REFRESH_TICK seconds and submits the sources
+    that are due to the shared fetch pool, so sources refresh in parallel.
+    Each refresh re-fetches the most requested (topic, region, date range)
+    combinations, which warms the fetch cache before users ask for them. Intervals come from a
+    source's "refresh_interval" metadata or REFRESH_INTERVAL, spread by
+    REFRESH_JITTER so sources do not hit their APIs in lockstep.
+
+    Every process running the app runs its own scheduler; enable it on one.
+    """
+
+    def __init__(self, app, data_service: Optional[DataService] = None):
+        self.app = app
+        self.data_service = data_service or DataService()
+        self.logger = logging.getLogger(__name__)
+        self._next_run: Dict[str, float] = {}
+        self._running: Dict[str, Future] = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._random = random.Random()
+
+    def start(self) -> None:
+        """Start the scheduler thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='source-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the scheduler thread; refreshes already running finish on their own"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+            except Exception as e:
+                self.logger.error(f"Source refresh scheduling failed: {str(e)}")
+            self._stop.wait(self.app.config.get('REFRESH_TICK', 30))
+
+    def run_pending(self, now: Optional[float] = None) -> List[str]:
+        """
+        Submit a refresh for every source whose interval has elapsed
+
+        Returns:
+            Source types submitted on this tick
+        """
+        now = time.time() if now is None else now
+        with self.app.app_context():
+            source_tools = self.data_service.source_tools
+            sources = [
+                (source.type, source.source_metadata or {}, source.last_fetch)
+                for source in DataSource.query.all()
+                if source.type in source_tools
+            ]
+            executor = self.data_service.executor
+
+        submitted = []
+        for source_type, metadata, last_fetch in sources:
+            interval = float(metadata.get('refresh_interval') or self.app.config.get('REFRESH_INTERVAL', 3600))
+            if source_type not in self._next_run:
+                # Pick up the schedule where the last recorded fetch (naive UTC) left it
+                self._next_run[source_type] = (
+                    last_fetch.replace(tzinfo=timezone.utc).timestamp() + self._jittered(interval) if last_fetch else now
+                )
+
+            running = self._running.get(source_type)
+            if now < self._next_run[source_type] or (running is not None and not running.done()):
+                continue
+
+            self._running[source_type] = executor.submit(
+                self.data_service._refresh_source_in_context, self.app, source_type
+            )
+            self._next_run[source_type] = now + self._jittered(interval)
+            submitted.append(source_type)
+
+        if submitted:
+            self.logger.info(f"Refreshing data sources: {', '.join(submitted)}")
+        return submitted
+
+    def wait(self, timeout: Optional[float] = None) -> Dict[str, Dict]:
+        """Wait for submitted refreshes and return their outcomes"""
+        return {
+            source_type: future.result(timeout)
+            for source_type, future in list(self._running.items())
+        }
+
+    def _jittered(self, interval: float) -> float:
+        jitter = self.app.config.get('REFRESH_JITTER', 0.1)
+        return interval * (1 + self._random.uniform(-jitter, jitter))
+
+def init_scheduler(app) -> Optional[RefreshScheduler]:
+    """Start the refresh scheduler when REFRESH_SCHEDULER_ENABLED is set"""
+    if not app.config.get('REFRESH_SCHEDULER_ENABLED', False) or app.testing:
+        return None
+    scheduler = RefreshScheduler(app)
+    app.extensions['refresh_scheduler'] = scheduler
+    scheduler.start()
+    return scheduler
@@ -0,0 +1,91 @@
+from typing import Any, Dict, Hashable, Iterable, Tuple
+from concurrent.futures import Future
+import threading
+
+class Flight(Future):
+    """Future for one key's in-flight fetch"""
+
+    def __init__(self, key: Hashable):
+        super().__init__()
+        self.key = key
+        self.set_running_or_notify_cancel()
+
+class SingleFlight:
+    """
+    Share one in-flight upstream call among concurrent callers of the same key
+
+    The first caller for a key leads: it gets a Future to resolve once its
+    fetch finishes. Callers arriving while it is in flight join and wait on
+    that Future instead of fetching again. The Futures are plain
+    concurrent.futures Futures, so asyncio code can await them through
+    asyncio.wrap_future.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, Flight] = {}
+        self._lock = threading.Lock()
+        self._stats = {'led': 0, 'joined': 0}
+
+    def claim(self, keys: Dict[str, Hashable]) -> Tuple[Dict[str, Future], Dict[str, Future]]:
+        """
+        Lead or join the flight for every key at once
+
+        Args:
+            keys: Caller's name for each key (e.g. topic -> cache key)
+        Returns:
+            (led, joined) Futures by name; the caller must resolve every led one
+        """
+        led, joined = {}, {}
+        with self._lock:
+            for name, key in keys.items():
+                future = self._flights.get(key)
+                if future is None:
+                    future = Flight(key)
+                    self._flights[key] = future
+                    led[name] = future
+                    self._stats['led'] += 1
+                else:
+                    joined[name] = future
+                    self._stats['joined'] += 1
+        return led, joined
+
+    def in_flight(self, key: Hashable) -> bool:
+        """Whether a fetch for key is currently running"""
+        with self._lock:
+            return key in self._flights
+
+    def resolve(self, led: Dict[str, Future], results: Dict[str, Any]) -> None:
+        """Hand each led flight its result (None when the fetch returned nothing for it)"""
+        for name, future in led.items():
+            self._finish(future, result=results.get(name))
+
+    def fail(self, led: Dict[str, Future], error: BaseException) -> None:
+        """Fail every led flight with the leader's error"""
+        for future in led.values():
+            self._finish(future, error=error)
+
+    def release(self, led: Iterable[Future]) -> None:
+        """Fail any led flight that was never resolved, so joiners cannot hang"""
+        for future in led:
+            if not future.done():
+                self._finish(future, error=RuntimeError("Upstream fetch was abandoned"))
+
+    def _finish(self, future: Flight, result: Any = None, error: BaseException = None) -> None:
+        with self._lock:
+            if self._flights.get(future.key) is future:
+                del self._flights[future.key]
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def get_stats(self) -> Dict:
+        """Led and joined counts; joined is the number of upstream calls saved"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._flights)
+        total = stats['led'] + stats['joined']
+        stats['duplicate_rate'] = round(stats['joined'] / total, 4) if total else 0.0
+        return stats
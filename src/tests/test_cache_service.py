@@ -0,0 +1,207 @@
+import pytest
+import sqlite3
+import time
+from src.chains.analysis_chain import AnalysisChain
+from src.services.cache_service import CacheService, fetch_cache_key
+from src.services.llm_cache import LLMResponseCache, get_llm_cache, llm_cache_key
+from src.utils.indicator_stats import compute_statistics
+
+@pytest.fixture
+def cache(tmp_path):
+    """Create a cache with a small memory tier and a file-backed disk tier"""
+    return CacheService(path=str(tmp_path / 'cache.db'), max_entries=2, default_ttl=60)
+
+class TestCacheService:
+    def test_cache_key(self):
+        """Test cache keys are built from the fetch parameters"""
+        key = fetch_cache_key('who', 'health', 'GHA', '2023', '2024', ['b', 'a'])
+        assert key == 'data:GHA:WHO:health:2023:2024:a,b'
+        assert fetch_cache_key('UNICEF', 'health', 'GHA').endswith(':all')
+    
+    def test_set_and_get(self, cache):
+        """Test values round-trip and count hits and misses"""
+        assert cache.get('data:GHA:WHO:health') is None
+        cache.set('data:GHA:WHO:health', {'dtp3_coverage': {'2023': 89.2}})
+        
+        assert cache.get('data:GHA:WHO:health') == {'dtp3_coverage': {'2023': 89.2}}
+        stats = cache.get_stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['hit_rate'] == 0.5
+    
+    def test_ttl_expiry(self, cache):
+        """Test expired entries are treated as misses"""
+        cache.set('data:GHA:WHO:health', {'value': 1}, ttl=0.05)
+        time.sleep(0.1)
+        assert cache.get('data:GHA:WHO:health') is None
+    
+    def test_get_stale(self, tmp_path):
+        """Test expired entries stay readable with their age within max_stale"""
+        cache = CacheService(path=str(tmp_path / 'cache.db'), default_ttl=60, max_stale=0.3)
+        cache.set('data:GHA:WHO:health', {'value': 1}, ttl=0.05)
+        time.sleep(0.1)
+        
+        assert cache.get('data:GHA:WHO:health') is None
+        value, age = cache.get_stale('data:GHA:WHO:health')
+        assert value == {'value': 1}
+        assert age >= 0.1
+        
+        time.sleep(0.3)
+        assert cache.get_stale('data:GHA:WHO:health') is None
+    
+    def test_lru_eviction_and_disk_tier(self, cache, tmp_path):
+        """Test evicted entries are still served from the disk tier"""
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.set('c', 3)
+        
+        assert cache.get_stats()['evictions'] == 1
+        assert cache.get('a') == 1
+        assert cache.get_stats()['disk_hits'] == 1
+        
+        # A second cache on the same file sees the same entries
+        other = CacheService(path=str(tmp_path / 'cache.db'))
+        assert other.get('c') == 3
+    
+    def test_delete_pattern(self, cache):
+        """Test glob invalidation across both tiers"""
+        cache.set('data:GHA:WHO:health', 1)
+        cache.set('data:GHA:UNICEF:health', 2)
+        cache.set('data:KEN:WHO:health', 3)
+        
+        assert cache.delete_pattern('data:GHA:*') == 2
+        assert cache.get('data:GHA:WHO:health') is None
+        assert cache.get('data:KEN:WHO:health') == 3
+        assert cache.clear() == 1
+    
+    def test_invalidation_reaches_other_workers(self, cache, tmp_path):
+        """Test entries deleted through one cache are not served from another's memory tier"""
+        other = CacheService(path=str(tmp_path / 'cache.db'))
+        cache.set('data:GHA:WHO:health', 1)
+        cache.set('data:KEN:WHO:health', 2)
+        assert other.get('data:GHA:WHO:health') == 1
+        assert other.get_stats()['memory_entries'] == 1
+        
+        assert cache.delete_pattern('data:GHA:*') == 1
+        assert other.get('data:GHA:WHO:health') is None
+        assert other.get_stale('data:GHA:WHO:health') is None
+        assert other.get('data:KEN:WHO:health') == 2
+    
+    def test_disk_tier_is_bounded(self, tmp_path):
+        """Test the oldest disk entries are evicted beyond max_disk_entries"""
+        cache = CacheService(path=str(tmp_path / 'cache.db'), max_entries=1, max_disk_entries=2)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+            time.sleep(0.01)
+        
+        assert cache.get_stats()['disk_entries'] == 2
+        assert cache.get('a') is None
+        assert cache.get('b') == 'b'
+    
+    def test_locked_disk_tier(self, cache, tmp_path):
+        """Test a locked shared file fails neither writes nor invalidation"""
+        cache._disk.execute('PRAGMA busy_timeout = 50')
+        other = sqlite3.connect(str(tmp_path / 'cache.db'))
+        other.execute('BEGIN EXCLUSIVE')
+        
+        cache.set('data:GHA:WHO:health', {'value': 1})
+        assert cache.get('data:GHA:WHO:health') == {'value': 1}
+        assert cache.delete_pattern('data:*') == 1
+        
+        other.rollback()
+        cache.set('data:GHA:WHO:health', {'value': 2})
+        assert cache.get_stats()['disk_entries'] == 1
+
+class FakeChain:
+    """Runnable stand-in counting LLM invocations"""
+    
+    def __init__(self):
+        self.calls = 0
+    
+    async def ainvoke(self, inputs):
+        self.calls += 1
+        return {'key_findings': [f"call {self.calls}"]}
+
+class TestLLMResponseCache:
+    def test_cache_key(self):
+        """Test every input to the call changes the key, but key order does not"""
+        key = llm_cache_key('analysis', 'Analyze {data}', 'gemini-pro', 0.3, {'a': 1, 'b': 2})
+        
+        assert key.startswith('llm:analysis:')
+        assert key == llm_cache_key('analysis', 'Analyze {data}', 'gemini-pro', 0.3, {'b': 2, 'a': 1})
+        assert key != llm_cache_key('analysis', 'Analyze {data}', 'gemini-pro', 0.7, {'a': 1, 'b': 2})
+        assert key != llm_cache_key('analysis', 'Summarize {data}', 'gemini-pro', 0.3, {'a': 1, 'b': 2})
+        assert key != llm_cache_key('analysis', 'Analyze {data}', 'gemini-pro', 0.3, {'a': 1, 'b': 3})
+    
+    @pytest.mark.asyncio
+    async def test_get_or_call(self):
+        """Test hits skip the call, bypasses refresh the entry, and failures are not cached"""
+        responses = LLMResponseCache(CacheService(max_entries=8, default_ttl=60))
+        chain = FakeChain()
+        
+        first = await responses.get_or_call('analysis', 'k', lambda: chain.ainvoke({}))
+        second = await responses.get_or_call('analysis', 'k', lambda: chain.ainvoke({}))
+        assert first == second and chain.calls == 1
+        
+        bypassed = await responses.get_or_call('analysis', 'k', lambda: chain.ainvoke({}), use_cache=False)
+        assert chain.calls == 2
+        assert await responses.get_or_call('analysis', 'k', lambda: chain.ainvoke({})) == bypassed
+        
+        async def failing():
+            raise RuntimeError("quota exceeded")
+        
+        with pytest.raises(RuntimeError):
+            await responses.get_or_call('policy', 'p', failing)
+        assert responses.cache.get('p') is None
+        
+        stats = responses.get_stats()
+        assert (stats['hits'], stats['misses'], stats['bypassed']) == (2, 2, 1)
+        assert stats['by_kind']['analysis']['hit_rate'] == 0.6667
+    
+    @pytest.mark.asyncio
+    async def test_analysis_chain_uses_cache(self, app):
+        """Test identical analyses call the LLM once per app"""
+        chain = AnalysisChain()
+        chain.chain = FakeChain()
+        data = {'unicef': {'health': {'value': 123}}}
+        
+        first = await chain.analyze(data)
+        assert await chain.analyze({'unicef': {'health': {'value': 123}}}) == first
+        assert chain.chain.calls == 1
+        
+        await chain.analyze(data, use_cache=False)
+        assert chain.chain.calls == 2
+        assert get_llm_cache().get_stats()['by_kind']['analysis'] == {
+            'hits': 1, 'misses': 1, 'bypassed': 1, 'hit_rate': 0.5
+        }
+    
+    @pytest.mark.asyncio
+    async def test_analysis_cache_keys_rendered_prompt(self, app):
+        """Test statistics and token_budget, which change the prompt, are part of the key"""
+        chain = AnalysisChain()
+        chain.chain = FakeChain()
+        data = {'unicef': {'health': {
+            f'indicator_{i}': {str(year): 30.0 + i + year % 7 for year in range(2016, 2024)} for i in range(6)
+        }}}
+        statistics = compute_statistics(data)
+        
+        await chain.analyze(data)
+        await chain.analyze(data, statistics=statistics)
+        chain.token_budget = 600  # Same data text, fewer statistics lines
+        await chain.analyze(data, statistics=statistics)
+        assert chain.chain.calls == 3
+        
+        await chain.analyze(data, statistics=statistics)
+        assert chain.chain.calls == 3
+    
+    @pytest.mark.asyncio
+    async def test_analysis_stream_shares_cache(self, app):
+        """Test a cached analysis is replayed section by section by astream"""
+        chain = AnalysisChain()
+        chain.chain = FakeChain()
+        data = {'unicef': {'health': {'value': 123}}}
+        
+        first = await chain.analyze(data)
+        chain.stream_chain = None  # Any LLM call would fail
+        assert [section async for section in chain.astream(data)] == list(first.items())
+        assert get_llm_cache().get_stats()['by_kind']['analysis']['hits'] == 1
@@ -1,6 +1,34 @@
+import asyncio
+import json
 import pytest
+from langchain_core.messages import AIMessageChunk
 from src.chains.analysis_chain import AnalysisChain
+from src.chains.compaction import compact_data, compact_json, estimate_tokens
+from src.chains.json_sections import JSONSectionParser
+from src.chains.map_reduce import group_by_size, payload_size, split_data
 from src.chains.policy_chain import PolicyChain
+from src.utils.indicator_stats import compute_statistics
+
+ANALYSIS = {
+    "key_findings": ["Enrollment rose to 87.5% {up 2 points}", "Stunting \"persists\""],
+    "trends": [{"indicator": "enrollment", "direction": "up"}],
+    "correlations": [],
+    "gaps": ["No 2024 WHO data"],
+    "recommendations": ["Expand school feeding"]
+}
+
+class FakeStreamChain:
+    """Stands in for prompt | llm, streaming a fixed answer in small chunks"""
+    
+    def __init__(self, text, size=5, delay=0):
+        self.text = text
+        self.size = size
+        self.delay = delay
+    
+    async def astream(self, inputs):
+        for i in range(0, len(self.text), self.size):
+            await asyncio.sleep(self.delay)
+            yield AIMessageChunk(content=self.text[i:i + self.size])
 
 class TestAnalysisChain:
     @pytest.mark.asyncio
@@ -30,6 +58,203 @@ class TestAnalysisChain:
         assert updated_prompt != original_prompt
         assert new_prompt == updated_prompt
 
+    @pytest.mark.asyncio
+    async def test_astream(self):
+        """Test sections are yielded in order as soon as each one closes"""
+        chain = AnalysisChain()
+        chain.stream_chain = FakeStreamChain("```json\n" + json.dumps(ANALYSIS, indent=2) + "\n```")
+        
+        sections = [section async for section in chain.astream({'unicef': {}}, use_cache=False)]
+        assert sections == list(ANALYSIS.items())
+    
+    @pytest.mark.asyncio
+    async def test_astream_stall(self):
+        """Test a stream that stops producing output fails after the idle timeout"""
+        chain = AnalysisChain()
+        chain.STREAM_IDLE_TIMEOUT = 0.05
+        chain.stream_chain = FakeStreamChain(json.dumps(ANALYSIS), size=len(json.dumps(ANALYSIS)), delay=0.2)
+        
+        with pytest.raises(Exception, match="stalled"):
+            [section async for section in chain.astream({'unicef': {}}, use_cache=False)]
+
+class TestJSONSectionParser:
+    @pytest.mark.parametrize('size', [1, 4, 64, 4096])
+    def test_sections(self, size):
+        """Test every top-level member is parsed whatever the chunk boundaries"""
+        text = 'Here is the analysis: ' + json.dumps({**ANALYSIS, 'score': 0.5, 'complete': True})
+        parser = JSONSectionParser()
+        names = []
+        for i in range(0, len(text), size):
+            names += [name for name, _ in parser.feed(text[i:i + size])]
+        
+        assert names == list(ANALYSIS) + ['score', 'complete']
+        assert parser.sections == {**ANALYSIS, 'score': 0.5, 'complete': True}
+        assert parser.done
+    
+    def test_section_emitted_when_closed(self):
+        """Test a section is returned by the chunk that closes it, before the rest arrives"""
+        parser = JSONSectionParser()
+        assert parser.feed('{"key_findings": ["a", "b"') == []
+        assert parser.feed('], "trends": [') == [('key_findings', ['a', 'b'])]
+        assert not parser.done
+    
+    def test_malformed(self):
+        """Test invalid JSON inside a section is reported"""
+        with pytest.raises(ValueError):
+            JSONSectionParser().feed('{"key_findings": [1, 2,]}')
+
+class FakeMapChain:
+    """Stands in for the map or reduce chain, tracking how many calls overlap"""
+    
+    def __init__(self, result):
+        self.result = result
+        self.inputs = []
+        self.running = 0
+        self.max_running = 0
+    
+    async def ainvoke(self, inputs):
+        self.inputs.append(next(iter(inputs.values())))
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        return self.result
+
+def regional_data(countries=6, years=20):
+    return {
+        source: {
+            topic: {
+                f"{topic}_{country}": {str(2000 + year): 50.0 + year for year in range(years)}
+                for country in range(countries)
+            }
+            for topic in ('health', 'education')
+        }
+        for source in ('unicef', 'who')
+    }
+
+class TestMapReduce:
+    def test_split_data(self):
+        """Test pieces stay within the limit, keep their path and cover all the data"""
+        data = regional_data()
+        pieces = split_data(data, 1500)
+        
+        assert len(pieces) > 1
+        assert all(payload_size(piece) <= 1500 for piece in pieces)
+        merged = {}
+        for piece in pieces:
+            for source, topics in piece.items():
+                for topic, indicators in topics.items():
+                    merged.setdefault(source, {}).setdefault(topic, {}).update(indicators)
+        assert merged == data
+        assert split_data(data, 10 ** 6) == [data]
+    
+    def test_group_by_size(self):
+        """Test batches respect the limit but always pair up oversized items"""
+        assert group_by_size(['aaaa', 'bbbb', 'cccc'], 100) == [['aaaa', 'bbbb', 'cccc']]
+        assert group_by_size(['aaaa', 'bbbb', 'cccc'], 1) == [['aaaa', 'bbbb'], ['cccc']]
+    
+    @pytest.mark.asyncio
+    async def test_analyze_map_reduce(self):
+        """Test large data is analyzed in concurrent pieces and merged into the usual sections"""
+        chain = AnalysisChain()
+        chain.token_budget, chain.map_concurrency = 200, 2
+        chain.chain = FakeMapChain({'key_findings': ['partial'], 'trends': []})
+        chain.reduce_chain = FakeMapChain({'key_findings': ['merged'], 'recommendations': ['act']})
+        data = regional_data()
+        
+        result = await chain.analyze(data, use_cache=False)
+        
+        assert len(chain.chain.inputs) == len(chain._split(data)) > 1
+        assert all(estimate_tokens(text) <= 200 for text in chain.chain.inputs)
+        assert chain.chain.max_running == 2
+        assert len(json.loads(chain.reduce_chain.inputs[-1])) > 1
+        assert set(result) == set(AnalysisChain.SECTIONS)
+        assert result['key_findings'] == ['merged']
+
+class TestCompaction:
+    def test_compact_data(self):
+        """Test empty series and metadata are dropped, values rounded and long series summarized"""
+        data = {
+            'who': {
+                'health': {
+                    'child_mortality': {
+                        'under_five_mortality_rate': {'2023': {'rate': 48.3456, 'confidence_interval': [45.2, 51.4]}}
+                    },
+                    'stunting': {'2022': None}
+                },
+                'metadata': {'source': 'WHO GHO', 'last_updated': '2024-01-01'}
+            },
+            'unicef': {'education': {'enrollment': {str(2000 + year): 60.0 + 1.5 * year for year in range(20)}}}
+        }
+        
+        text, stats = compact_data(data)
+        
+        assert '## WHO/child_mortality\nunder_five_mortality_rate: 2023=48.35' in text
+        assert 'enrollment: 2000-2019 n=20 first=60 last=88.5 min=60 max=88.5 slope=+1.5/yr' in text
+        assert 'stunting' not in text and 'confidence' not in text and 'WHO GHO' not in text
+        assert (stats['series'], stats['summarized'], stats['dropped']) == (2, 1, 1)
+        assert stats['tokens_after'] < stats['tokens_before']
+    
+    def test_compact_data_worldbank_records(self):
+        """Test World Bank record lists are tabulated and unreadable content is kept, not dropped"""
+        data = {
+            'worldbank': {
+                'education': [
+                    {'indicator': {'id': 'SE.PRM.ENRR'}, 'countryiso3code': country, 'date': str(year), 'value': value}
+                    for country, base in (('GHA', 98.0), ('NGA', 86.0))
+                    for year, value in ((2021, base), (2022, base + 1.25), (2023, None))
+                ],
+                'health': {'error': 'Read timed out'}
+            },
+            'who': {'health': {'values': [48.3, 47.9], 'dimensions': {'YEAR': ['2022', '2023']}}}
+        }
+        
+        text, stats = compact_data(data)
+        
+        assert '## WORLDBANK/education\nSE.PRM.ENRR@GHA: 2021=98 2022=99.25\nSE.PRM.ENRR@NGA: 2021=86 2022=87.25' in text
+        assert 'worldbank/health: Read timed out' in text
+        assert 'who/health/values: [48.3,47.9]' in text
+        assert (stats['series'], stats['dropped'], stats['untabulated'], stats['omitted']) == (2, 0, 2, 0)
+    
+    def test_compact_data_budget(self):
+        """Test compaction tightens, then omits series, to stay within the budget"""
+        data = regional_data(countries=30, years=8)
+        
+        loose, _ = compact_data(data)
+        text, stats = compact_data(data, budget=1200)
+        tight, tight_stats = compact_data(data, budget=100)
+        
+        assert '2000=50 2001=51' in loose
+        assert 'n=8' in text and stats['tokens_after'] <= 1200
+        assert tight_stats['tokens_after'] <= 100 and tight_stats['omitted'] > 0
+        assert 'omitted' in tight
+    
+    def test_compact_json(self):
+        """Test empty sections are dropped and the longest lists cut to fit the budget"""
+        analysis = dict(ANALYSIS, key_findings=[f"Finding {i}" for i in range(50)])
+        
+        text, stats = compact_json(analysis, budget=60)
+        result = json.loads(text)
+        
+        assert 'correlations' not in result
+        assert 0 < len(result['key_findings']) < 50
+        assert result['gaps'] == ANALYSIS['gaps']
+        assert stats['tokens_after'] <= 60
+
+    @pytest.mark.asyncio
+    async def test_analyze_with_statistics(self):
+        """Test precomputed statistics reach the prompt after the compacted data"""
+        chain = AnalysisChain()
+        chain.chain = FakeMapChain(ANALYSIS)
+        data = {'unicef': {'health': {'infant_mortality_rate': {'2022': 36.0, '2023': 35.2}}}}
+        
+        result = await chain.analyze(data, use_cache=False, statistics=compute_statistics(data))
+        
+        assert result == ANALYSIS
+        prompt = chain.chain.inputs[0]
+        assert prompt.index('infant_mortality_rate: 2022=36 2023=35.2') < prompt.index('## precomputed statistics')
+        assert 'UNICEF/health/infant_mortality_rate: 2022-2023 n=2 latest=35.2 yoy2023=-0.8' in prompt
+
 class TestPolicyChain:
     @pytest.mark.asyncio
     async def test_generate_brief(self, mock_gemini_service):
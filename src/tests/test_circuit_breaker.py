@@ -0,0 +1,115 @@
+import pytest
+import requests
+from src.utils.circuit_breaker import CircuitBreaker, CircuitOpenError, get_breaker, is_upstream_failure, reset_breakers
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+    
+    def __call__(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(response=response)
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker('WORLDBANK', failure_threshold=3, reset_timeout=60,
+                          max_retries=2, backoff_base=1, backoff_max=8,
+                          clock=clock, sleep=clock.sleep)
+
+class TestCircuitBreaker:
+    def test_upstream_failures(self):
+        """Test only outages count as upstream failures"""
+        assert is_upstream_failure(requests.exceptions.ConnectTimeout())
+        assert is_upstream_failure(requests.exceptions.ConnectionError())
+        assert is_upstream_failure(http_error(503))
+        assert is_upstream_failure(http_error(429))
+        assert not is_upstream_failure(http_error(404))
+        assert not is_upstream_failure(ValueError())
+    
+    def test_retries_with_backoff(self, breaker, clock):
+        """Test failures are retried with jittered exponential delays"""
+        attempts = []
+        
+        def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise requests.exceptions.ReadTimeout()
+            return 'ok'
+        
+        assert breaker.call(flaky) == 'ok'
+        assert len(clock.slept) == 2
+        assert 0 <= clock.slept[0] <= 1 and 0 <= clock.slept[1] <= 2
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.to_dict()['retries'] == 2
+    
+    def test_client_errors_are_not_retried(self, breaker, clock):
+        """Test a bad request is raised at once and does not trip the circuit"""
+        def bad_request():
+            raise http_error(400)
+        
+        with pytest.raises(requests.exceptions.HTTPError):
+            breaker.call(bad_request)
+        assert clock.slept == []
+        assert breaker.to_dict()['consecutive_failures'] == 0
+    
+    def test_opens_and_fails_fast(self, breaker, clock):
+        """Test the circuit opens after repeated failures and stops calling upstream"""
+        calls = []
+        
+        def down():
+            calls.append(1)
+            raise requests.exceptions.ConnectionError()
+        
+        with pytest.raises(requests.exceptions.ConnectionError):
+            breaker.call(down)
+        assert len(calls) == 3
+        assert breaker.state == CircuitBreaker.OPEN
+        
+        with pytest.raises(CircuitOpenError) as error:
+            breaker.call(down)
+        assert len(calls) == 3
+        assert isinstance(error.value, requests.exceptions.RequestException)
+        assert breaker.to_dict()['rejected'] == 1
+    
+    def test_half_open_trial(self, breaker, clock):
+        """Test one trial call after the reset timeout closes or reopens the circuit"""
+        for _ in range(3):
+            breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        
+        clock.now += 61
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow_request()
+        assert not breaker.allow_request()
+        
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.retry_after() == 60
+        
+        clock.now += 61
+        assert breaker.call(lambda: 'ok') == 'ok'
+        assert breaker.state == CircuitBreaker.CLOSED
+    
+    def test_transport_retries_replace_breaker_retries(self, app):
+        """Test breakers do not retry on top of transport retries"""
+        with app.app_context():
+            reset_breakers()
+            assert get_breaker('WHO').max_retries == app.config['CIRCUIT_MAX_RETRIES']
+            
+            app.config['HTTP_MAX_RETRIES'] = 3
+            reset_breakers()
+            assert get_breaker('WHO').max_retries == 0
+            reset_breakers()
@@ -0,0 +1,31 @@
+import pytest
+from src.utils.http import build_session, get_session, close_sessions
+
+class TestHttpSessions:
+    def test_session_is_shared(self, app):
+        """Test each upstream API gets one shared session"""
+        with app.app_context():
+            close_sessions()
+            assert get_session('WORLDBANK') is get_session('WORLDBANK')
+            assert get_session('WORLDBANK') is not get_session('WHO')
+            close_sessions()
+    
+    def test_pool_settings(self, app):
+        """Test pool size and retries come from the app config"""
+        with app.app_context():
+            close_sessions()
+            app.config.update({'HTTP_POOL_MAXSIZE': 4, 'HTTP_MAX_RETRIES': 2})
+            adapter = get_session('WORLDBANK').get_adapter('https://api.worldbank.org')
+            
+            assert adapter._pool_maxsize == 4
+            assert adapter.max_retries.total == 2
+            assert 503 in adapter.max_retries.status_forcelist
+            close_sessions()
+    
+    def test_build_session_defaults(self):
+        """Test sessions can be built outside an app context"""
+        session = build_session()
+        adapter = session.get_adapter('https://ghoapi.azureedge.net')
+        
+        assert adapter.max_retries.total == 3
+        session.close()
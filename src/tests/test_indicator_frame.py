@@ -0,0 +1,101 @@
+import math
+import numpy as np
+import pytest
+from src.utils.indicator_frame import (
+    IndicatorFrame,
+    FrameBuilder,
+    from_unicef,
+    from_who,
+    from_worldbank,
+    frame_from_sources
+)
+
+UNICEF_DATA = {
+    "health": {
+        "infant_mortality_rate": {"2023": 35.2, "2024": 34.1}
+    },
+    "education": {
+        "primary_enrollment": {"2023": 92.3, "2024": 93.1}
+    },
+    "metadata": {"country": "Ghana", "region": "GHA"}
+}
+
+WHO_DATA = {
+    "health": {
+        "child_mortality": {
+            "2023": {"rate": 48.3, "confidence_interval": [45.2, 51.4]}
+        },
+        "immunization": {
+            "dtp3_coverage": {"2023": 89.2, "2024": 90.5}
+        }
+    },
+    "metadata": {"source": "WHO Mock Data"}
+}
+
+WORLDBANK_DATA = {
+    "education": [
+        {"indicator": {"id": "SE.PRM.ENRR"}, "countryiso3code": "GHA", "date": "2023", "value": 101.2},
+        {"indicator": {"id": "SE.PRM.ENRR"}, "countryiso3code": "NGA", "date": "2023", "value": None}
+    ]
+}
+
+class TestIndicatorFrame:
+    def test_from_unicef(self):
+        """Test UNICEF year-keyed dicts become one row per year"""
+        frame = from_unicef(UNICEF_DATA)
+        
+        assert len(frame) == 4
+        assert set(frame['topic']) == {'health', 'education'}
+        assert frame['value'].dtype == np.float64
+        assert frame['year'].dtype == np.int32
+    
+    def test_from_who_confidence_intervals(self):
+        """Test WHO rate/confidence_interval points and nested groups"""
+        frame = from_who(WHO_DATA)
+        records = {(r['indicator'], r['year']): r for r in frame.to_records()}
+        
+        assert records[('child_mortality', 2023)]['ci_low'] == 45.2
+        assert records[('child_mortality', 2023)]['ci_high'] == 51.4
+        assert records[('child_mortality', 2023)]['topic'] == 'health'
+        assert records[('dtp3_coverage', 2024)]['topic'] == 'immunization'
+        assert records[('dtp3_coverage', 2024)]['ci_low'] is None
+    
+    def test_from_worldbank(self):
+        """Test World Bank items keep their country and missing values"""
+        frame = from_worldbank(WORLDBANK_DATA)
+        
+        assert list(frame['region']) == ['GHA', 'NGA']
+        assert math.isnan(frame['value'][1])
+        assert frame.valid_mask().tolist() == [True, False]
+    
+    def test_frame_from_sources(self):
+        """Test DataService output is normalized into one frame, skipping errors"""
+        frame = frame_from_sources({
+            'unicef': UNICEF_DATA,
+            'who': WHO_DATA,
+            'worldbank': {"error": "timed out"}
+        })
+        
+        assert set(frame['source']) == {'UNICEF', 'WHO'}
+        assert len(frame) == 4 + 3
+    
+    def test_series(self):
+        """Test rows are grouped into year-sorted series"""
+        builder = FrameBuilder()
+        builder.append('WHO', 'health', 'dtp3', 'GHA', 2024, 90.5)
+        builder.append('WHO', 'health', 'dtp3', 'GHA', 2023, 89.2)
+        builder.append('WHO', 'health', 'dtp3', 'KEN', 2023, 91.0)
+        series = list(builder.build().series())
+        
+        assert [key[3] for key, _, _ in series] == ['GHA', 'KEN']
+        assert series[0][1].tolist() == [2023, 2024]
+        assert series[0][2].tolist() == [89.2, 90.5]
+    
+    def test_concat_and_empty(self):
+        """Test frames stack and empty frames are harmless"""
+        frame = IndicatorFrame.concat([from_unicef(UNICEF_DATA), IndicatorFrame.empty()])
+        assert len(frame) == 4
+        assert len(IndicatorFrame.concat([])) == 0
+        
+        with pytest.raises(ValueError):
+            IndicatorFrame({**frame.columns, 'year': frame['year'][:1]})
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from src.chains.compaction import compact_statistics
+from src.utils.indicator_stats import compute_statistics, correlation_matrix
+
+SOURCES = {
+    "unicef": {
+        "health": {
+            "infant_mortality_rate": {"2019": 40.0, "2020": 38.0, "2021": 37.0, "2023": 35.2},
+            "stunting": {"2020": None}
+        },
+        "education": {
+            "primary_enrollment": {"2019": 80.0, "2020": 82.0, "2021": 84.0, "2022": 86.0, "2023": 88.0}
+        },
+        "metadata": {"country": "Ghana", "region": "GHA"}
+    },
+    "who": {
+        "health": {
+            "child_mortality": {
+                "under_five": {
+                    "2021": {"rate": 50.0, "confidence_interval": [45.0, 55.0]},
+                    "2022": {"rate": 49.0, "confidence_interval": [44.0, 54.0]},
+                    "2023": {"rate": 48.3, "confidence_interval": [43.5, 53.1]}
+                }
+            }
+        }
+    },
+    "worldbank": {"error": "Service unavailable"}
+}
+
+class TestIndicatorStats:
+    def test_series_statistics(self):
+        """Test year-over-year changes, CAGR and slope per indicator"""
+        stats = compute_statistics(SOURCES)
+        enrollment = stats['indicators']['UNICEF/education/primary_enrollment']
+        infant = stats['indicators']['UNICEF/health/infant_mortality_rate']
+
+        assert stats['years'] == [2019, 2023]
+        assert enrollment['yoy'] == {'2020': 2.0, '2021': 2.0, '2022': 2.0, '2023': 2.0}
+        assert enrollment['yoy_pct']['2020'] == 2.5
+        assert enrollment['slope'] == 2.0
+        assert enrollment['cagr'] == pytest.approx((88 / 80) ** 0.25 - 1, abs=1e-6)
+        # No change is reported across the missing 2022
+        assert infant['yoy'] == {'2020': -2.0, '2021': -1.0}
+        assert (infant['points'], infant['latest']) == (4, 35.2)
+        assert stats['indicators']['WHO/child_mortality/under_five']['latest'] == 48.3
+
+    def test_gaps(self):
+        """Test missing years are listed as ranges, and empty series as missing entirely"""
+        gaps = compute_statistics(SOURCES)['gaps']
+
+        assert gaps['UNICEF/health/infant_mortality_rate'] == ['2022']
+        assert gaps['WHO/child_mortality/under_five'] == ['2019-2020']
+        assert gaps['UNICEF/health/stunting'] == ['all']
+        assert 'UNICEF/education/primary_enrollment' not in gaps
+
+    def test_correlations(self):
+        """Test correlations use shared years only and need enough of them"""
+        correlations = compute_statistics(SOURCES)['correlations']
+        index = {label: i for i, label in enumerate(correlations['indicators'])}
+        matrix = correlations['matrix']
+        enrollment = index['UNICEF/education/primary_enrollment']
+
+        assert matrix[enrollment][enrollment] == 1.0
+        assert matrix[enrollment][index['WHO/child_mortality/under_five']] < -0.9
+        # Infant and under-five mortality share only 2021 and 2023
+        assert matrix[index['UNICEF/health/infant_mortality_rate']][index['WHO/child_mortality/under_five']] is None
+        assert [pair['r'] for pair in correlations['strong']] == sorted(
+            (pair['r'] for pair in correlations['strong']), key=abs, reverse=True
+        )
+
+    def test_correlation_matrix(self):
+        """Test the masked correlation matches NumPy's on complete rows and skips constant ones"""
+        values = np.array([[1.0, 2.0, 3.0, 5.0], [2.0, 1.0, 4.0, 3.0], [7.0, 7.0, 7.0, 7.0]])
+        result = correlation_matrix(np.array(['a', 'b', 'c']), values)
+
+        assert result['matrix'][0][1] == round(float(np.corrcoef(values[0], values[1])[0, 1]), 3)
+        assert result['matrix'][0][2] is None
+
+    def test_compact_statistics(self):
+        """Test statistics are rendered as prompt facts within the budget"""
+        text, _ = compact_statistics(compute_statistics(SOURCES))
+        short, stats = compact_statistics(compute_statistics(SOURCES), budget=60)
+
+        assert 'UNICEF/education/primary_enrollment: 2019-2023 n=5 latest=88 yoy2023=+2 (+2.33%) cagr=+2.41% slope=+2/yr' in text
+        assert 'UNICEF/health/stunting: all' in text
+        assert stats['tokens_after'] <= 60 and stats['omitted'] > 0
+        assert compact_statistics({}) == ('', {'tokens_before': 0, 'tokens_after': 0, 'omitted': 0})
@@ -0,0 +1,133 @@
+import json
+import os
+import pytest
+from src.models import Observation
+from src.services.ingest_service import IngestService
+from src.tools.who_tool import WHODataTool
+from src.tools.worldbank_tool import WorldBankTool
+
+WDI_CSV = '''"Data Source","World Development Indicators",
+"Last Updated Date","2024-06-28",
+
+"Country Name","Country Code","Indicator Name","Indicator Code","2021","2022","2023",
+"Ghana","GHA","School enrollment, primary (% gross)","SE.PRM.ENRR","98.1","","99.4",
+"Ghana","GHA","Population, total","SP.POP.TOTL","32833031","33475870","34121985",
+"Nigeria","NGA","School enrollment, primary (% gross)","SE.PRM.ENRR","86.7","87.2","88.0",
+'''
+
+GHO_CSV = '''Id,IndicatorCode,SpatialDimType,SpatialDim,TimeDimType,TimeDim,Dim1Type,Dim1,Value,NumericValue,Low,High
+1,MDG_0000000007,COUNTRY,GHA,YEAR,2022,SEX,SEX_BTSX,44.0 [38.4-50.6],44.02,38.4,50.6
+2,MDG_0000000007,COUNTRY,GHA,YEAR,2022,SEX,SEX_MLE,48.1 [41.8-55.3],48.1,41.8,55.3
+3,WHS4_100,COUNTRY,GHA,YEAR,2023,,,94,94,,
+4,UNKNOWN_CODE,COUNTRY,GHA,YEAR,2023,,,1,1,,
+'''
+
+@pytest.fixture
+def wdi_file(tmp_path):
+    path = tmp_path / 'WDICSV.csv'
+    path.write_text(WDI_CSV)
+    return str(path)
+
+@pytest.fixture
+def gho_file(tmp_path):
+    path = tmp_path / 'gho.csv'
+    path.write_text(GHO_CSV)
+    return str(path)
+
+class TestIngestService:
+    def test_ingest_worldbank(self, app, wdi_file):
+        """Test the wide WDI layout is loaded for the tool's indicators only"""
+        with app.app_context():
+            stats = IngestService(batch_size=2).ingest_worldbank(wdi_file)
+
+            rows = {(o.indicator, o.region, o.year): o for o in Observation.query.all()}
+            assert stats['rows_read'] == 3
+            assert stats['observations'] == len(rows) == 5
+            assert stats['batches'] == 2
+            assert rows[('SE.PRM.ENRR', 'GHA', 2023)].value == 99.4
+            assert rows[('SE.PRM.ENRR', 'GHA', 2023)].topic == 'education'
+            assert ('SE.PRM.ENRR', 'GHA', 2022) not in rows
+            assert not any(key[0] == 'SP.POP.TOTL' for key in rows)
+
+    def test_ingest_worldbank_filters(self, app, wdi_file):
+        """Test every indicator can be loaded and countries narrowed"""
+        with app.app_context():
+            IngestService().ingest_worldbank(wdi_file, countries=['gha'], all_indicators=True)
+
+            rows = Observation.query.all()
+            assert {o.region for o in rows} == {'GHA'}
+            assert {o.topic for o in rows if o.indicator == 'SP.POP.TOTL'} == {'wdi'}
+
+    def test_ingest_resumes(self, app, wdi_file):
+        """Test a saved checkpoint skips rows that were already committed"""
+        with app.app_context():
+            service = IngestService()
+            service._write_progress(wdi_file, 'WORLDBANK', service._fingerprint(wdi_file), 1)
+
+            stats = service.ingest_worldbank(wdi_file)
+            assert stats['resumed_from'] == 1
+            assert {o.region for o in Observation.query.all()} == {'NGA'}
+
+            # Progress is cleared once the file is fully loaded
+            assert service._read_progress(wdi_file, 'WORLDBANK', service._fingerprint(wdi_file)) == 0
+
+    def test_ingest_ignores_progress_of_changed_file(self, app, wdi_file):
+        """Test a checkpoint for a different file version is not trusted"""
+        with app.app_context():
+            service = IngestService()
+            with open(wdi_file + IngestService.PROGRESS_SUFFIX, 'w') as handle:
+                json.dump({'source': 'WORLDBANK', 'fingerprint': {'size': 1, 'mtime_ns': 1}, 'rows': 3}, handle)
+
+            stats = service.ingest_worldbank(wdi_file)
+            assert stats['resumed_from'] == 0
+            assert stats['observations'] == 5
+
+    def test_ingest_who(self, app, gho_file):
+        """Test GHO codes map to tool topics and only aggregate rows are kept"""
+        with app.app_context():
+            stats = IngestService().ingest_who(gho_file)
+
+            rows = {(o.topic, o.indicator): o for o in Observation.query.all()}
+            assert stats['observations'] == 2
+            mortality = rows[('child_mortality', 'under_five_mortality_rate')]
+            assert (mortality.value, mortality.ci_low, mortality.ci_high) == (44.02, 38.4, 50.6)
+            assert rows[('immunization', 'dtp3_coverage')].ci_low is None
+
+    def test_ingest_unicef(self, app):
+        """Test SDMX-CSV totals for the tool's indicators are loaded"""
+        path = os.path.join(os.path.dirname(__file__), 'fixtures', 'unicef_sdmx.csv')
+        with app.app_context():
+            stats = IngestService().ingest_unicef(path, countries=['GHA'])
+
+            rows = {(o.topic, o.indicator, o.year): o for o in Observation.query.all()}
+            assert stats['observations'] == 3
+            assert rows[('health', 'under5_mortality_rate', 2022)].ci_high == 50.6
+            assert rows[('health', 'immunization_coverage', 2022)].value == 94.0
+
+class TestIngestCommand:
+    def test_ingest_worldbank_command(self, app, runner, wdi_file):
+        """Test the flask ingest command loads the file"""
+        result = runner.invoke(args=['ingest', 'worldbank', wdi_file, '--country', 'NGA'])
+
+        assert result.exit_code == 0, result.output
+        assert 'Loaded 3 WORLDBANK observations' in result.output
+        with app.app_context():
+            assert Observation.query.count() == 3
+
+    def test_offline_tools_answer_from_store(self, app, runner, wdi_file, gho_file):
+        """Test tools answer from ingested data without touching the network"""
+        assert runner.invoke(args=['ingest', 'worldbank', wdi_file]).exit_code == 0
+        assert runner.invoke(args=['ingest', 'who', gho_file]).exit_code == 0
+        app.config['DATA_OFFLINE'] = True
+
+        with app.app_context():
+            worldbank = WorldBankTool()
+            worldbank.session = None
+            data = worldbank.fetch_data(topics=['education'], region='GHA;NGA',
+                                        start_date='2021', end_date='2023')
+            assert {(item['countryiso3code'], item['date']) for item in data['education']} == {
+                ('GHA', '2021'), ('GHA', '2023'), ('NGA', '2021'), ('NGA', '2022'), ('NGA', '2023')
+            }
+
+            data = WHODataTool().fetch_data(topics=['immunization'], region='GHA')
+            assert data == {'immunization': {'dtp3_coverage': {'2023': 94.0}}}
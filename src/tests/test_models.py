@@ -1,6 +1,7 @@
 import pytest
 from datetime import datetime
-from src.models import User, Analysis, Report, PolicyBrief, db
+from src.models import User, Analysis, Report, PolicyBrief, Observation, DataBlob, db
+from src.utils.indicator_frame import FrameBuilder
 
 @pytest.fixture
 def test_data():
@@ -142,6 +143,55 @@ class TestAnalysis:
             assert analysis.reports[0].id == report.id
             assert analysis.user.id == user.id
 
+    def test_raw_data_is_stored_once(self, app, user, test_data):
+        """Test identical payloads share one compressed blob and rows keep a reference"""
+        with app.app_context():
+            payload = {'unicef': {'health': {'stunting': {str(year): 20.0 for year in range(2000, 2025)}}}}
+            for _ in range(2):
+                analysis = Analysis(user_id=user.id, **test_data['analysis'])
+                analysis.store_raw_data({'unicef': dict(payload['unicef'])})
+                db.session.add(analysis)
+            db.session.commit()
+            
+            blob = DataBlob.query.one()
+            assert len(blob.content) < blob.size
+            refs = [a.raw_data_ref for a in Analysis.query.all()]
+            assert refs == [{'$blob': blob.digest}] * 2
+            assert Analysis.query.first().raw_data == payload
+    
+    def test_release_blobs(self, app, user, test_data):
+        """Test a payload is deleted only once no analysis references it"""
+        with app.app_context():
+            analyses = [Analysis(user_id=user.id, **test_data['analysis']) for _ in range(2)]
+            for analysis in analyses:
+                analysis.store_raw_data({'who': {'health': {'dtp3_coverage': {'2023': 89.2}}}})
+                db.session.add(analysis)
+            db.session.commit()
+            digest = analyses[0].blob_digest
+            
+            replaced = analyses[0].store_raw_data({'who': {'health': {'dtp3_coverage': {'2023': 90.1}}}})
+            db.session.commit()
+            assert replaced == digest
+            assert Analysis.release_blobs([replaced]) == 0
+            
+            db.session.delete(analyses[1])
+            db.session.commit()
+            assert Analysis.release_blobs([digest]) == 1
+            db.session.commit()
+            assert DataBlob.query.count() == 1
+            assert db.session.get(Analysis, analyses[0].id).raw_data['who']['health']['dtp3_coverage'] == {'2023': 90.1}
+    
+    def test_inline_raw_data_still_readable(self, app, user, test_data):
+        """Test rows written before blob storage return their inline payload"""
+        with app.app_context():
+            analysis = Analysis(user_id=user.id, **test_data['analysis'])
+            analysis.raw_data_ref = {'who': {'health': {}}}
+            db.session.add(analysis)
+            db.session.commit()
+            
+            assert db.session.get(Analysis, analysis.id).raw_data == {'who': {'health': {}}}
+            assert DataBlob.query.count() == 0
+
 class TestReport:
     def test_create_report(self, app, user, analysis, test_data):
         """Test report creation"""
@@ -232,3 +282,35 @@ class TestPolicyBrief:
             
             # Test relationships
             assert brief.report.id == report.id
+
+class TestObservation:
+    def test_upsert_frame(self, app):
+        """Test observations are upserted on (source, indicator, region, year)"""
+        with app.app_context():
+            builder = FrameBuilder()
+            builder.append('WHO', 'immunization', 'dtp3_coverage', 'GHA', 2023, 89.2)
+            builder.append('WHO', 'immunization', 'dtp3_coverage', 'GHA', 2024, 90.5)
+            assert Observation.upsert_frame(builder.build()) == 2
+            
+            builder = FrameBuilder()
+            builder.append('WHO', 'immunization', 'dtp3_coverage', 'GHA', 2024, 91.0, 88.0, 93.0)
+            Observation.upsert_frame(builder.build())
+            
+            assert Observation.query.count() == 2
+            latest = Observation.query.filter_by(year=2024).one()
+            assert latest.value == 91.0
+            assert latest.ci_low == 88.0
+    
+    def test_load_frame(self, app):
+        """Test stored observations load back as a frame"""
+        with app.app_context():
+            builder = FrameBuilder()
+            for year in range(2015, 2025):
+                builder.append('UNICEF', 'health', 'stunting', 'GHA', year, 20.0 - year % 10)
+            builder.append('UNICEF', 'health', 'stunting', 'KEN', 2020, 19.0)
+            Observation.upsert_frame(builder.build())
+            
+            frame = Observation.load_frame('UNICEF', ['health'], ['GHA'], 2020, 2024)
+            
+            assert sorted(frame['year'].tolist()) == [2020, 2021, 2022, 2023, 2024]
+            assert set(frame['region']) == {'GHA'}
@@ -0,0 +1,51 @@
+import json
+import pytest
+from src.tools.odata import ODataPageReader
+
+PAGE = {
+    "@odata.context": "https://ghoapi.azureedge.net/api/$metadata#WHS4_100",
+    "value": [
+        {"SpatialDim": "GHA", "TimeDim": 2022, "NumericValue": 94.0, "Low": None},
+        {"SpatialDim": "GHA", "TimeDim": 2023, "NumericValue": 95.5, "Low": None}
+    ],
+    "@odata.nextLink": "https://ghoapi.azureedge.net/api/WHS4_100?$skiptoken=2"
+}
+
+def chunks(text, size):
+    return (text[i:i + size] for i in range(0, len(text), size))
+
+class TestODataPageReader:
+    @pytest.mark.parametrize('size', [1, 7, 4096])
+    def test_records_and_metadata(self, size):
+        """Test records stream out whatever the chunk boundaries, and metadata is kept"""
+        reader = ODataPageReader(chunks(json.dumps(PAGE, indent=1), size))
+        
+        assert list(reader) == PAGE["value"]
+        assert reader.metadata == {
+            "@odata.context": PAGE["@odata.context"],
+            "@odata.nextLink": PAGE["@odata.nextLink"]
+        }
+    
+    def test_records_are_lazy(self):
+        """Test a record is yielded before the rest of the page has arrived"""
+        consumed = []
+        
+        def tracked():
+            for chunk in chunks(json.dumps(PAGE), 16):
+                consumed.append(chunk)
+                yield chunk
+        
+        reader = iter(ODataPageReader(tracked()))
+        next(reader)
+        assert len(''.join(consumed)) < len(json.dumps(PAGE))
+    
+    def test_empty_page(self):
+        """Test empty objects and value arrays"""
+        assert list(ODataPageReader(['{}'])) == []
+        reader = ODataPageReader(['{"value": [', ']}'])
+        assert list(reader) == [] and reader.metadata == {}
+    
+    def test_malformed_page(self):
+        """Test a truncated page raises instead of silently ending"""
+        with pytest.raises(ValueError):
+            list(ODataPageReader(['{"value": [{"a": 1}']))
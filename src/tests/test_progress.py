@@ -0,0 +1,49 @@
+import threading
+import time
+from src.services.progress import ProgressBroker, format_sse, sse_stream
+
+class TestProgressBroker:
+    def test_subscribe_replays_and_follows(self):
+        """Test subscribers get past events, then live ones, and stop at a terminal event"""
+        broker = ProgressBroker(poll_interval=0.05)
+        first = broker.publish('analysis:1', 'progress', {'stage': 'fetching'})
+        broker.publish('analysis:2', 'progress', {'stage': 'fetching'})
+
+        def finish():
+            time.sleep(0.1)
+            broker.publish('analysis:1', 'progress', {'stage': 'analyzing'})
+            broker.publish('analysis:1', 'completed', {'results': {'key_findings': []}})
+
+        threading.Thread(target=finish).start()
+        events = [event for event in broker.subscribe('analysis:1', timeout=5) if event is not None]
+
+        assert [event['event'] for event in events] == ['progress', 'progress', 'completed']
+        assert events[0]['id'] == first
+        assert [event['event'] for event in broker.subscribe('analysis:1', after=events[1]['id'])] == ['completed']
+
+    def test_shared_log(self, tmp_path):
+        """Test a broker in another process sees events through the SQLite log"""
+        path = str(tmp_path / 'progress.db')
+        publisher = ProgressBroker(path=path)
+        subscriber = ProgressBroker(path=path, poll_interval=0.05)
+        publisher.publish('report:3', 'progress', {'stage': 'generating'})
+        publisher.publish('report:3', 'failed', {'error': 'quota exceeded'})
+
+        events = list(subscriber.subscribe('report:3', timeout=5))
+        assert [event['data'] for event in events] == [{'stage': 'generating'}, {'error': 'quota exceeded'}]
+
+    def test_subscribe_timeout(self):
+        """Test an idle subscription yields keep-alive slots and ends at its timeout"""
+        broker = ProgressBroker(poll_interval=0.02)
+        assert set(broker.subscribe('analysis:9', timeout=0.1)) == {None}
+
+    def test_sse_stream(self):
+        """Test events are encoded as Server-Sent Events after the snapshot"""
+        broker = ProgressBroker()
+        event_id = broker.publish('analysis:1', 'completed', {'progress': 100})
+
+        messages = list(sse_stream(broker, 'analysis:1', snapshot={'event': 'snapshot', 'data': {'progress': 40}}))
+
+        assert messages[1] == 'event: snapshot\ndata: {"progress": 40}\n\n'
+        assert messages[2] == f'id: {event_id}\nevent: completed\ndata: {{"progress": 100}}\n\n'
+        assert format_sse(None) == ': keep-alive\n\n'
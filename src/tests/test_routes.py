@@ -62,6 +62,7 @@ class TestDataRoutes:
         assert response.status_code == 200
         assert response.json['status'] == 'success'
         assert isinstance(response.json['data'], dict)
+        assert set(response.json['metadata']['data_age']['unicef']) == {'health', 'education'}
 
 class TestAnalysisRoutes:
     def test_create_analysis(self, client, auth_headers, monkeypatch):
@@ -91,9 +92,94 @@ class TestAnalysisRoutes:
             headers=auth_headers
         )
         
-        assert response.status_code == 201
+        assert response.status_code == 202
         assert response.json['status'] == 'success'
-        assert 'analysis_id' in response.json['data']
+        assert response.json['data']['job']['status'] == 'queued'
+        analysis_id = response.json['data']['analysis_id']
+        assert response.headers['Location'].endswith(f'/api/analysis/{analysis_id}')
+
+        from src.services.analysis_pipeline import get_analysis_pipeline
+        pipeline = get_analysis_pipeline()
+        assert pipeline.run_next() is not None
+        assert pipeline.run_next() is None
+
+        response = client.get(f'/api/analysis/{analysis_id}', headers=auth_headers)
+        assert response.json['data']['status'] == 'completed'
+        assert response.json['data']['job']['progress'] == 100
+        results = response.json['data']['results']
+        assert results == {**mock_analysis_result, 'statistics': results['statistics']}
+        assert 'UNICEF/health/infant_mortality_rate' in results['statistics']['indicators']
+
+    def test_analysis_events(self, client, auth_headers, mock_gemini_response, monkeypatch):
+        """Test analysis progress is published per stage and source, and streamed as SSE"""
+        async def mock_analyze_data(*args, **kwargs):
+            return mock_gemini_response
+
+        from src.services.gemini_service import GeminiService
+        from src.services.analysis_pipeline import get_analysis_pipeline
+        from src.services.progress import get_progress_broker
+        monkeypatch.setattr(GeminiService, "analyze_data", mock_analyze_data)
+
+        response = client.post('/api/analysis',
+            json={'sources': ['UNICEF', 'WHO'], 'topics': ['health'], 'region': 'GHA'},
+            headers=auth_headers
+        )
+        analysis_id = response.json['data']['analysis_id']
+        get_analysis_pipeline().run_next()
+
+        events = get_progress_broker().events(f'analysis:{analysis_id}')
+        stages = [event['data'].get('stage', event['event']) for event in events]
+        assert stages[:2] == ['queued', 'fetching']
+        assert stages[-4:] == ['validating', 'analyzing', 'saving', 'completed']
+        assert {event['data']['source'] for event in events if event['event'] == 'source'} == {'unicef', 'who'}
+        analyzing = next(event for event in events if event['data'].get('stage') == 'analyzing')
+        assert analyzing['data']['statistics']['indicators']
+        assert events[-1]['data']['results'] == {**mock_gemini_response, 'statistics': analyzing['data']['statistics']}
+
+        response = client.get(f'/api/analysis/{analysis_id}/events', headers=auth_headers)
+        assert response.mimetype == 'text/event-stream'
+        assert 'event: completed' in response.get_data(as_text=True)
+
+    def test_stream_analysis(self, client, auth_headers, mock_gemini_response, monkeypatch):
+        """Test an analysis streamed as NDJSON, one line per finished section"""
+        async def mock_stream_analysis(self, data, use_cache=True, statistics=None):
+            for section in mock_gemini_response.items():
+                yield section
+
+        from src.services.gemini_service import GeminiService
+        monkeypatch.setattr(GeminiService, "stream_analysis", mock_stream_analysis)
+
+        response = client.post('/api/analysis/stream',
+            json={'sources': ['UNICEF'], 'topics': ['health'], 'region': 'GHA'},
+            headers=auth_headers
+        )
+
+        assert response.mimetype == 'application/x-ndjson'
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert [line['type'] for line in lines] == ['started', 'statistics'] + ['section'] * len(mock_gemini_response) + ['completed']
+        assert [line['name'] for line in lines[2:-1]] == list(mock_gemini_response)
+        assert lines[-1]['results'] == {**mock_gemini_response, 'statistics': lines[1]['value']}
+
+        response = client.get(f"/api/analysis/{lines[0]['analysis_id']}", headers=auth_headers)
+        assert response.json['data']['status'] == 'completed'
+
+    def test_create_analysis_synchronous(self, app, client, auth_headers, mock_gemini_response, monkeypatch):
+        """Test running the analysis inside the request when the job queue is off"""
+        async def mock_analyze_data(*args, **kwargs):
+            return mock_gemini_response
+
+        from src.services.gemini_service import GeminiService
+        monkeypatch.setattr(GeminiService, "analyze_data", mock_analyze_data)
+        app.config['ANALYSIS_QUEUE_ENABLED'] = False
+
+        response = client.post('/api/analysis',
+            json={'sources': ['UNICEF'], 'topics': ['health'], 'region': 'GHA'},
+            headers=auth_headers
+        )
+
+        assert response.status_code == 201
+        assert response.json['data']['status'] == 'completed'
+        assert response.json['data']['results'] == {**mock_gemini_response, 'statistics': response.json['data']['results']['statistics']}
         
     def test_get_analysis(self, client, auth_headers, analysis):
         """Test retrieving analysis"""
@@ -121,6 +207,18 @@ class TestReportRoutes:
         assert response.status_code == 201
         assert response.json['status'] == 'success'
         assert 'report_id' in response.json['data']
+
+    def test_generate_report_stream(self, client, auth_headers, analysis):
+        """Test a client accepting an event stream gets report progress, then the content"""
+        response = client.post('/api/reports',
+            json={'analysis_id': analysis.id, 'type': 'summary', 'format': 'json'},
+            headers={**auth_headers, 'Accept': 'text/event-stream'}
+        )
+
+        assert response.status_code == 200
+        body = response.get_data(as_text=True)
+        assert body.index('event: snapshot') < body.index('"stage": "generating"') < body.index('event: completed')
+        assert 'Finding 1' in body
         
     def test_get_report(self, client, auth_headers, report):
         """Test retrieving report"""
@@ -0,0 +1,139 @@
+import os
+import pytest
+import requests
+from src.tools.sdmx import parse_sdmx_csv, sdmx_row_parser
+from src.tools.unicef_tool import UNICEFDataTool
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+SERIES = {
+    'CME_MRY0T4': ('health', 'under5_mortality_rate'),
+    'IM_DTP3': ('health', 'immunization_coverage')
+}
+
+def read_lines(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as handle:
+        return handle.read().splitlines()
+
+class FakeStreamResponse:
+    """Streamed response serving recorded lines"""
+    
+    def __init__(self, lines):
+        self.lines = lines
+        self.encoding = None
+    
+    def raise_for_status(self):
+        pass
+    
+    def iter_lines(self, decode_unicode=False):
+        return iter(self.lines)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+
+class FakeSession:
+    def __init__(self, lines):
+        self.lines = lines
+        self.requests = []
+    
+    def get(self, url, params=None, stream=False, timeout=None):
+        self.requests.append((url, params, stream))
+        return FakeStreamResponse(self.lines)
+
+class DroppingSession(FakeSession):
+    """Session whose first response breaks off after the header line"""
+    
+    def get(self, url, params=None, stream=False, timeout=None):
+        response = super().get(url, params, stream, timeout)
+        if len(self.requests) == 1:
+            def dropped(decode_unicode=False):
+                yield self.lines[0]
+                raise requests.exceptions.ChunkedEncodingError("Connection broken: IncompleteRead")
+            response.iter_lines = dropped
+        return response
+
+class TestSDMXParser:
+    def test_parse_sdmx_csv(self):
+        """Test totals for the requested series become frame rows"""
+        frame = parse_sdmx_csv(read_lines('unicef_sdmx.csv'), SERIES)
+        records = {(r['indicator'], r['region'], r['year']): r for r in frame.to_records()}
+        
+        assert set(records) == {
+            ('under5_mortality_rate', 'GHA', 2021),
+            ('under5_mortality_rate', 'GHA', 2022),
+            ('immunization_coverage', 'GHA', 2022),
+            ('under5_mortality_rate', 'NGA', 2022)
+        }
+        point = records[('under5_mortality_rate', 'GHA', 2022)]
+        assert (point['value'], point['ci_low'], point['ci_high']) == (44.0, 38.4, 50.6)
+        assert records[('immunization_coverage', 'GHA', 2022)]['ci_low'] is None
+        assert set(frame['topic']) == {'health'}
+    
+    def test_parse_filters_regions(self):
+        """Test only the requested countries are kept"""
+        frame = parse_sdmx_csv(read_lines('unicef_sdmx.csv'), SERIES, regions=['nga'])
+        assert frame['region'].tolist() == ['NGA']
+    
+    def test_parse_labelled_export(self):
+        """Test "CODE: Label" headers and cells are reduced to their codes"""
+        frame = parse_sdmx_csv(read_lines('unicef_sdmx_labelled.csv'), SERIES)
+        
+        assert len(frame) == 1
+        assert (frame['region'][0], frame['year'][0], frame['value'][0]) == ('GHA', 2022, 44.0)
+    
+    def test_row_parser_skips_breakdowns_and_gaps(self):
+        """Test per-sex rows and rows without a value parse to None"""
+        header, *rows = [line.split(',') for line in read_lines('unicef_sdmx.csv')]
+        parse = sdmx_row_parser(header)
+        parsed = [parse(row) for row in rows]
+        
+        assert parsed[1] == ('CME_MRY0T4', 'GHA', 2022, 44.0, 38.4, 50.6)
+        assert parsed[2] is None and parsed[4] is None
+        assert parsed[6][:3] == ('NT_ANT_HAZ_NE2_MOD', 'NGA', 2021)
+    
+    def test_missing_columns(self):
+        """Test a header without the core columns is rejected"""
+        with pytest.raises(ValueError):
+            sdmx_row_parser(['DATAFLOW', 'REF_AREA', 'OBS_VALUE'])
+    
+    def test_empty_response(self):
+        """Test an empty body parses to an empty frame"""
+        assert len(parse_sdmx_csv([], SERIES)) == 0
+
+class TestUNICEFLiveFetch:
+    def test_fetch_data_streams_sdmx(self, app):
+        """Test the live path streams SDMX-CSV into the nested payload"""
+        app.config['SOURCE_MOCK_DATA'] = False
+        with app.app_context():
+            tool = UNICEFDataTool()
+            tool.session = FakeSession(read_lines('unicef_sdmx.csv'))
+            
+            data = tool.fetch_data(topics=['health'], region='GHA', start_date='2021', end_date='2023',
+                                   indicators=['under5_mortality_rate'])
+            
+            url, params, stream = tool.session.requests[0]
+            assert stream and url.endswith('/GHA.CME_MRY0T4._T')
+            assert (params['startPeriod'], params['endPeriod']) == (2021, 2023)
+            assert data['health'] == {'under5_mortality_rate': {
+                '2021': {'rate': 45.7, 'confidence_interval': [40.4, 51.9]},
+                '2022': {'rate': 44.0, 'confidence_interval': [38.4, 50.6]}
+            }}
+    
+    def test_dropped_body_is_retried(self, app):
+        """Test a body broken off mid-stream counts as a breaker failure and is retried"""
+        app.config['SOURCE_MOCK_DATA'] = False
+        with app.app_context():
+            tool = UNICEFDataTool()
+            tool.session = DroppingSession(read_lines('unicef_sdmx.csv'))
+            tool.breaker.reset()
+            tool.breaker._sleep = lambda delay: None
+            
+            data = tool.fetch_data(topics=['health'], region='GHA', start_date='2021', end_date='2023',
+                                   indicators=['under5_mortality_rate'])
+            
+            assert len(tool.session.requests) == 2
+            assert tool.breaker.to_dict()['failures'] == 1
+            assert set(data['health']['under5_mortality_rate']) == {'2021', '2022'}
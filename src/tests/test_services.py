@@ -1,6 +1,23 @@
+import asyncio
+import threading
 import pytest
+import time
+from src.services.analysis_pipeline import AnalysisPipeline
 from src.services.data_service import DataService
-from src.models import DataSource, db
+from src.services.scheduler import RefreshScheduler
+from src.services.single_flight import SingleFlight
+from src.utils.circuit_breaker import get_breaker, reset_breakers
+from datetime import datetime, timedelta
+from src.models import Analysis, AnalysisJob, DataSource, Observation, db
+from src.utils.indicator_frame import FrameBuilder
+
+def store_series(source, topic, series, region='GHA'):
+    """Seed the observation store with {indicator: {year: value}} series"""
+    builder = FrameBuilder()
+    for indicator, values in series.items():
+        for year, value in values.items():
+            builder.append(source, topic, indicator, region, year, value)
+    Observation.upsert_frame(builder.build())
 
 class TestDataService:
     def test_get_data(self, app, data_sources):
@@ -43,4 +60,447 @@ class TestDataService:
             metadata = service.get_source_metadata('UNICEF')
             
             assert metadata['type'] == 'UNICEF'
-            assert 'supported_indicators' in metadata['metadata'] 
\ No newline at end of file
+            assert 'supported_indicators' in metadata['metadata']
+    
+    def test_get_data_parallel(self, app, data_sources, monkeypatch):
+        """Test sources are fetched concurrently with per-source error isolation"""
+        with app.app_context():
+            service = DataService()
+            
+            def slow_fetch(**kwargs):
+                time.sleep(0.3)
+                return {"health": {"dtp3_coverage": {"2023": 89.2}}}
+            
+            def failing_fetch(**kwargs):
+                time.sleep(0.3)
+                raise Exception("upstream unavailable")
+            
+            monkeypatch.setattr(service.who_tool, 'fetch_data', slow_fetch)
+            monkeypatch.setattr(service.unicef_tool, 'fetch_data', failing_fetch)
+            
+            started = time.monotonic()
+            data = service.get_data(sources=['UNICEF', 'WHO'], topics=['health'], parallel=True)
+            elapsed = time.monotonic() - started
+            
+            assert elapsed < 0.55
+            assert data['unicef'] == {"error": "upstream unavailable"}
+            assert data['who']['health']['dtp3_coverage'] == {"2023": 89.2}
+    
+    @pytest.mark.parametrize('parallel', [True, False])
+    def test_get_data_isolates_lookup_errors(self, app, data_sources, monkeypatch, parallel):
+        """Test errors before the upstream fetch fail only their own source"""
+        with app.app_context():
+            service = DataService()
+            
+            def failing_lookup(*args, **kwargs):
+                raise ValueError("bad stored series")
+            
+            monkeypatch.setattr(service.unicef_tool, 'stored_series', failing_lookup)
+            data = service.get_data(sources=['UNICEF', 'WHO'], topics=['health'], parallel=parallel)
+            
+            assert data['unicef'] == {"error": "bad stored series"}
+            assert 'health' in data['who']
+    
+    def test_get_data_source_deadline(self, app, data_sources, monkeypatch):
+        """Test a slow source is cut off at the per-source deadline"""
+        with app.app_context():
+            app.config['SOURCE_FETCH_TIMEOUT'] = 0.2
+            service = DataService()
+            
+            def hanging_fetch(**kwargs):
+                time.sleep(1)
+                return {}
+            
+            monkeypatch.setattr(service.who_tool, 'fetch_data', hanging_fetch)
+            
+            data = service.get_data(sources=['UNICEF', 'WHO'], topics=['health'], parallel=True)
+            
+            assert 'timed out' in data['who']['error']
+            assert 'health' in data['unicef']
+    
+    def test_get_data_cached(self, app, data_sources, monkeypatch):
+        """Test repeated fetches are served from the fetch cache"""
+        with app.app_context():
+            service = DataService()
+            calls = []
+            
+            def counting_fetch(**kwargs):
+                calls.append(kwargs['topics'])
+                return {"health": {"dtp3_coverage": {"2023": 89.2}}}
+            
+            monkeypatch.setattr(service.who_tool, 'fetch_data', counting_fetch)
+            
+            first = service.get_data(sources=['WHO'], topics=['health'], region='GHA')
+            second = service.get_data(sources=['WHO'], topics=['health'], region='GHA')
+            
+            assert first == second
+            assert len(calls) == 1
+            assert service.get_cache_stats()['hits'] == 1
+            
+            assert service.clear_cache('data:GHA:*') == 1
+            service.get_data(sources=['WHO'], topics=['health'], region='GHA')
+            assert len(calls) == 2
+    
+    def test_get_data_from_observation_store(self, app, data_sources, monkeypatch):
+        """Test covered topics are answered from stored observations"""
+        with app.app_context():
+            store_series('UNICEF', 'health', {
+                'infant_mortality_rate': {2023: 35.2, 2024: 34.1},
+                'under5_mortality_rate': {2023: 46.8, 2024: 45.2},
+                'immunization_coverage': {2023: 85.7, 2024: 87.3},
+                # Checked upstream without a value
+                'maternal_health': {2023: None, 2024: None}
+            })
+            service = DataService()
+            
+            def failing_fetch(**kwargs):
+                raise Exception("upstream should not be called")
+            
+            monkeypatch.setattr(service.unicef_tool, 'fetch_data', failing_fetch)
+            
+            data = service.get_data(sources=['UNICEF'], topics=['health'], region='GHA',
+                                    start_date='2023-01-01', end_date='2024-12-31')
+            assert data['unicef']['health']['infant_mortality_rate'] == {'2023': 35.2, '2024': 34.1}
+            assert 'maternal_health' not in data['unicef']['health']
+            
+            # A wider year range is not covered and goes upstream
+            wider = service.get_data(sources=['UNICEF'], topics=['health'], region='GHA',
+                                     start_date='2015-01-01', end_date='2024-12-31')
+            assert 'error' in wider['unicef']
+    
+    def test_observation_store_checks_indicators(self, app, data_sources, monkeypatch):
+        """Test stored rows of one indicator do not cover the topic's other indicators"""
+        with app.app_context():
+            store_series('UNICEF', 'health', {'infant_mortality_rate': {2023: 35.2, 2024: 34.1}})
+            service = DataService()
+            dates = {'start_date': '2023-01-01', 'end_date': '2024-12-31'}
+            calls = []
+            
+            def counting_fetch(**kwargs):
+                calls.append(kwargs.get('indicators'))
+                return {"health": {"under5_mortality_rate": {"2023": 44.7, "2024": 43.9}}}
+            
+            monkeypatch.setattr(service.unicef_tool, 'fetch_data', counting_fetch)
+            
+            filtered = service.get_data(sources=['UNICEF'], topics=['health'], region='GHA',
+                                        indicators=['infant_mortality_rate'], **dates)
+            assert filtered['unicef']['health'] == {'infant_mortality_rate': {'2023': 35.2, '2024': 34.1}}
+            assert calls == []
+            
+            # The default request plans every health indicator, so it goes upstream
+            full = service.get_data(sources=['UNICEF'], topics=['health'], region='GHA', **dates)
+            assert calls == [None]
+            assert 'under5_mortality_rate' in full['unicef']['health']
+    
+    def test_mock_data_is_not_stored(self, app, data_sources):
+        """Test sample series are served but never stored as observations"""
+        with app.app_context():
+            data = DataService().get_data(sources=['UNICEF', 'WHO'], topics=['health'], region='GHA',
+                                          start_date='2023-01-01', end_date='2024-12-31')
+            
+            assert data['unicef']['health'] and data['who']['health']
+            assert Observation.query.count() == 0
+    
+    def test_refresh_source_warms_hot_pairs(self, app, data_sources, analysis, monkeypatch):
+        """Test a refresh fetches the most requested pairs and records its outcome"""
+        with app.app_context():
+            service = DataService()
+            window = ('2023-01-01T00:00:00', '2024-01-01T00:00:00')
+            assert service.get_hot_pairs('UNICEF') == [('health', 'GHA', *window), ('education', 'GHA', *window)]
+            
+            outcome = service.refresh_source('UNICEF')
+            assert outcome['status'] == 'active'
+            assert outcome['pairs'] == 2
+            
+            source = DataSource.query.filter_by(type='UNICEF').first()
+            assert source.source_metadata['last_refresh']['duration_ms'] >= 0
+            assert source.last_fetch is not None
+            
+            def failing_fetch(**kwargs):
+                raise Exception("upstream should not be called")
+            
+            monkeypatch.setattr(service.unicef_tool, 'fetch_data', failing_fetch)
+            # The warmed keys are the ones the analysis pipeline reads
+            data = service.get_data(sources=['UNICEF'], topics=['health', 'education'], region='GHA',
+                                    start_date=window[0], end_date=window[1])
+            assert set(data['unicef']) == {'health', 'education'}
+    
+    def test_refresh_source_error(self, app, data_sources, monkeypatch):
+        """Test a failed refresh is recorded on the source row"""
+        with app.app_context():
+            # The in-memory test database is one connection; keep writers serial
+            app.config['DATA_FETCH_MAX_WORKERS'] = 1
+            service = DataService()
+            
+            def failing_fetch(**kwargs):
+                raise Exception("upstream unavailable")
+            
+            monkeypatch.setattr(service.who_tool, 'fetch_data', failing_fetch)
+            monkeypatch.setattr(service.worldbank_tool, 'fetch_data', lambda **kwargs: {})
+            status = service.refresh_data_sources()
+            
+            assert status['WHO Global Health Observatory'].startswith('error: ')
+            source = DataSource.query.filter_by(type='WHO').first()
+            assert source.status == 'error'
+            assert 'upstream unavailable' in source.source_metadata['last_error']
+            assert source.source_metadata['last_refresh']['status'] == 'error'
+    
+    def test_open_circuit_serves_stale_cache(self, app, data_sources, monkeypatch):
+        """Test an open circuit fails fast, falling back to expired cache entries"""
+        with app.app_context():
+            reset_breakers()
+            app.config['FETCH_CACHE_TTL'] = 0
+            service = DataService()
+            service.get_data(sources=['WHO'], topics=['health'], region='GHA')
+            
+            calls = []
+            monkeypatch.setattr(service.who_tool, 'fetch_data', lambda **kwargs: calls.append(kwargs))
+            breaker = get_breaker('WHO')
+            for _ in range(breaker.failure_threshold):
+                breaker.record_failure()
+            
+            data = service.get_data(sources=['WHO', 'UNICEF'], topics=['health', 'education'], region='GHA')
+            assert calls == []
+            assert 'health' in data['who']
+            assert 'education' not in data['who']
+            
+            data = service.get_data(sources=['WHO'], topics=['education'], region='GHA')
+            assert 'unavailable' in data['who']['error']
+            
+            circuits = {source['type']: source['circuit'] for source in service.get_available_sources()}
+            assert circuits['WHO']['state'] == 'open'
+            assert circuits['UNICEF']['state'] == 'closed'
+            reset_breakers()
+    
+    def test_concurrent_fetches_are_coalesced(self, app, data_sources, monkeypatch):
+        """Test identical concurrent fetches share one upstream call"""
+        with app.app_context():
+            service = DataService()
+            calls = []
+            
+            def slow_fetch(**kwargs):
+                calls.append(kwargs['topics'])
+                time.sleep(0.3)
+                return {"health": {"dtp3_coverage": {"2023": 89.2}}}
+            
+            monkeypatch.setattr(service.who_tool, 'fetch_data', slow_fetch)
+            results = []
+            
+            def fetch():
+                with app.app_context():
+                    results.append(service.get_data(sources=['WHO'], topics=['health'], use_cache=False))
+            
+            threads = [threading.Thread(target=fetch) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            
+            assert calls == [['health']]
+            assert all(result == results[0] for result in results)
+            assert results[0]['who']['health'] == {"dtp3_coverage": {"2023": 89.2}}
+            
+            stats = service.get_fetch_stats()['coalescing']
+            assert (stats['led'], stats['joined'], stats['in_flight']) == (1, 3, 0)
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_async_fetches_are_coalesced(self, app, data_sources, monkeypatch):
+        """Test asyncio tasks asking for the same data share one upstream call"""
+        with app.app_context():
+            service = DataService()
+            calls = []
+            
+            def slow_fetch(**kwargs):
+                calls.append(kwargs['topics'])
+                time.sleep(0.3)
+                return {"health": {"dtp3_coverage": {"2023": 89.2}}}
+            
+            monkeypatch.setattr(service.who_tool, 'fetch_data', slow_fetch)
+            results = await asyncio.gather(*[
+                service.get_data_async(sources=['WHO'], topics=['health'], use_cache=False)
+                for _ in range(3)
+            ])
+            
+            assert calls == [['health']]
+            assert results[0] == results[1] == results[2]
+    
+    def test_stale_while_revalidate(self, app, data_sources, monkeypatch):
+        """Test expired payloads are served at once and refreshed in the background"""
+        with app.app_context():
+            app.config.update({'FETCH_CACHE_TTL': 0.2, 'FETCH_SWR_WINDOW': 60})
+            service = DataService()
+            data, ages = service.get_data_with_age(sources=['WHO'], topics=['health'])
+            assert ages == {'who': {'health': 0.0}}
+            time.sleep(0.3)
+            
+            refreshed = threading.Event()
+            
+            def slow_fetch(**kwargs):
+                time.sleep(0.3)
+                refreshed.set()
+                return {"health": {"dtp3_coverage": {"2023": 91.0}}}
+            
+            monkeypatch.setattr(service.who_tool, 'fetch_data', slow_fetch)
+            
+            started = time.monotonic()
+            stale, ages = service.get_data_with_age(sources=['WHO'], topics=['health'])
+            assert time.monotonic() - started < 0.2
+            assert stale['who']['health'] == data['who']['health']
+            assert ages['who']['health'] >= 0.3
+            
+            assert refreshed.wait(2)
+            time.sleep(0.1)
+            fresh, ages = service.get_data_with_age(sources=['WHO'], topics=['health'])
+            assert fresh['who']['health'] == {"dtp3_coverage": {"2023": 91.0}}
+            assert ages['who']['health'] < 0.2
+
+class TestSingleFlight:
+    def test_joiners_share_result_and_errors(self):
+        """Test joined callers get the leader's result or error"""
+        flights = SingleFlight()
+        led, joined = flights.claim({'health': 'k1', 'education': 'k2'})
+        assert set(led) == {'health', 'education'} and joined == {}
+        
+        led_again, joined_again = flights.claim({'health': 'k1', 'wash': 'k3'})
+        assert set(led_again) == {'wash'} and set(joined_again) == {'health'}
+        
+        flights.resolve(led, {'health': {'value': 1}})
+        assert joined_again['health'].result() == {'value': 1}
+        assert led['education'].result() is None
+        
+        flights.fail(led_again, ValueError('upstream down'))
+        with pytest.raises(ValueError):
+            led_again['wash'].result()
+        assert flights.get_stats()['in_flight'] == 0
+    
+    def test_release_unblocks_joiners(self):
+        """Test an abandoned flight fails instead of hanging its joiners"""
+        flights = SingleFlight()
+        led, _ = flights.claim({'health': 'k1'})
+        _, joined = flights.claim({'health': 'k1'})
+        
+        flights.release(led.values())
+        with pytest.raises(RuntimeError):
+            joined['health'].result(timeout=1)
+
+class TestRefreshScheduler:
+    def test_run_pending(self, app, data_sources, monkeypatch):
+        """Test due sources are refreshed once per jittered interval"""
+        with app.app_context():
+            app.config.update({'REFRESH_INTERVAL': 100, 'REFRESH_JITTER': 0.1})
+            service = DataService()
+            refreshed = []
+            monkeypatch.setattr(service, 'refresh_source',
+                                lambda source_type: refreshed.append(source_type) or {'status': 'active'})
+            scheduler = RefreshScheduler(app, service)
+            
+            now = time.time()
+            assert sorted(scheduler.run_pending(now)) == ['UNICEF', 'WHO', 'WORLDBANK']
+            assert scheduler.wait(5)['WHO'] == {'status': 'active'}
+            
+            # Nothing is due again until roughly one interval later
+            assert scheduler.run_pending(now + 1) == []
+            assert scheduler.run_pending(now + 85) == []
+            assert len(scheduler.run_pending(now + 115)) == 3
+            scheduler.wait(5)
+            assert sorted(refreshed) == ['UNICEF', 'UNICEF', 'WHO', 'WHO', 'WORLDBANK', 'WORLDBANK']
+    
+    def test_schedule_from_last_fetch(self, app, data_sources, monkeypatch):
+        """Test the first run is scheduled an interval after the last fetch, read as UTC"""
+        with app.app_context():
+            app.config.update({'REFRESH_INTERVAL': 100, 'REFRESH_JITTER': 0})
+            # A host clock away from UTC must not shift the schedule
+            monkeypatch.setenv('TZ', 'America/New_York')
+            time.tzset()
+            service = DataService()
+            monkeypatch.setattr(service, 'refresh_source', lambda source_type: {'status': 'active'})
+            scheduler = RefreshScheduler(app, service)
+            service.source_tools  # Registers the World Bank source row
+            for source in DataSource.query.all():
+                source.last_fetch = datetime.utcnow()
+            db.session.commit()
+            
+            now = time.time()
+            assert scheduler.run_pending(now + 90) == []
+            assert scheduler._next_run['WHO'] == pytest.approx(now + 100, abs=5)
+        monkeypatch.undo()
+        time.tzset()
+
+class TestAnalysisPipeline:
+    def _queue(self, pipeline):
+        return pipeline.enqueue(Analysis(
+            sources=['UNICEF'],
+            topics=['health'],
+            region='GHA',
+            date_range_start=datetime(2023, 1, 1),
+            date_range_end=datetime(2024, 1, 1),
+            status='pending'
+        ), {'use_cache': False})
+
+    def test_failed_job(self, app, data_sources):
+        """Test that a failing pipeline fails both the job and its analysis"""
+        class FailingGemini:
+            async def analyze_data(self, data, use_cache=True, statistics=None):
+                assert use_cache is False
+                assert statistics is not None
+                raise Exception("Analysis failed: quota exceeded")
+
+        with app.app_context():
+            pipeline = AnalysisPipeline(app, gemini_service=FailingGemini())
+            job_id = self._queue(pipeline).id
+
+            assert pipeline.run_next() == job_id
+            job = db.session.get(AnalysisJob, job_id)
+            db.session.refresh(job)
+            assert job.status == 'failed'
+            assert job.stage == 'analyzing'
+            assert job.attempts == 1
+            assert job.analysis.status == 'failed'
+            assert 'quota exceeded' in job.analysis.error
+            # Fetched data was committed before the LLM call failed
+            assert job.analysis.raw_data is not None
+
+    @pytest.mark.asyncio
+    async def test_data_committed_before_llm_call(self, app, data_sources):
+        """Test the synchronous path commits fetched data before calling Gemini"""
+        class FailingGemini:
+            async def analyze_data(self, data, use_cache=True, statistics=None):
+                raise Exception("Analysis failed: quota exceeded")
+
+        with app.app_context():
+            pipeline = AnalysisPipeline(app, gemini_service=FailingGemini())
+            analysis = Analysis(sources=['UNICEF'], topics=['health'], region='GHA',
+                                date_range_start=datetime(2023, 1, 1),
+                                date_range_end=datetime(2024, 1, 1), status='processing')
+            db.session.add(analysis)
+            db.session.commit()
+
+            with pytest.raises(Exception):
+                await pipeline.process(analysis)
+            # Failing rolls the session back, which must not lose the data
+            assert analysis.status == 'failed'
+            assert analysis.raw_data is not None
+
+    def test_requeue_stale(self, app, data_sources):
+        """Test that jobs of a dead worker are requeued until they run out of attempts"""
+        app.config.update({'ANALYSIS_JOB_TIMEOUT': 60, 'ANALYSIS_JOB_MAX_ATTEMPTS': 2})
+        with app.app_context():
+            pipeline = AnalysisPipeline(app)
+            job = self._queue(pipeline)
+            job.status, job.attempts = 'running', 1
+            job.heartbeat_at = datetime.utcnow() - timedelta(seconds=120)
+            db.session.commit()
+
+            assert pipeline.requeue_stale() == 1
+            db.session.refresh(job)
+            assert job.status == 'queued'
+
+            job.status, job.attempts = 'running', 2
+            job.heartbeat_at = datetime.utcnow() - timedelta(seconds=120)
+            db.session.commit()
+
+            assert pipeline.requeue_stale() == 1
+            db.session.refresh(job)
+            assert job.status == 'failed'
+            assert job.analysis.status == 'failed'
+            assert pipeline.requeue_stale() == 0
@@ -0,0 +1,350 @@
+import json
+import pytest
+import requests
+from src.models import Observation
+from src.tools.unicef_tool import UNICEFDataTool
+from src.tools.validation import ValidationReport
+from src.tools.who_tool import WHODataTool
+from src.tools.worldbank_tool import WorldBankTool
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+    
+    def raise_for_status(self):
+        pass
+    
+    def json(self):
+        return self.payload
+
+class FakeSession:
+    """Serve World Bank style pages of [metadata, records]"""
+    
+    def __init__(self, pages):
+        self.pages = pages
+        self.requested = []
+        self.urls = []
+    
+    def get(self, url, params=None, timeout=None):
+        self.urls.append(url)
+        self.requested.append(params)
+        page = params['page']
+        meta = {"page": page, "pages": len(self.pages), "per_page": params['per_page'],
+                "total": sum(len(p) for p in self.pages)}
+        return FakeResponse([meta, self.pages[page - 1]])
+
+class FakeStreamedResponse:
+    """Streamed response serving a JSON document in small chunks"""
+    
+    def __init__(self, payload):
+        self.text = json.dumps(payload)
+        self.encoding = None
+        self.closed = False
+    
+    def raise_for_status(self):
+        pass
+    
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        return (self.text[i:i + 10] for i in range(0, len(self.text), 10))
+    
+    def close(self):
+        self.closed = True
+
+class FakeODataSession:
+    """Serve OData pages in order"""
+    
+    def __init__(self, pages):
+        self.pages = list(pages)
+        self.requested = []
+    
+    def get(self, url, params=None, stream=False, timeout=None):
+        self.requested.append((url, params))
+        return FakeStreamedResponse(self.pages.pop(0))
+
+def worldbank_item(year, value, indicator='SE.PRM.ENRR', country='GHA'):
+    return {
+        "indicator": {"id": indicator, "value": "School enrollment, primary"},
+        "country": {"id": country[:2], "value": country},
+        "countryiso3code": country,
+        "date": str(year),
+        "value": value
+    }
+
+class TestWorldBankTool:
+    def test_iter_records_follows_pages(self, app):
+        """Test the pager yields records from every page"""
+        with app.app_context():
+            tool = WorldBankTool()
+            tool.session = FakeSession([
+                [worldbank_item(2000 + i, i) for i in range(3)],
+                [worldbank_item(2010 + i, i) for i in range(3)],
+                [worldbank_item(2020, 1.0)]
+            ])
+            
+            records = list(tool.iter_records('https://api.worldbank.org/v2/x', {}))
+            
+            assert len(records) == 7
+            assert [p['page'] for p in tool.session.requested] == [1, 2, 3]
+    
+    def test_iter_records_is_lazy(self, app):
+        """Test later pages are not requested until the consumer needs them"""
+        with app.app_context():
+            tool = WorldBankTool()
+            tool.session = FakeSession([[worldbank_item(2000, 1)]] * 5)
+            
+            records = tool.iter_records('https://api.worldbank.org/v2/x', {}, prefetch=False)
+            next(records)
+            records.close()
+            
+            assert len(tool.session.requested) == 1
+    
+    def test_page_count_from_total(self, app):
+        """Test page count falls back to total/per_page"""
+        with app.app_context():
+            tool = WorldBankTool()
+            assert tool._page_count({"total": 2500, "per_page": 1000}) == 3
+            assert tool._page_count({"pages": 4}) == 4
+            assert tool._page_count({}) == 1
+    
+    def test_fetch_data_drops_null_values(self, app):
+        """Test fetched records are validated as pages stream in"""
+        with app.app_context():
+            tool = WorldBankTool()
+            tool.session = FakeSession([
+                [worldbank_item(2022, 101.2), worldbank_item(2023, None)],
+                [worldbank_item(2024, 99.8)]
+            ])
+            
+            data = tool.fetch_data(topics=['education'], region='GHA',
+                                   start_date='2022-01-01T00:00:00', end_date='2024')
+            
+            assert [item['date'] for item in data['education']] == ['2022', '2024']
+            assert tool.session.requested[0]['date'] == '2022:2024'
+    
+    def test_fetch_data_requests_only_delta(self, app):
+        """Test overlapping date ranges only fetch the years not stored yet"""
+        with app.app_context():
+            tool = WorldBankTool()
+            tool.session = FakeSession([[
+                worldbank_item(2021, 98.1), worldbank_item(2022, None), worldbank_item(2023, 99.4)
+            ]])
+            tool.fetch_data(topics=['education'], region='GHA', start_date='2021', end_date='2023')
+            
+            tool.session = FakeSession([[worldbank_item(2024, 100.2), worldbank_item(2025, 101.0)]])
+            data = tool.fetch_data(topics=['education'], region='GHA', start_date='2022', end_date='2025')
+            
+            assert [params['date'] for params in tool.session.requested] == ['2024:2025']
+            assert sorted(item['date'] for item in data['education']) == ['2023', '2024', '2025']
+            
+            # Everything is fresh now, so nothing goes upstream
+            tool.session = FakeSession([[]])
+            data = tool.fetch_data(topics=['education'], region='GHA', start_date='2021', end_date='2025')
+            
+            assert tool.session.requested == []
+            assert len(data['education']) == 4
+    
+    def test_fetch_data_merges_refetched_cells(self, app):
+        """Test stored cells a refetch covers again are returned once, with the refetched value"""
+        with app.app_context():
+            tool = WorldBankTool()
+            tool.session = FakeSession([[
+                worldbank_item(2021, 98.1, country='GHA'), worldbank_item(2022, 99.0, country='GHA'),
+                worldbank_item(2023, 99.4, country='GHA'),
+                worldbank_item(2021, 86.7, country='NGA'), worldbank_item(2023, 88.0, country='NGA')
+            ]])
+            tool.fetch_data(topics=['education'], region='GHA;NGA', start_date='2021', end_date='2023')
+            
+            # NGA 2022 is missing, and the call for it covers GHA 2022 too
+            tool.session = FakeSession([[
+                worldbank_item(2022, 99.1, country='GHA'), worldbank_item(2022, 87.2, country='NGA')
+            ]])
+            data = tool.fetch_data(topics=['education'], region='GHA;NGA', start_date='2021', end_date='2023')
+            
+            assert [params['date'] for params in tool.session.requested] == ['2022:2022']
+            cells = [(item['countryiso3code'], item['date']) for item in data['education']]
+            assert len(cells) == len(set(cells)) == 6
+            assert [item['value'] for item in data['education']
+                    if (item['countryiso3code'], item['date']) == ('GHA', '2022')] == [99.1]
+    
+    def test_plan_delta_merges_small_gaps(self, app):
+        """Test missing years close together are fetched as one range"""
+        with app.app_context():
+            tool = WorldBankTool()
+            batch = {"indicators": {"SE.PRM.ENRR": "education"}, "countries": ["GHA", "NGA"]}
+            checked = {("SE.PRM.ENRR", country, year)
+                       for country in ("GHA", "NGA") for year in (2012, 2013, 2014, 2015, 2016, 2017)}
+            checked.discard(("SE.PRM.ENRR", "NGA", 2016))
+            
+            assert tool.plan_delta(batch, 2010, 2020, checked) == [(2010, 2011), (2016, 2020)]
+            assert tool.plan_delta(batch, 2012, 2015, checked) == []
+    
+    def test_plan_batches(self, app):
+        """Test topics and countries are merged into one call per list limit"""
+        with app.app_context():
+            tool = WorldBankTool()
+            batches = tool.plan_batches(['education', 'health'], ['GHA', 'NGA', 'KEN'])
+            
+            assert len(batches) == 1
+            assert batches[0]['countries'] == ['GHA', 'NGA', 'KEN']
+            assert batches[0]['indicators'] == {'SE.PRM.ENRR': 'education', 'SH.STA.MMRT': 'health'}
+            
+            tool.MAX_BATCH_COUNTRIES = 2
+            assert len(tool.plan_batches(['education'], ['GHA', 'NGA', 'KEN'])) == 2
+    
+    def test_plan_batches_with_indicators(self, app):
+        """Test named indicators become their WDI codes, and only those are requested"""
+        with app.app_context():
+            tool = WorldBankTool()
+            batches = tool.plan_batches(['education', 'health'], ['GHA'],
+                                        indicators=['secondary_enrollment_rate', 'SH.DYN.MORT'])
+            
+            assert batches[0]['indicators'] == {'SE.SEC.ENRR': 'education', 'SH.DYN.MORT': 'health'}
+            assert tool.plan_batches(['education'], ['GHA'], indicators=['gini_index']) == []
+    
+    def test_fetch_data_batched(self, app):
+        """Test a regional comparison costs one round trip and is split per topic"""
+        with app.app_context():
+            tool = WorldBankTool()
+            tool.session = FakeSession([[
+                worldbank_item(2023, 101.2, 'SE.PRM.ENRR', 'GHA'),
+                worldbank_item(2023, 87.5, 'SE.PRM.ENRR', 'NGA'),
+                worldbank_item(2023, 263.0, 'SH.STA.MMRT', 'GHA'),
+                worldbank_item(2023, 1047.0, 'SH.STA.MMRT', 'NGA')
+            ]])
+            
+            data = tool.fetch_data(topics=['education', 'health'], region='GHA;NGA')
+            
+            assert len(tool.session.urls) == 1
+            assert tool.session.urls[0].endswith('/country/GHA;NGA/indicator/SE.PRM.ENRR;SH.STA.MMRT')
+            assert tool.session.requested[0]['source'] == 2
+            assert [item['countryiso3code'] for item in data['education']] == ['GHA', 'NGA']
+            assert [item['value'] for item in data['health']] == [263.0, 1047.0]
+
+class TestWHODataTool:
+    def test_fetch_data_selects_series(self, app):
+        """Test only the requested groups, indicators and years are returned, and sample data is not stored"""
+        with app.app_context():
+            tool = WHODataTool()
+            data = tool.fetch_data(topics=['immunization', 'education'], region='GHA',
+                                   start_date='2024', end_date='2024', indicators=['dtp3_coverage'])
+            
+            assert {topic: value for topic, value in data.items() if topic != 'metadata'} == {
+                'immunization': {'dtp3_coverage': {'2024': 90.5}}
+            }
+            assert Observation.query.count() == 0
+    
+    def test_health_selects_every_group(self, app):
+        """Test the health topic spans the GHO indicator groups"""
+        with app.app_context():
+            data = WHODataTool().fetch_data(topics=['health'], region='GHA')
+            
+            assert set(data['health']) == {'child_mortality', 'immunization', 'nutrition'}
+            assert data['health']['child_mortality']['under_five_mortality_rate']['2023']['rate'] == 48.3
+    
+    def test_build_query(self, app):
+        """Test countries and years are pushed into the OData filter"""
+        with app.app_context():
+            url, params = WHODataTool().build_query('WHS4_100', ['GHA', 'NGA'], 2020, 2023)
+            
+            assert url.endswith('/WHS4_100')
+            assert "(SpatialDim eq 'GHA' or SpatialDim eq 'NGA')" in params['$filter']
+            assert 'TimeDim ge 2020 and TimeDim le 2023' in params['$filter']
+            assert params['$select'] == WHODataTool.ODATA_SELECT
+
+    def test_fetch_data_streams_odata_pages(self, app):
+        """Test the live path follows nextLink lazily and keeps valid totals only"""
+        app.config['SOURCE_MOCK_DATA'] = False
+        with app.app_context():
+            tool = WHODataTool()
+            tool.session = FakeODataSession([
+                {"value": [
+                    {"SpatialDim": "GHA", "TimeDim": 2022, "Dim1": "SEX_BTSX", "NumericValue": 44.02,
+                     "Low": 38.4, "High": 50.6},
+                    {"SpatialDim": "GHA", "TimeDim": 2022, "Dim1": "SEX_MLE", "NumericValue": 48.1}
+                 ],
+                 "@odata.nextLink": "https://ghoapi.azureedge.net/api/MDG_0000000007?$skiptoken=2"},
+                {"value": [
+                    {"SpatialDim": "GHA", "TimeDim": 2023, "Dim1": "SEX_BTSX", "NumericValue": None},
+                    {"SpatialDim": "GHA", "TimeDim": 2023, "Dim1": "SEX_BTSX", "NumericValue": 42.9}
+                ]}
+            ])
+            
+            data = tool.fetch_data(topics=['child_mortality'], region='GHA', start_date='2022',
+                                   end_date='2023', indicators=['under_five_mortality_rate'])
+            
+            (first_url, first_params), (next_url, next_params) = tool.session.requested
+            assert first_url.endswith('/MDG_0000000007') and 'TimeDim ge 2022' in first_params['$filter']
+            assert next_url.endswith('$skiptoken=2') and next_params is None
+            assert data['child_mortality'] == {'under_five_mortality_rate': {
+                '2022': {'rate': 44.02, 'confidence_interval': [38.4, 50.6]},
+                '2023': 42.9
+            }}
+            assert [(o.indicator, o.year) for o in Observation.query.order_by(Observation.year)] == [
+                ('under_five_mortality_rate', 2022), ('under_five_mortality_rate', 2023)
+            ]
+    
+    def test_dropped_page_is_counted_once(self, app):
+        """Test a page broken off mid-stream is retried and its records validated only once"""
+        app.config['SOURCE_MOCK_DATA'] = False
+        with app.app_context():
+            tool = WHODataTool()
+            page = {"value": [
+                {"SpatialDim": "GHA", "TimeDim": 2022, "Dim1": "SEX_BTSX", "NumericValue": 44.02},
+                {"SpatialDim": "GHA", "TimeDim": 2023, "Dim1": "SEX_BTSX", "NumericValue": None}
+            ]}
+            tool.session = FakeODataSession([page, page])
+            first = tool.session.get
+            
+            def dropping_get(url, params=None, stream=False, timeout=None):
+                response = first(url, params, stream, timeout)
+                if len(tool.session.requested) == 1:
+                    chunks = response.iter_content()
+                    
+                    def dropped(chunk_size=1, decode_unicode=False):
+                        yield from (next(chunks) for _ in range(8))
+                        raise requests.exceptions.ChunkedEncodingError("Connection broken: IncompleteRead")
+                    response.iter_content = dropped
+                return response
+            
+            tool.session.get = dropping_get
+            tool.breaker.reset()
+            tool.breaker._sleep = lambda delay: None
+            report = ValidationReport()
+            
+            rows = list(tool.iter_rows('https://ghoapi.azureedge.net/api/MDG_0000000007', {}, report))
+            
+            assert rows == [('GHA', 2022, 44.02, None, None)]
+            assert len(tool.session.requested) == 2
+            assert (report.accepted, report.rejected) == (1, 1)
+    
+    def test_validate_who_structure_streams(self, app):
+        """Test the WHO structure validator consumes an iterator of records"""
+        with app.app_context():
+            records = iter([
+                {"SpatialDim": "GHA", "TimeDim": 2023, "NumericValue": 94.0},
+                {"SpatialDim": "GHA", "TimeDim": 2024, "NumericValue": None},
+                None
+            ])
+            validated = WHODataTool().validate_data({"immunization": {"value": records, "dimension": {}}})
+            
+            assert validated["immunization"]["values"] == [
+                {"SpatialDim": "GHA", "TimeDim": 2023, "NumericValue": 94.0}
+            ]
+
+class TestUNICEFDataTool:
+    def test_fetch_data_selects_series(self, app):
+        """Test topics and indicators narrow the returned series"""
+        with app.app_context():
+            data = UNICEFDataTool().fetch_data(topics=['health', 'education'], region='GHA',
+                                               indicators=['IM_DTP3'])
+            
+            assert set(data) == {'health', 'metadata'}
+            assert data['health'] == {'immunization_coverage': {'2023': 85.7, '2024': 87.3}}
+    
+    def test_build_query(self, app):
+        """Test countries and indicators form one SDMX series key"""
+        with app.app_context():
+            url, params = UNICEFDataTool().build_query(['CME_MRY0', 'IM_DTP3'], ['GHA', 'NGA'], 2020, 2023)
+            
+            assert url.endswith('/data/UNICEF,GLOBAL_DATAFLOW,1.0/GHA+NGA.CME_MRY0+IM_DTP3._T')
+            assert (params['startPeriod'], params['endPeriod']) == (2020, 2023)
@@ -0,0 +1,63 @@
+import pytest
+from src.tools.validation import (
+    ValidationReport,
+    is_valid_value,
+    validate_payload,
+    validate_frame
+)
+from src.utils.indicator_frame import FrameBuilder
+
+class TestValidationEngine:
+    def test_is_valid_value(self):
+        """Test nested values are checked without recursion"""
+        assert is_valid_value(35.2)
+        assert is_valid_value({"2023": {"rate": 48.3, "confidence_interval": [45.2, 51.4]}})
+        assert not is_valid_value({"2023": {"rate": None}})
+        assert not is_valid_value(["ok", "  "])
+        
+        # Deeper than the recursion limit
+        deep = 1.0
+        for _ in range(5000):
+            deep = [deep]
+        assert is_valid_value(deep)
+    
+    def test_validate_payload_counts_rejections(self):
+        """Test per-field rejection counts for dict and record topics"""
+        report = ValidationReport()
+        validated = validate_payload({
+            "health": {
+                "infant_mortality_rate": {"2023": 35.2},
+                "immunization_coverage": None,
+                "maternal_health": {"2023": ""}
+            },
+            "education": [
+                {"indicator": {"id": "SE.PRM.ENRR"}, "country": {"id": "GH"}, "value": 101.2, "date": "2023"},
+                {"indicator": {"id": "SE.PRM.ENRR"}, "country": {"id": "GH"}, "value": None, "date": "2024"}
+            ],
+            "poverty": {"error": "timed out"}
+        }, report)
+        
+        assert list(validated["health"]) == ["infant_mortality_rate"]
+        assert len(validated["education"]) == 1
+        assert "poverty" not in validated
+        assert report.accepted == 2
+        assert report.rejections == {
+            "health.immunization_coverage": 1,
+            "health.maternal_health": 1,
+            "education.value": 1,
+            "poverty.error": 1
+        }
+    
+    def test_validate_frame(self):
+        """Test bulk validation over normalized columns"""
+        builder = FrameBuilder()
+        builder.append('WHO', 'health', 'dtp3', 'GHA', 2023, 89.2, 85.0, 92.0)
+        builder.append('WHO', 'health', 'dtp3', 'GHA', 2024, None)
+        builder.append('WHO', 'health', 'dtp3', 'GHA', 2025, 91.0, 95.0, 90.0)
+        report = ValidationReport()
+        
+        frame = validate_frame(builder.build(), report)
+        
+        assert frame['year'].tolist() == [2023]
+        assert report.rejections == {'value': 1, 'confidence_interval': 1}
+        assert report.accepted == 1
@@ -0,0 +1,51 @@
+import logging
+from typing import List, Optional
+import numpy as np
+from flask import current_app
+from src.models import Observation, db
+from src.tools.validation import validate_frame
+from src.utils.helpers import parse_regions, parse_year_range
+from src.utils.indicator_frame import IndicatorFrame
+
+def offline_mode() -> bool:
+    """Whether tools must answer from the local store without any network calls"""
+    return current_app.config.get('DATA_OFFLINE', False)
+
+def load_observations(source: str,
+                      topics: List[str],
+                      region: str = "GHA",
+                      start_date: Optional[str] = None,
+                      end_date: Optional[str] = None,
+                      indicators: Optional[List[str]] = None) -> IndicatorFrame:
+    """Every stored value for the requested topics, indicators, regions and years, whatever its age"""
+    start_year, end_year = parse_year_range(start_date, end_date)
+    frame = Observation.load_frame(source, topics, parse_regions(region), start_year, end_year,
+                                   indicators=indicators)
+    return frame.filter(frame.valid_mask())
+
+def store_observations(frame: IndicatorFrame, logger: logging.Logger, keep_missing: bool = False) -> int:
+    """
+    Upsert freshly fetched observations into the local store
+    
+    A failing write is logged and rolled back; it never fails the fetch.
+    
+    Args:
+        frame: Fetched observations
+        logger: Logger for write failures
+        keep_missing: Also store cells the source answered without a value,
+            as NULL, so they count as checked rather than missing
+    Returns:
+        Number of observations written
+    """
+    if not current_app.config.get('OBSERVATION_STORE_ENABLED', True):
+        return 0
+    try:
+        rows = validate_frame(frame)
+        if keep_missing and len(frame):
+            answered = ~np.isfinite(frame['value']) & (frame['year'] > 0)
+            rows = IndicatorFrame.concat([rows, frame.filter(answered)])
+        return Observation.upsert_frame(rows)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to store observations: {str(e)}")
+        return 0
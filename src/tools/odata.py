@@ -0,0 +1,96 @@
+import json
+from typing import Any, Dict, Iterable, Iterator
+
+_decoder = json.JSONDecoder()
+
+class ODataPageReader:
+    """
+    Incrementally parse one OData JSON page from a stream of text chunks
+
+    Iterating yields the records of the page's "value" array one at a time,
+    decoding each with raw_decode as soon as its text has arrived, so the
+    page is never held in memory as a whole. Every other top-level member
+    ("@odata.context", "@odata.nextLink", ...) is collected into metadata,
+    which is complete once iteration finishes.
+    """
+
+    def __init__(self, chunks: Iterable[str]):
+        self._chunks = iter(chunks)
+        self._buffer = ''
+        self._pos = 0
+        self.metadata: Dict[str, Any] = {}
+
+    def __iter__(self) -> Iterator[Any]:
+        self._expect('{')
+        if self._peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self._decode()
+            self._expect(':')
+            if key == 'value' and self._peek() == '[':
+                self._pos += 1
+                yield from self._array()
+            else:
+                self.metadata[key] = self._decode()
+            if self._next() == '}':
+                return
+            self._pos -= 1
+            self._expect(',')
+
+    def _array(self) -> Iterator[Any]:
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self._decode()
+            char = self._next()
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError(f"Malformed OData page: expected ',' or ']' but found {char!r}")
+
+    def _fill(self) -> bool:
+        """Append the next chunk, dropping the text already consumed"""
+        for chunk in self._chunks:
+            if chunk:
+                self._buffer = self._buffer[self._pos:] + chunk
+                self._pos = 0
+                return True
+        return False
+
+    def _peek(self) -> str:
+        """Next non-whitespace character without consuming it ('' at the end of the stream)"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in ' \t\r\n':
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ''
+
+    def _next(self) -> str:
+        char = self._peek()
+        self._pos += 1
+        return char
+
+    def _expect(self, char: str) -> None:
+        found = self._next()
+        if found != char:
+            raise ValueError(f"Malformed OData page: expected {char!r} but found {found!r}")
+
+    def _decode(self) -> Any:
+        """Decode the JSON value at the cursor, reading more chunks until it is complete"""
+        self._peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number or literal ending the buffer may continue in the next chunk
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
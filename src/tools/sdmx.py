@@ -0,0 +1,94 @@
+import csv
+import math
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from src.utils.indicator_frame import FrameBuilder, IndicatorFrame
+
+# Breakdown dimensions whose totals are kept; the store holds one value per
+# (indicator, region, year), so per-sex, per-area and per-quintile rows are skipped
+SDMX_TOTAL_DIMENSIONS = ('SEX', 'RESIDENCE', 'WEALTH_QUINTILE')
+SDMX_TOTAL_CODES = {'', '_T'}
+
+# (indicator code, region, year, value, lower bound, upper bound)
+SDMXObservation = Tuple[str, str, int, float, Optional[float], Optional[float]]
+
+def _concept(name: str) -> str:
+    """Code part of a labelled header or cell ("REF_AREA:Geographic area", "GHA: Ghana")"""
+    return name.split(':', 1)[0].strip().lstrip('\ufeff')
+
+def sdmx_row_parser(header: List[str]) -> Callable[[List[str]], Optional[SDMXObservation]]:
+    """
+    Build a parser for the data rows of an SDMX-CSV file
+
+    Works with both id-only and labelled ("GHA: Ghana") exports. Rows for a
+    breakdown rather than the total, and rows without a numeric value or
+    year, parse to None.
+
+    Raises:
+        ValueError: If the header lacks REF_AREA, INDICATOR, TIME_PERIOD or OBS_VALUE
+    """
+    index = {_concept(name): i for i, name in enumerate(header)}
+    missing = [name for name in ('REF_AREA', 'INDICATOR', 'TIME_PERIOD', 'OBS_VALUE') if name not in index]
+    if missing:
+        raise ValueError(f"SDMX-CSV header is missing {', '.join(missing)}")
+    area, indicator, period, value = (index[name] for name in ('REF_AREA', 'INDICATOR', 'TIME_PERIOD', 'OBS_VALUE'))
+    low, high = index.get('LOWER_BOUND'), index.get('UPPER_BOUND')
+    breakdowns = [index[name] for name in SDMX_TOTAL_DIMENSIONS if name in index]
+    width = max(index.values()) + 1
+
+    def number(row: List[str], i: Optional[int]) -> Optional[float]:
+        if i is None:
+            return None
+        try:
+            parsed = float(row[i])
+        except ValueError:
+            return None
+        return parsed if math.isfinite(parsed) else None
+
+    def parse(row: List[str]) -> Optional[SDMXObservation]:
+        if len(row) < width:
+            return None
+        if any(_concept(row[i]) not in SDMX_TOTAL_CODES for i in breakdowns):
+            return None
+        year = row[period].strip()[:4]
+        observed = number(row, value)
+        if observed is None or not year.isdigit():
+            return None
+        return (_concept(row[indicator]), _concept(row[area]).upper(), int(year),
+                observed, number(row, low), number(row, high))
+
+    return parse
+
+def parse_sdmx_csv(lines: Iterable[str],
+                   series: Dict[str, Tuple[str, str]],
+                   source: str = 'UNICEF',
+                   regions: Optional[Iterable[str]] = None) -> IndicatorFrame:
+    """
+    Stream SDMX-CSV lines straight into an IndicatorFrame
+
+    Rows are parsed one at a time into the frame's columns, so memory grows
+    with the kept observations rather than with the response.
+
+    Args:
+        lines: Decoded CSV lines, e.g. a streamed response's iter_lines()
+        series: {indicator code: (topic, indicator name)} to keep
+        source: Source recorded on each observation
+        regions: Country codes to keep (default: all)
+    """
+    builder = FrameBuilder()
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return builder.build()
+    parse = sdmx_row_parser(header)
+    regions = {region.upper() for region in regions} if regions else None
+
+    for row in reader:
+        observation = parse(row)
+        if observation is None:
+            continue
+        code, region, year, value, low, high = observation
+        if code not in series or (regions is not None and region not in regions):
+            continue
+        topic, name = series[code]
+        builder.append(source, topic, name, region, year, value, low, high)
+    return builder.build()
@@ -1,9 +1,16 @@
 import requests
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 import logging
 from flask import current_app
 from src.models import DataSource, db
+from src.utils.helpers import parse_regions, parse_year_range, select_series
+from src.utils.circuit_breaker import get_breaker
+from src.utils.http import get_session, request_timeout
+from src.utils.indicator_frame import FrameBuilder, IndicatorFrame, from_unicef, to_nested
+from src.tools.observation_store import load_observations, offline_mode, store_observations
+from src.tools.sdmx import parse_sdmx_csv
+from src.tools.validation import ValidationReport, validate_payload
 import os
 
 class UNICEFDataTool:
@@ -18,8 +25,57 @@ class UNICEFDataTool:
         "nutrition": "/nutrition"
     }
     
+    # UNICEF Data Warehouse SDMX API and the indicator codes behind each topic
+    SDMX_URL = "https://sdmx.data.unicef.org/ws/public/sdmxapi/rest"
+    SDMX_DATAFLOW = "UNICEF,GLOBAL_DATAFLOW,1.0"
+    SDMX_INDICATORS = {
+        "health": {
+            "infant_mortality_rate": "CME_MRY0",
+            "under5_mortality_rate": "CME_MRY0T4",
+            "immunization_coverage": "IM_DTP3",
+            "maternal_health": "MNCH_SAB"
+        },
+        "education": {
+            "primary_enrollment": "ED_ANAR_L1",
+            "secondary_enrollment": "ED_ANAR_L3",
+            "completion_rate": "ED_CR_L1",
+            "gender_parity": "ED_ANAR_L1_GPI"
+        },
+        "protection": {
+            "child_labor": "PT_CHLD_5-17_LBR_ECON-HC",
+            "child_marriage": "PT_F_20-24_MRD_U18",
+            "birth_registration": "PT_CHLD_Y0T4_REG",
+            "violence_against_children": "PT_CHLD_1-14_PS-PSY-V_CGVR"
+        },
+        "wash": {
+            "water_access": "WS_PPL_W-B",
+            "sanitation_access": "WS_PPL_S-B",
+            "hygiene_practices": "WS_PPL_H-B",
+            "school_wash": "WS_SCH_W-B"
+        },
+        "nutrition": {
+            "stunting": "NT_ANT_HAZ_NE2_MOD",
+            "wasting": "NT_ANT_WHZ_NE2",
+            "underweight": "NT_ANT_WAZ_NE2_MOD",
+            "breastfeeding": "NT_BF_EXBF"
+        }
+    }
+    
+    # Development stand-in for the API, by SDMX code
+    MOCK_SERIES = {
+        "CME_MRY0": {"2023": 35.2, "2024": 34.1},
+        "CME_MRY0T4": {"2023": 46.8, "2024": 45.2},
+        "IM_DTP3": {"2023": 85.7, "2024": 87.3},
+        "ED_ANAR_L1": {"2023": 92.3, "2024": 93.1},
+        "ED_ANAR_L3": {"2023": 73.4, "2024": 74.8},
+        "ED_CR_L1": {"2023": 78.5, "2024": 79.2},
+        "ED_ANAR_L1_GPI": {"2023": 0.98, "2024": 0.99}
+    }
+    
     def __init__(self):
         self.logger = logging.getLogger(__name__)
+        self.session = get_session('UNICEF')
+        self.breaker = get_breaker('UNICEF')
         self._init_data_source()
     
     def _init_data_source(self):
@@ -38,42 +94,16 @@ class UNICEFDataTool:
             )
             db.session.add(source)
             db.session.commit()
-        self.data_source = source
+        self.data_source_id = source.id
+    
+    @property
+    def data_source(self) -> DataSource:
+        """Data source row bound to the current session"""
+        return db.session.get(DataSource, self.data_source_id)
 
     def _get_supported_indicators(self) -> Dict[str, List[str]]:
         """Get supported indicators for each endpoint"""
-        return {
-            "health": [
-                "infant_mortality_rate",
-                "under5_mortality_rate",
-                "immunization_coverage",
-                "maternal_health"
-            ],
-            "education": [
-                "primary_enrollment",
-                "secondary_enrollment",
-                "completion_rate",
-                "gender_parity"
-            ],
-            "protection": [
-                "child_labor",
-                "child_marriage",
-                "birth_registration",
-                "violence_against_children"
-            ],
-            "wash": [
-                "water_access",
-                "sanitation_access",
-                "hygiene_practices",
-                "school_wash"
-            ],
-            "nutrition": [
-                "stunting",
-                "wasting",
-                "underweight",
-                "breastfeeding"
-            ]
-        }
+        return {topic: list(codes) for topic, codes in self.SDMX_INDICATORS.items()}
 
     def fetch_data(self, 
                   topics: List[str], 
@@ -81,76 +111,148 @@ class UNICEFDataTool:
                   start_date: Optional[str] = None,
                   end_date: Optional[str] = None,
                   indicators: Optional[List[str]] = None) -> Dict:
-        """Fetch data from UNICEF API (mock data for development)"""
-        # Return mock data since we don't have API access
-        return {
-            "health": {
-                "infant_mortality_rate": {
-                    "2023": 35.2,
-                    "2024": 34.1
-                },
-                "under5_mortality_rate": {
-                    "2023": 46.8,
-                    "2024": 45.2
-                },
-                "immunization_coverage": {
-                    "2023": 85.7,
-                    "2024": 87.3
-                }
-            },
-            "education": {
-                "primary_enrollment": {
-                    "2023": 92.3,
-                    "2024": 93.1
-                },
-                "secondary_enrollment": {
-                    "2023": 73.4,
-                    "2024": 74.8
-                },
-                "completion_rate": {
-                    "2023": 78.5,
-                    "2024": 79.2
-                },
-                "gender_parity": {
-                    "2023": 0.98,
-                    "2024": 0.99
-                }
-            },
-            "metadata": {
-                "country": "Ghana",
-                "region": region,
-                "time_period": f"{start_date} to {end_date}",
-                "data_source": "UNICEF Mock Data"
-            }
+        """
+        Fetch the requested SDMX series
+        
+        Indicators narrow the topics, by name or SDMX code, and only the
+        requested years are kept. Sample series are served, but not stored,
+        while SOURCE_MOCK_DATA is set.
+        """
+        plan = select_series(self.SDMX_INDICATORS, topics, indicators)
+        for topic in topics:
+            if topic not in self.SDMX_INDICATORS:
+                self.logger.warning(f"Unsupported topic: {topic}")
+        
+        if offline_mode():
+            names = [name for codes in plan.values() for name in codes]
+            return self.from_frame(load_observations('UNICEF', list(plan), region, start_date, end_date, indicators=names))
+        
+        start_year, end_year = parse_year_range(start_date, end_date)
+        regions = parse_regions(region)
+        series = {code: (topic, name) for topic, codes in plan.items() for name, code in codes.items()}
+        frame = self.fetch_frame(series, regions, start_year, end_year) \
+            if series else IndicatorFrame.empty()
+        
+        data = to_nested(frame)
+        data["metadata"] = {
+            "country": "Ghana",
+            "region": region,
+            "time_period": f"{start_date} to {end_date}",
+            "data_source": "UNICEF Mock Data" if current_app.config.get('SOURCE_MOCK_DATA', True)
+            else "UNICEF Data Warehouse"
+        }
+        
+        # Sample series are never stored, or they would be served as real
+        # observations. Cells the answer left out are stored empty, so they
+        # count as checked.
+        if not current_app.config.get('SOURCE_MOCK_DATA', True):
+            unanswered = self._unanswered(frame, series, regions, start_year, end_year)
+            store_observations(IndicatorFrame.concat([frame, unanswered]), self.logger, keep_missing=True)
+        return data
+    
+    def build_query(self, codes: List[str], regions: List[str], start_year: int, end_year: int) -> Tuple[str, Dict]:
+        """
+        SDMX request for a set of indicators
+        
+        The series key (REF_AREA.INDICATOR.SEX) names exactly the countries
+        and indicators wanted, so one request covers every topic and the
+        period parameters trim the years server-side. Responses are id-only
+        SDMX-CSV, the most compact format the API serves.
+        
+        Returns:
+            (url, params)
+        """
+        key = f"{'+'.join(regions)}.{'+'.join(codes)}._T"
+        return f"{self.SDMX_URL}/data/{self.SDMX_DATAFLOW}/{key}", {
+            "startPeriod": start_year,
+            "endPeriod": end_year,
+            "format": "csv",
+            "labels": "id"
         }
+    
+    def fetch_frame(self,
+                    series: Dict[str, Tuple[str, str]],
+                    regions: List[str],
+                    start_year: int,
+                    end_year: int) -> IndicatorFrame:
+        """
+        Fetch indicators as a columnar frame
+        
+        The SDMX-CSV response is streamed line by line into the frame, so
+        the raw document is never held in memory.
+        
+        Args:
+            series: {SDMX code: (topic, indicator name)}
+            regions: Country codes
+        """
+        if current_app.config.get('SOURCE_MOCK_DATA', True):
+            return self._mock_frame(series, regions, start_year, end_year)
+        
+        url, params = self.build_query(list(series), regions, start_year, end_year)
+        # The body is read inside the breaker, so a connection dropped mid-stream counts as a failure
+        return self.breaker.call(self._fetch_csv, url, params, series, regions)
+    
+    def _fetch_csv(self, url: str, params: Dict, series: Dict[str, Tuple[str, str]], regions: List[str]) -> IndicatorFrame:
+        with self._request(url, params) as response:
+            return parse_sdmx_csv(response.iter_lines(decode_unicode=True), series, 'UNICEF', regions)
+    
+    def _request(self, url: str, params: Dict) -> requests.Response:
+        response = self.session.get(url, params=params, stream=True, timeout=request_timeout())
+        response.raise_for_status()
+        if response.encoding is None:
+            response.encoding = 'utf-8'
+        return response
+    
+    def _mock_frame(self,
+                    series: Dict[str, Tuple[str, str]],
+                    regions: List[str],
+                    start_year: int,
+                    end_year: int) -> IndicatorFrame:
+        """Sample series shaped like an API answer, with the same period filter applied"""
+        builder = FrameBuilder()
+        for code, (topic, name) in series.items():
+            for region in regions:
+                for year, value in self.MOCK_SERIES.get(code, {}).items():
+                    if start_year <= int(year) <= end_year:
+                        builder.append('UNICEF', topic, name, region, int(year), value)
+        return builder.build()
 
-    def validate_data(self, data: Dict) -> Dict:
-        """Validate and clean fetched data"""
-        validated_data = {}
-        for topic, topic_data in data.items():
-            if "error" in topic_data:
-                continue
-                
-            # Remove null values and validate data types
-            validated_data[topic] = {
-                k: v for k, v in topic_data.items()
-                if v is not None and self._validate_data_point(k, v)
-            }
+    @staticmethod
+    def _unanswered(frame: IndicatorFrame,
+                    series: Dict[str, Tuple[str, str]],
+                    regions: List[str],
+                    start_year: int,
+                    end_year: int) -> IndicatorFrame:
+        """Requested (series, region, year) cells missing from an answer, without a value"""
+        answered = set(zip(frame['indicator'].tolist(), frame['region'].tolist(), frame['year'].tolist()))
+        builder = FrameBuilder()
+        for topic, name in series.values():
+            for region in regions:
+                for year in range(start_year, end_year + 1):
+                    if (name, region, year) not in answered:
+                        builder.append('UNICEF', topic, name, region, year, None)
+        return builder.build()
+    
+    def to_frame(self, data: Dict, region: str = "GHA") -> IndicatorFrame:
+        """Normalize fetched data into a columnar IndicatorFrame"""
+        return from_unicef(data, region)
+    
+    def from_frame(self, frame: IndicatorFrame) -> Dict:
+        """Rebuild this tool's payload shape from stored observations"""
+        return to_nested(frame)
+    
+    def stored_series(self, topics: List[str], indicators: Optional[List[str]] = None) -> Dict[str, List[Tuple[str, str]]]:
+        """
+        Stored (topic, indicator) keys a request for each topic reads
         
-        return validated_data
+        Returns:
+            {topic: [(topic, name)]}, leaving out topics with nothing selected
+        """
+        return {
+            topic: [(topic, name) for name in codes]
+            for topic, codes in select_series(self.SDMX_INDICATORS, topics, indicators).items()
+        }
     
-    def _validate_data_point(self, key: str, value: any) -> bool:
-        """Validate individual data points"""
-        try:
-            if isinstance(value, (int, float)):
-                return True
-            elif isinstance(value, str):
-                return bool(value.strip())
-            elif isinstance(value, dict):
-                return all(self._validate_data_point(k, v) for k, v in value.items())
-            elif isinstance(value, list):
-                return all(self._validate_data_point(str(i), v) for i, v in enumerate(value))
-            return False
-        except Exception as e:
-            self.logger.error(f"Validation error for {key}: {str(e)}")
-            return False
+    def validate_data(self, data: Dict, report: Optional[ValidationReport] = None) -> Dict:
+        """Validate and clean fetched data"""
+        return validate_payload(data, report)
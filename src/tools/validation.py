@@ -0,0 +1,142 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+from collections import Counter
+import numpy as np
+from src.utils.indicator_frame import IndicatorFrame
+
+WORLDBANK_REQUIRED_FIELDS = ('indicator', 'country', 'value', 'date')
+WHO_REQUIRED_FIELDS = ('SpatialDim', 'TimeDim', 'NumericValue')
+
+class ValidationReport:
+    """Accepted/rejected counts, with rejections broken down per field"""
+
+    def __init__(self):
+        self.accepted = 0
+        self.rejected = 0
+        self.rejections = Counter()
+
+    def reject(self, field: str, count: int = 1) -> None:
+        self.rejected += count
+        self.rejections[field] += count
+
+    def merge(self, other: 'ValidationReport') -> None:
+        """Add another report's counts to this one"""
+        self.accepted += other.accepted
+        self.rejected += other.rejected
+        self.rejections.update(other.rejections)
+
+    def to_dict(self) -> Dict:
+        return {
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'rejections': dict(self.rejections)
+        }
+
+def is_valid_value(value) -> bool:
+    """
+    Check a value is a number, a non-blank string, or a dict/list of them
+
+    Walks nested containers with an explicit stack instead of recursion,
+    so deep or wide payloads cost no Python call frames per element.
+    """
+    stack = [value]
+    pop, extend = stack.pop, stack.extend
+    while stack:
+        item = pop()
+        kind = type(item)
+        if kind is float or kind is int:
+            continue
+        if kind is str:
+            if not item.strip():
+                return False
+        elif kind is dict:
+            extend(item.values())
+        elif kind is list:
+            extend(item)
+        elif isinstance(item, (int, float)):
+            continue
+        elif isinstance(item, str):
+            if not item.strip():
+                return False
+        elif isinstance(item, dict):
+            extend(item.values())
+        elif isinstance(item, list):
+            extend(item)
+        else:
+            return False
+    return True
+
+def validate_mapping(topic: str, topic_data: Dict, report: ValidationReport) -> Dict:
+    """Keep the fields of one topic whose values are present and valid"""
+    validated = {}
+    for field, value in topic_data.items():
+        if value is not None and is_valid_value(value):
+            validated[field] = value
+            report.accepted += 1
+        else:
+            report.reject(f"{topic}.{field}")
+    return validated
+
+def iter_valid_records(topic: str,
+                       records: Iterable[Dict],
+                       required_fields: Sequence[str],
+                       report: ValidationReport) -> Iterator[Dict]:
+    """Lazily yield records that carry a non-null value for every required field"""
+    for record in records:
+        for field in required_fields:
+            if record.get(field) is None:
+                report.reject(f"{topic}.{field}")
+                break
+        else:
+            report.accepted += 1
+            yield record
+
+def validate_records(topic: str,
+                     records: Iterable[Dict],
+                     required_fields: Sequence[str],
+                     report: ValidationReport) -> List[Dict]:
+    """Keep records that carry a non-null value for every required field"""
+    return list(iter_valid_records(topic, records, required_fields, report))
+
+def validate_payload(data: Dict,
+                     report: Optional[ValidationReport] = None,
+                     required_fields: Sequence[str] = WORLDBANK_REQUIRED_FIELDS) -> Dict:
+    """
+    Validate a tool payload of {topic: dict or list of records}
+
+    Topics that carry an "error" entry are dropped. Dict topics keep their
+    valid fields; list topics keep records that have all required fields.
+    """
+    report = report if report is not None else ValidationReport()
+    validated_data = {}
+    for topic, topic_data in data.items():
+        if "error" in topic_data:
+            report.reject(f"{topic}.error")
+            continue
+        if isinstance(topic_data, list):
+            validated_data[topic] = validate_records(topic, topic_data, required_fields, report)
+        elif isinstance(topic_data, dict):
+            validated_data[topic] = validate_mapping(topic, topic_data, report)
+    return validated_data
+
+def validate_frame(frame: IndicatorFrame,
+                   report: Optional[ValidationReport] = None) -> IndicatorFrame:
+    """Vectorized validation of normalized columns in bulk"""
+    report = report if report is not None else ValidationReport()
+    if not len(frame):
+        return frame
+
+    missing_value = ~np.isfinite(frame['value'])
+    bad_year = frame['year'] <= 0
+    blank_indicator = np.char.str_len(frame['indicator']) == 0
+    inverted_interval = frame['ci_low'] > frame['ci_high']
+
+    rejected = missing_value | bad_year | blank_indicator | inverted_interval
+    for field, mask in (('value', missing_value),
+                        ('year', bad_year & ~missing_value),
+                        ('indicator', blank_indicator & ~missing_value & ~bad_year),
+                        ('confidence_interval', inverted_interval & ~missing_value & ~bad_year & ~blank_indicator)):
+        count = int(mask.sum())
+        if count:
+            report.reject(field, count)
+    report.accepted += int((~rejected).sum())
+    return frame.filter(~rejected)
@@ -1,9 +1,22 @@
 import requests
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from datetime import datetime
 import logging
 from flask import current_app
 from src.models import DataSource, db
+from src.utils.helpers import parse_regions, parse_year_range, select_series
+from src.utils.circuit_breaker import get_breaker
+from src.utils.http import get_session, request_timeout
+from src.utils.indicator_frame import FrameBuilder, IndicatorFrame, from_who, to_nested
+from src.tools.observation_store import load_observations, offline_mode, store_observations
+from src.tools.odata import ODataPageReader
+from src.tools.validation import (
+    ValidationReport,
+    WHO_REQUIRED_FIELDS,
+    is_valid_value,
+    iter_valid_records,
+    validate_payload
+)
 
 class WHODataTool:
     """WHO Data API Tool for fetching health data"""
@@ -17,8 +30,58 @@ class WHODataTool:
         "disease_prevention": "/indicator/DISEASE"
     }
     
+    # Global Health Observatory codes behind the supported indicators
+    GHO_INDICATORS = {
+        "child_mortality": {
+            "under_five_mortality_rate": "MDG_0000000007",
+            "infant_mortality_rate": "MDG_0000000001",
+            "neonatal_mortality_rate": "WHOSIS_000003"
+        },
+        "immunization": {
+            "dtp3_coverage": "WHS4_100",
+            "measles_coverage": "WHS8_110",
+            "polio_coverage": "WHS4_544",
+            "bcg_coverage": "WHS4_543"
+        },
+        "nutrition": {
+            "stunting_prevalence": "NUTRITION_HA_2",
+            "wasting_prevalence": "NUTRITION_WH_2",
+            "underweight_prevalence": "NUTRITION_WA_2"
+        },
+        "maternal_health": {
+            "maternal_mortality_ratio": "MDG_0000000026",
+            "skilled_birth_attendance": "MDG_0000000025"
+        },
+        "disease_prevention": {
+            "malaria_incidence": "MALARIA_EST_INCIDENCE",
+            "tuberculosis_incidence": "MDG_0000000020",
+            "hiv_prevalence": "MDG_0000000029"
+        }
+    }
+    
+    # Columns requested from the OData API
+    ODATA_SELECT = "SpatialDim,TimeDim,Dim1,Dim2,Dim3,NumericValue,Low,High"
+    CHUNK_SIZE = 65536
+    
+    # Dimension codes of aggregate rows; breakdowns are skipped in favour of totals
+    GHO_TOTAL_CODES = {'', 'BTSX', 'SEX_BTSX', 'BOTHSEXES', 'TOTL', 'RESIDENCEAREATYPE_TOTL'}
+    
+    # Development stand-in for the API, by GHO code
+    MOCK_SERIES = {
+        "MDG_0000000007": {
+            "2023": {"rate": 48.3, "confidence_interval": [45.2, 51.4]},
+            "2024": {"rate": 46.9, "confidence_interval": [43.8, 50.0]}
+        },
+        "WHS4_100": {"2023": 89.2, "2024": 90.5},
+        "WHS8_110": {"2023": 86.7, "2024": 88.1},
+        "NUTRITION_HA_2": {"2023": 18.8, "2024": 18.1},
+        "NUTRITION_WH_2": {"2023": 6.8, "2024": 6.5}
+    }
+    
     def __init__(self):
         self.logger = logging.getLogger(__name__)
+        self.session = get_session('WHO')
+        self.breaker = get_breaker('WHO')
         self._init_data_source()
     
     def _init_data_source(self):
@@ -30,14 +93,19 @@ class WHODataTool:
                 type='WHO',
                 url=self.BASE_URL,
                 status='active',
-                metadata={
+                source_metadata={
                     'endpoints': self.ENDPOINTS,
                     'supported_indicators': self._get_supported_indicators()
                 }
             )
             db.session.add(source)
             db.session.commit()
-        self.data_source = source
+        self.data_source_id = source.id
+    
+    @property
+    def data_source(self) -> DataSource:
+        """Data source row bound to the current session"""
+        return db.session.get(DataSource, self.data_source_id)
 
     def _get_supported_indicators(self) -> Dict[str, List[str]]:
         """Get supported indicators for each endpoint"""
@@ -77,91 +145,261 @@ class WHODataTool:
                   start_date: Optional[str] = None,
                   end_date: Optional[str] = None,
                   indicators: Optional[List[str]] = None) -> Dict:
-        """Fetch data from WHO API (mock data for development)"""
-        return {
-            "health": {
-                "child_mortality": {
-                    "2023": {
-                        "rate": 48.3,
-                        "confidence_interval": [45.2, 51.4]
-                    },
-                    "2024": {
-                        "rate": 46.9,
-                        "confidence_interval": [43.8, 50.0]
-                    }
-                },
-                "immunization": {
-                    "dtp3_coverage": {
-                        "2023": 89.2,
-                        "2024": 90.5
-                    },
-                    "measles_coverage": {
-                        "2023": 86.7,
-                        "2024": 88.1
-                    }
-                },
-                "nutrition": {
-                    "stunting_prevalence": {
-                        "2023": 18.8,
-                        "2024": 18.1
-                    },
-                    "wasting_prevalence": {
-                        "2023": 6.8,
-                        "2024": 6.5
-                    }
-                }
-            },
-            "metadata": {
-                "country": "Ghana",
-                "source": "WHO Mock Data",
-                "last_updated": datetime.utcnow().isoformat()
-            }
+        """
+        Fetch the requested GHO series
+        
+        "health" selects every indicator group; a group name such as
+        "immunization" selects that group alone. Indicators narrow the groups
+        further, by name or GHO code, and only the requested years are kept.
+        Sample series are served, but not stored, while SOURCE_MOCK_DATA is set.
+        """
+        plan = self.plan_series(topics, indicators)
+        series = {
+            code: (group, name)
+            for groups in plan.values() for group, codes in groups.items() for name, code in codes.items()
+        }
+        
+        if offline_mode():
+            groups = list(dict.fromkeys(group for group, _ in series.values()))
+            names = [name for _, name in series.values()]
+            nested = self.from_frame(load_observations('WHO', groups, region, start_date, end_date, indicators=names))
+            return self._shape(plan, lambda group, name, code: nested.get(group, {}).get(name))
+        
+        start_year, end_year = parse_year_range(start_date, end_date)
+        frame = self.fetch_frame(series, parse_regions(region), start_year, end_year) \
+            if series else IndicatorFrame.empty()
+        nested = self.from_frame(frame)
+        data = self._shape(plan, lambda group, name, code: nested.get(group, {}).get(name))
+        data["metadata"] = {
+            "country": "Ghana",
+            "source": "WHO Mock Data" if current_app.config.get('SOURCE_MOCK_DATA', True)
+            else "WHO Global Health Observatory",
+            "last_updated": datetime.utcnow().isoformat()
         }
+        
+        # Sample series are never stored, or they would be served as real observations
+        if not current_app.config.get('SOURCE_MOCK_DATA', True):
+            store_observations(frame, self.logger)
+        return data
+    
+    def plan_series(self, topics: List[str], indicators: Optional[List[str]] = None) -> Dict[str, Dict[str, Dict[str, str]]]:
+        """
+        GHO codes to request for each topic
+        
+        Returns:
+            {topic: {group: {name: code}}}, leaving out unsupported topics
+        """
+        plan = {}
+        for topic in topics:
+            if topic == "health":
+                groups = list(self.GHO_INDICATORS)
+            elif topic in self.GHO_INDICATORS:
+                groups = [topic]
+            else:
+                self.logger.warning(f"Unsupported topic: {topic}")
+                continue
+            series = select_series(self.GHO_INDICATORS, groups, indicators)
+            if series:
+                plan[topic] = series
+        return plan
+    
+    def build_query(self, code: str, regions: List[str], start_year: int, end_year: int) -> Tuple[str, Dict]:
+        """
+        OData request for one GHO indicator
+        
+        Countries and years are filtered server-side and only the columns the
+        tool reads are selected, so nothing else crosses the wire.
+        
+        Returns:
+            (url, params)
+        """
+        countries = " or ".join(f"SpatialDim eq '{country}'" for country in regions)
+        return f"{self.BASE_URL}/{code}", {
+            "$filter": (f"SpatialDimType eq 'COUNTRY' and ({countries}) "
+                        f"and TimeDim ge {start_year} and TimeDim le {end_year}"),
+            "$select": self.ODATA_SELECT
+        }
+    
+    def fetch_frame(self,
+                    series: Dict[str, Tuple[str, str]],
+                    regions: List[str],
+                    start_year: int,
+                    end_year: int,
+                    report: Optional[ValidationReport] = None) -> IndicatorFrame:
+        """
+        Fetch GHO indicators as a columnar frame
+        
+        Each page is validated and compacted record by record as it streams
+        in, so only the compact rows of one page are held at a time, never
+        its raw records or its whole text.
+        
+        Args:
+            series: {GHO code: (group, indicator name)}
+            regions: Country codes
+        """
+        if current_app.config.get('SOURCE_MOCK_DATA', True):
+            return self._mock_frame(series, start_year, end_year, regions)
+        
+        report = report if report is not None else ValidationReport()
+        builder = FrameBuilder()
+        for code, (group, name) in series.items():
+            url, params = self.build_query(code, regions, start_year, end_year)
+            for region, year, value, low, high in self.iter_rows(url, params, report):
+                builder.append('WHO', group, name, region, year, value, low, high)
+        if report.rejected:
+            self.logger.debug(f"WHO records rejected: {report.to_dict()['rejections']}")
+        return builder.build()
+    
+    def iter_rows(self,
+                  url: str,
+                  params: Optional[Dict] = None,
+                  report: Optional[ValidationReport] = None) -> Iterator[Tuple[str, int, float, Optional[float], Optional[float]]]:
+        """
+        Lazily yield the compact rows of an OData query across every page
+        
+        The next page is only requested, following "@odata.nextLink", once
+        the consumer has drained the current one. Each page's body is read
+        inside the circuit breaker call, so a connection dropped mid-page
+        counts as an upstream failure and is retried like a failed request;
+        only the attempt that succeeds is counted in report.
+        """
+        report = report if report is not None else ValidationReport()
+        while url:
+            rows, metadata, page_report = self.breaker.call(self._read_page, url, params)
+            report.merge(page_report)
+            yield from rows
+            # The link already carries the query
+            url, params = metadata.get("@odata.nextLink"), None
+    
+    def _read_page(self, url: str, params: Optional[Dict]) -> Tuple[List[Tuple], Dict, ValidationReport]:
+        """Request one page and reduce its streamed records to compact rows"""
+        response = self._request(url, params)
+        report = ValidationReport()
+        try:
+            page = ODataPageReader(response.iter_content(chunk_size=self.CHUNK_SIZE, decode_unicode=True))
+            rows = list(self.iter_compact(iter_valid_records("who", page, WHO_REQUIRED_FIELDS, report)))
+            return rows, page.metadata, report
+        finally:
+            response.close()
+    
+    def _request(self, url: str, params: Optional[Dict]) -> requests.Response:
+        response = self.session.get(url, params=params, stream=True, timeout=request_timeout())
+        response.raise_for_status()
+        if response.encoding is None:
+            response.encoding = 'utf-8'
+        return response
+    
+    def iter_compact(self, records: Iterable[Dict]) -> Iterator[Tuple[str, int, float, Optional[float], Optional[float]]]:
+        """
+        Reduce GHO records to (region, year, value, low, high) tuples
+        
+        Breakdown rows (per sex, area, ...) are skipped in favour of totals.
+        """
+        for record in records:
+            if any((record.get(dim) or '') not in self.GHO_TOTAL_CODES for dim in ('Dim1', 'Dim2', 'Dim3')):
+                continue
+            year = str(record["TimeDim"])[:4]
+            if not year.isdigit():
+                continue
+            yield (str(record["SpatialDim"]).upper(), int(year), record["NumericValue"],
+                   record.get("Low"), record.get("High"))
+    
+    def _mock_frame(self,
+                    series: Dict[str, Tuple[str, str]],
+                    start_year: int,
+                    end_year: int,
+                    regions: List[str]) -> IndicatorFrame:
+        """Sample series shaped like an API answer, with the same year filter applied"""
+        builder = FrameBuilder()
+        for code, (group, name) in series.items():
+            for region in regions:
+                for year, point in self.MOCK_SERIES.get(code, {}).items():
+                    if not start_year <= int(year) <= end_year:
+                        continue
+                    if isinstance(point, dict):
+                        low, high = point["confidence_interval"]
+                        builder.append('WHO', group, name, region, int(year), point["rate"], low, high)
+                    else:
+                        builder.append('WHO', group, name, region, int(year), point)
+        return builder.build()
+    
+    @staticmethod
+    def _shape(plan: Dict[str, Dict[str, Dict[str, str]]], series_for) -> Dict:
+        """
+        Lay series out as {topic: {group: {name: series}}} for "health" and
+        {group: {name: series}} for a single group, dropping empty series
+        """
+        data = {}
+        for topic, groups in plan.items():
+            nested = {}
+            for group, codes in groups.items():
+                values = {name: series_for(group, name, code) for name, code in codes.items()}
+                values = {name: series for name, series in values.items() if series}
+                if values:
+                    nested[group] = values
+            if not nested:
+                continue
+            data[topic] = nested if topic == "health" else nested[topic]
+        return data
 
-    def validate_data(self, data: Dict) -> Dict:
+    def to_frame(self, data: Dict, region: str = "GHA") -> IndicatorFrame:
+        """Normalize fetched data into a columnar IndicatorFrame"""
+        return from_who(data, region)
+    
+    def from_frame(self, frame: IndicatorFrame) -> Dict:
+        """Rebuild this tool's payload shape from stored observations"""
+        return to_nested(frame)
+    
+    def stored_series(self, topics: List[str], indicators: Optional[List[str]] = None) -> Dict[str, List[Tuple[str, str]]]:
+        """
+        Stored (topic, indicator) keys a request for each topic reads
+        
+        Returns:
+            {topic: [(group, name)]}, as observations are stored per group
+        """
+        return {
+            topic: [(group, name) for group, codes in groups.items() for name in codes]
+            for topic, groups in self.plan_series(topics, indicators).items()
+        }
+    
+    def validate_data(self, data: Dict, report: Optional[ValidationReport] = None) -> Dict:
         """Validate and clean fetched data"""
+        report = report if report is not None else ValidationReport()
         validated_data = {}
         for topic, topic_data in data.items():
-            if "error" in topic_data:
-                continue
-                
             # WHO-specific data structure validation
-            if "value" in topic_data and "dimension" in topic_data:
-                validated_data[topic] = self._validate_who_structure(topic_data)
+            if isinstance(topic_data, dict) and "value" in topic_data and "dimension" in topic_data:
+                validated_data[topic] = self._validate_who_structure(topic_data, report)
             else:
-                validated_data[topic] = {
-                    k: v for k, v in topic_data.items()
-                    if v is not None and self._validate_data_point(k, v)
-                }
+                validated_data.update(validate_payload({topic: topic_data}, report))
         
         return validated_data
     
-    def _validate_who_structure(self, data: Dict) -> Dict:
-        """Validate WHO's specific data structure"""
+    def _validate_who_structure(self, data: Dict, report: Optional[ValidationReport] = None) -> Dict:
+        """
+        Validate WHO's specific data structure
+        
+        "value" may be a list or a streamed iterator, of plain numbers or
+        GHO records; it is consumed once and only valid entries are kept.
+        """
+        report = report if report is not None else ValidationReport()
         try:
+            values = []
+            for value in data["value"]:
+                if value is None:
+                    report.reject("who.value")
+                elif isinstance(value, dict):
+                    values.extend(iter_valid_records("who", [value], WHO_REQUIRED_FIELDS, report))
+                else:
+                    report.accepted += 1
+                    values.append(value)
             return {
-                "values": [v for v in data["value"] if v is not None],
+                "values": values,
                 "dimensions": {
-                    dim: values for dim, values in data["dimension"].items()
-                    if all(self._validate_data_point(str(i), v) for i, v in enumerate(values))
+                    dim: dim_values for dim, dim_values in data["dimension"].items()
+                    if is_valid_value(dim_values)
                 }
             }
         except Exception as e:
             self.logger.error(f"WHO data structure validation error: {str(e)}")
             return {}
-    
-    def _validate_data_point(self, key: str, value: any) -> bool:
-        """Validate individual data points"""
-        try:
-            if isinstance(value, (int, float)):
-                return True
-            elif isinstance(value, str):
-                return bool(value.strip())
-            elif isinstance(value, dict):
-                return all(self._validate_data_point(k, v) for k, v in value.items())
-            elif isinstance(value, list):
-                return all(self._validate_data_point(str(i), v) for i, v in enumerate(value))
-            return False
-        except Exception as e:
-            self.logger.error(f"Validation error for {key}: {str(e)}")
-            return False
@@ -1,9 +1,23 @@
 import requests
-from typing import Dict, List, Optional
-from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import math
+import threading
 from flask import current_app
-from src.models import DataSource, db
+from src.models import DataSource, Observation, db
+from src.utils.circuit_breaker import get_breaker
+from src.utils.http import get_session, request_timeout
+from src.utils.helpers import parse_regions, parse_year_range, select_series, year_ranges
+from src.utils.indicator_frame import IndicatorFrame, from_worldbank, to_worldbank
+from src.tools.observation_store import load_observations, offline_mode, store_observations
+from src.tools.validation import (
+    ValidationReport,
+    WORLDBANK_REQUIRED_FIELDS,
+    iter_valid_records,
+    validate_payload
+)
 
 class WorldBankTool:
     """World Bank Data API Tool for fetching development indicators"""
@@ -17,8 +31,58 @@ class WorldBankTool:
         "nutrition": "/country/{country}/indicator/SH.STA.STNT.ZS"    # Stunting
     }
     
+    # World Development Indicators codes behind the supported indicators;
+    # a topic's endpoint code is what it fetches when no indicator is named
+    INDICATOR_CODES = {
+        "education": {
+            "primary_enrollment_rate": "SE.PRM.ENRR",
+            "secondary_enrollment_rate": "SE.SEC.ENRR",
+            "completion_rate": "SE.PRM.CMPT.ZS",
+            "literacy_rate": "SE.ADT.LITR.ZS"
+        },
+        "health": {
+            "maternal_mortality": "SH.STA.MMRT",
+            "child_mortality": "SH.DYN.MORT",
+            "healthcare_access": "SH.MED.PHYS.ZS",
+            "health_expenditure": "SH.XPD.CHEX.GD.ZS"
+        },
+        "poverty": {
+            "poverty_headcount": "SI.POV.NAHC",
+            "poverty_gap": "SI.POV.GAPS",
+            "gini_index": "SI.POV.GINI",
+            "income_share": "SI.DST.FRST.20"
+        },
+        "sanitation": {
+            "basic_sanitation": "SH.STA.BASS.ZS",
+            "improved_water_source": "SH.H2O.BASW.ZS",
+            "handwashing_facilities": "SH.STA.HYGN.ZS",
+            "open_defecation": "SH.STA.ODFC.ZS"
+        },
+        "nutrition": {
+            "stunting_prevalence": "SH.STA.STNT.ZS",
+            "wasting_prevalence": "SH.STA.WAST.ZS",
+            "obesity_prevalence": "SH.STA.OWGH.ZS",
+            "food_insecurity": "SN.ITK.MSFI.ZS"
+        }
+    }
+    PER_PAGE = 1000
+    
+    # Missing-year gaps up to this size are fetched as one range
+    DELTA_MERGE_GAP = 2
+    
+    # Batching limits for ';'-separated country and indicator lists
+    WDI_SOURCE_ID = 2
+    MAX_BATCH_COUNTRIES = 50
+    MAX_BATCH_INDICATORS = 60
+    
+    # Shared pool that downloads the next page while the current one is consumed
+    _prefetch_executor = None
+    _prefetch_lock = threading.Lock()
+    
     def __init__(self):
         self.logger = logging.getLogger(__name__)
+        self.session = get_session('WORLDBANK')
+        self.breaker = get_breaker('WORLDBANK')
         self._init_data_source()
     
     def _init_data_source(self):
@@ -30,49 +94,23 @@ class WorldBankTool:
                 type='WORLDBANK',
                 url=self.BASE_URL,
                 status='active',
-                metadata={
+                source_metadata={
                     'endpoints': self.ENDPOINTS,
                     'supported_indicators': self._get_supported_indicators()
                 }
             )
             db.session.add(source)
             db.session.commit()
-        self.data_source = source
+        self.data_source_id = source.id
+    
+    @property
+    def data_source(self) -> DataSource:
+        """Data source row bound to the current session"""
+        return db.session.get(DataSource, self.data_source_id)
 
     def _get_supported_indicators(self) -> Dict[str, List[str]]:
         """Get supported indicators for each endpoint"""
-        return {
-            "education": [
-                "primary_enrollment_rate",
-                "secondary_enrollment_rate",
-                "completion_rate",
-                "literacy_rate"
-            ],
-            "health": [
-                "maternal_mortality",
-                "child_mortality",
-                "healthcare_access",
-                "health_expenditure"
-            ],
-            "poverty": [
-                "poverty_headcount",
-                "poverty_gap",
-                "gini_index",
-                "income_share"
-            ],
-            "sanitation": [
-                "basic_sanitation",
-                "improved_water_source",
-                "handwashing_facilities",
-                "open_defecation"
-            ],
-            "nutrition": [
-                "stunting_prevalence",
-                "wasting_prevalence",
-                "obesity_prevalence",
-                "food_insecurity"
-            ]
-        }
+        return {topic: list(codes) for topic, codes in self.INDICATOR_CODES.items()}
 
     def fetch_data(self, 
                   topics: List[str], 
@@ -85,100 +123,346 @@ class WorldBankTool:
         
         Args:
             topics: List of topics to fetch
-            region: Country code (default: GHA for Ghana)
+            region: Country code or ';'-separated list (default: GHA for Ghana)
             start_date: Start date for data range (YYYY)
             end_date: End date for data range (YYYY)
-            indicators: Specific indicators to fetch
+            indicators: Specific indicators to fetch, by name or WDI code
+                (default: each topic's endpoint indicator)
         """
-        if not self.data_source.status == 'active':
-            raise Exception("World Bank data source is currently inactive")
-
         data = {}
+        supported_topics = []
         for topic in topics:
             if topic not in self.ENDPOINTS:
                 self.logger.warning(f"Unsupported topic: {topic}")
                 continue
-                
+            supported_topics.append(topic)
+        
+        series = self.plan_series(supported_topics, indicators)
+        codes = [code for codes in series.values() for code in codes.values()]
+        
+        if offline_mode():
+            return self.from_frame(
+                load_observations('WORLDBANK', list(series), region, start_date, end_date, indicators=codes)
+            )
+        
+        # 'error' only reports the last refresh; it must not block the next one
+        if self.data_source.status == 'inactive':
+            raise Exception("World Bank data source is currently inactive")
+        
+        start_year, end_year = parse_year_range(self._year(start_date, '2023'), self._year(end_date, '2024'))
+        regions = parse_regions(region)
+        
+        # Cells fetched within the update cadence are reused; only the
+        # years that some requested series is missing go upstream
+        fresh = self._load_fresh(list(series), codes, regions, start_year, end_year)
+        checked = set(zip(fresh['indicator'].tolist(), fresh['region'].tolist(), fresh['year'].tolist()))
+        stored = to_worldbank(fresh.filter(fresh.valid_mask()))
+        
+        report = ValidationReport()
+        fetched = {}
+        calls = 0
+        for batch in self.plan_batches(supported_topics, regions, indicators):
+            topic_by_code = batch["indicators"]
+            for topic in topic_by_code.values():
+                data.setdefault(topic, list(stored.get(topic, [])))
+                fetched.setdefault(topic, [])
+            
             try:
-                endpoint = self.ENDPOINTS[topic].format(country=region)
-                url = f"{self.BASE_URL}{endpoint}"
-                params = {
-                    "format": "json",
-                    "per_page": 1000,
-                    "date": f"{start_date or '2023'}:{end_date or '2024'}",
-                    "source": indicators[0] if indicators else None
-                }
-                
-                response = requests.get(
-                    url,
-                    params={k: v for k, v in params.items() if v is not None},
-                    timeout=30
-                )
-                response.raise_for_status()
-                
-                # World Bank API returns a list where [0] is metadata and [1] is data
-                response_data = response.json()
-                if isinstance(response_data, list) and len(response_data) > 1:
-                    data[topic] = response_data[1]
-                else:
-                    data[topic] = response_data
+                for first, last in self.plan_delta(batch, start_year, end_year, checked):
+                    calls += 1
+                    url = (f"{self.BASE_URL}/country/{';'.join(batch['countries'])}"
+                           f"/indicator/{';'.join(topic_by_code)}")
+                    params = {
+                        "date": f"{first}:{last}",
+                        # Multi-indicator queries must name their source database
+                        "source": batch["source"] if len(topic_by_code) > 1 else None
+                    }
+                    
+                    # Validate each page while the next one is downloading, and
+                    # split the merged response back into per-topic lists.
+                    # Null-valued records are kept aside to mark their cells checked.
+                    records = iter_valid_records(
+                        "worldbank", self._tap(self.iter_records(url, params), topic_by_code, fetched),
+                        WORLDBANK_REQUIRED_FIELDS, report
+                    )
+                    for item in records:
+                        topic = topic_by_code.get(item["indicator"].get("id"))
+                        if topic is not None and isinstance(data[topic], list):
+                            data[topic].append(item)
                 
             except requests.exceptions.RequestException as e:
-                self.logger.error(f"Error fetching {topic} data from World Bank: {str(e)}")
-                data[topic] = {"error": str(e)}
+                self.logger.error(
+                    f"Error fetching {', '.join(topic_by_code.values())} data from World Bank: {str(e)}"
+                )
+                for topic in topic_by_code.values():
+                    data[topic] = {"error": str(e)}
+        
+        # A delta range spans every country of its batch, so it can refetch
+        # stored cells; the refetched record replaces the stored one
+        for topic, items in data.items():
+            if isinstance(items, list):
+                data[topic] = list({self._cell(item): item for item in items}.values())
         
-        # Update last fetch timestamp
-        self.data_source.last_fetch = datetime.utcnow()
-        self.data_source.metadata.update({"last_fetch_status": "success" if data else "partial"})
-        db.session.commit()
+        if report.rejected:
+            self.logger.debug(f"World Bank records rejected: {report.to_dict()['rejections']}")
         
+        if calls:
+            # Update last fetch timestamp
+            source = self.data_source
+            source.last_fetch = datetime.utcnow()
+            source.source_metadata = {
+                **(source.source_metadata or {}),
+                "last_fetch_status": "success" if data else "partial"
+            }
+            db.session.commit()
+            
+            store_observations(self.to_frame(fetched, region), self.logger, keep_missing=True)
         return data
+    
+    def _load_fresh(self,
+                    topics: List[str],
+                    codes: List[str],
+                    regions: List[str],
+                    start_year: int,
+                    end_year: int) -> IndicatorFrame:
+        """
+        Stored cells fetched within the source's update cadence
+        
+        The cadence is the source's "update_cadence" metadata, falling back
+        to OBSERVATION_MAX_AGE. If the source has not been fetched within it
+        at all, nothing stored can be fresh and the store is not queried.
+        """
+        if not topics or not current_app.config.get('OBSERVATION_STORE_ENABLED', True):
+            return IndicatorFrame.empty()
+        source = self.data_source
+        cadence = (source.source_metadata or {}).get('update_cadence') or \
+            current_app.config.get('OBSERVATION_MAX_AGE', 604800)
+        cutoff = datetime.utcnow() - timedelta(seconds=cadence)
+        if source.last_fetch is None or source.last_fetch < cutoff:
+            return IndicatorFrame.empty()
+        try:
+            return Observation.load_frame('WORLDBANK', topics, regions, start_year, end_year,
+                                          fetched_after=cutoff, indicators=codes)
+        except Exception as e:
+            self.logger.error(f"Observation store lookup failed: {str(e)}")
+            return IndicatorFrame.empty()
+    
+    def plan_delta(self,
+                   batch: Dict,
+                   start_year: int,
+                   end_year: int,
+                   checked: Set[Tuple[str, str, int]]) -> List[Tuple[int, int]]:
+        """
+        Year ranges a batch still has to fetch
+        
+        A year is needed when any of the batch's (indicator, country) series
+        has no checked cell for it. Nearby gaps are merged into one range.
+        
+        Returns:
+            Inclusive (first, last) year ranges, empty when everything is fresh
+        """
+        needed = [
+            year for year in range(start_year, end_year + 1)
+            if any((code, country, year) not in checked
+                   for code in batch["indicators"] for country in batch["countries"])
+        ]
+        return year_ranges(needed, self.DELTA_MERGE_GAP)
+    
+    @staticmethod
+    def _tap(records: Iterator[Dict], topic_by_code: Dict[str, str], fetched: Dict[str, List]) -> Iterator[Dict]:
+        """Pass records through, keeping every one (null values included) for the store"""
+        for item in records:
+            topic = topic_by_code.get((item.get("indicator") or {}).get("id"))
+            if topic is not None:
+                fetched[topic].append(item)
+            yield item
 
-    def validate_data(self, data: Dict) -> Dict:
-        """Validate and clean fetched data"""
-        validated_data = {}
-        for topic, topic_data in data.items():
-            if "error" in topic_data:
-                continue
-                
-            if isinstance(topic_data, list):
-                # World Bank specific data structure
-                validated_data[topic] = [
-                    item for item in topic_data
-                    if self._validate_worldbank_item(item)
-                ]
-            else:
-                validated_data[topic] = {
-                    k: v for k, v in topic_data.items()
-                    if v is not None and self._validate_data_point(k, v)
-                }
+    def plan_series(self, topics: List[str], indicators: Optional[List[str]] = None) -> Dict[str, Dict[str, str]]:
+        """
+        Indicator codes to request for each topic
         
-        return validated_data
+        Named indicators are resolved through INDICATOR_CODES; without any,
+        each topic fetches its endpoint indicator only.
+        
+        Returns:
+            {topic: {name: code}}
+        """
+        if indicators:
+            return select_series(self.INDICATOR_CODES, topics, indicators)
+        series = {}
+        for topic in topics:
+            code = self._indicator_code(topic)
+            names = [name for name, known in self.INDICATOR_CODES.get(topic, {}).items() if known == code]
+            series[topic] = {names[0] if names else topic: code}
+        return series
     
-    def _validate_worldbank_item(self, item: Dict) -> bool:
-        """Validate World Bank data item structure"""
-        required_fields = ['indicator', 'country', 'value', 'date']
+    def plan_batches(self,
+                     topics: List[str],
+                     regions: List[str],
+                     indicators: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Merge topic and region requests into as few upstream calls as possible
+        
+        Indicators from the same source database can share one call, as can
+        any number of countries, up to the API's list limits.
+        
+        Args:
+            topics: Supported topics to fetch
+            regions: Country codes to fetch
+            indicators: Indicator names or codes to narrow the topics to
+        Returns:
+            Batches of {"source", "countries", "indicators": {code: topic}}
+        """
+        # Every topic indicator lives in the World Development Indicators
+        # database, so they are all compatible and can share a call
+        topic_by_code = {}
+        for topic, series in self.plan_series(topics, indicators).items():
+            for code in series.values():
+                topic_by_code.setdefault(code, topic)
+        codes = list(topic_by_code)
+        
+        batches = []
+        for i in range(0, len(codes), self.MAX_BATCH_INDICATORS):
+            indicator_chunk = {code: topic_by_code[code] for code in codes[i:i + self.MAX_BATCH_INDICATORS]}
+            for j in range(0, len(regions), self.MAX_BATCH_COUNTRIES):
+                batches.append({
+                    "source": self.WDI_SOURCE_ID,
+                    "countries": regions[j:j + self.MAX_BATCH_COUNTRIES],
+                    "indicators": indicator_chunk
+                })
+        return batches
+    
+    @staticmethod
+    def _cell(item: Dict) -> Tuple[str, str, str]:
+        """(indicator, country, year) an item holds the value of"""
+        country = item.get("countryiso3code") or (item.get("country") or {}).get("id")
+        return (item["indicator"].get("id"), country, str(item.get("date")))
+    
+    def _indicator_code(self, topic: str) -> str:
+        """World Bank indicator code behind a topic endpoint"""
+        return self.ENDPOINTS[topic].rsplit('/', 1)[-1]
+    
+    def iter_records(self, url: str, params: Dict, prefetch: bool = True) -> Iterator[Dict]:
+        """
+        Lazily yield World Bank records across every page of a query
+        
+        Follows the paging metadata in response[0] ("pages", or "total" and
+        "per_page") so results are never truncated. At most the current page
+        and one prefetched page are held in memory.
+        
+        Args:
+            url: Indicator endpoint URL
+            params: Query parameters (format/page/per_page are managed here)
+            prefetch: Download the next page while the current one is consumed
+        """
+        page, pending = 1, None
+        meta, records = self._get_page(url, params, page)
         try:
-            return all(
-                field in item and item[field] is not None
-                for field in required_fields
+            while True:
+                pages = self._page_count(meta)
+                if page < pages:
+                    if prefetch:
+                        pending = self._get_prefetch_executor().submit(
+                            self._get_page, url, params, page + 1
+                        )
+                
+                yield from records
+                records = None
+                
+                if page >= pages:
+                    return
+                page += 1
+                if pending is not None:
+                    meta, records = pending.result()
+                    pending = None
+                else:
+                    meta, records = self._get_page(url, params, page)
+        finally:
+            if pending is not None:
+                pending.cancel()
+    
+    def _get_page(self, url: str, params: Dict, page: int) -> Tuple[Dict, List[Dict]]:
+        """Fetch one page and split it into paging metadata and records"""
+        response = self.breaker.call(
+            self._request,
+            url,
+            {
+                **{k: v for k, v in params.items() if v is not None},
+                "format": "json",
+                "page": page,
+                "per_page": self.PER_PAGE
+            }
+        )
+        
+        # World Bank API returns a list where [0] is metadata and [1] is data
+        response_data = response.json()
+        if not isinstance(response_data, list) or not response_data:
+            raise requests.exceptions.RequestException(
+                f"Unexpected World Bank response: {str(response_data)[:200]}"
             )
-        except Exception as e:
-            self.logger.error(f"World Bank item validation error: {str(e)}")
-            return False
+        meta = response_data[0] or {}
+        if "message" in meta:
+            raise requests.exceptions.RequestException(
+                f"World Bank API error: {meta['message']}"
+            )
+        records = response_data[1] if len(response_data) > 1 and response_data[1] else []
+        return meta, records
+    
+    def _request(self, url: str, params: Dict) -> requests.Response:
+        """Single GET; the breaker decides whether to retry it"""
+        response = self.session.get(url, params=params, timeout=request_timeout())
+        response.raise_for_status()
+        return response
     
-    def _validate_data_point(self, key: str, value: any) -> bool:
-        """Validate individual data points"""
+    def _page_count(self, meta: Dict) -> int:
+        """Number of pages from the paging metadata"""
         try:
-            if isinstance(value, (int, float)):
-                return True
-            elif isinstance(value, str):
-                return bool(value.strip())
-            elif isinstance(value, dict):
-                return all(self._validate_data_point(k, v) for k, v in value.items())
-            elif isinstance(value, list):
-                return all(self._validate_data_point(str(i), v) for i, v in enumerate(value))
-            return False
-        except Exception as e:
-            self.logger.error(f"Validation error for {key}: {str(e)}")
-            return False
+            if meta.get("pages") is not None:
+                return int(meta["pages"])
+            total = int(meta.get("total") or 0)
+            per_page = int(meta.get("per_page") or self.PER_PAGE)
+            return max(1, math.ceil(total / per_page))
+        except (TypeError, ValueError):
+            return 1
+    
+    @classmethod
+    def _get_prefetch_executor(cls) -> ThreadPoolExecutor:
+        """Thread pool used to prefetch pages"""
+        if cls._prefetch_executor is None:
+            with cls._prefetch_lock:
+                if cls._prefetch_executor is None:
+                    cls._prefetch_executor = ThreadPoolExecutor(
+                        max_workers=4,
+                        thread_name_prefix='worldbank-prefetch'
+                    )
+        return cls._prefetch_executor
+    
+    @staticmethod
+    def _year(value: Optional[str], default: str) -> str:
+        """Reduce an ISO date or year string to the YYYY the API expects"""
+        return str(value)[:4] if value else default
+    
+    def to_frame(self, data: Dict, region: str = "GHA") -> IndicatorFrame:
+        """Normalize fetched data into a columnar IndicatorFrame"""
+        return from_worldbank(data, region)
+    
+    def from_frame(self, frame: IndicatorFrame) -> Dict:
+        """Rebuild this tool's payload shape from stored observations"""
+        return to_worldbank(frame)
+    
+    def stored_series(self, topics: List[str], indicators: Optional[List[str]] = None) -> Dict[str, List[Tuple[str, str]]]:
+        """
+        Stored (topic, indicator) keys a request for each topic reads
+        
+        Returns:
+            {topic: [(topic, code)]}, as observations are stored by WDI code
+        """
+        supported = [topic for topic in topics if topic in self.ENDPOINTS]
+        return {
+            topic: [(topic, code) for code in codes.values()]
+            for topic, codes in self.plan_series(supported, indicators).items()
+        }
+    
+    def validate_data(self, data: Dict, report: Optional[ValidationReport] = None) -> Dict:
+        """Validate and clean fetched data"""
+        return validate_payload(data, report, WORLDBANK_REQUIRED_FIELDS)
@@ -0,0 +1,226 @@
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+import requests
+from flask import current_app, has_app_context
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of calling an upstream API whose circuit is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} circuit is open; retry in {retry_after:.0f} seconds")
+        self.name = name
+        self.retry_after = retry_after
+
+def is_upstream_failure(error: Exception) -> bool:
+    """
+    Whether an error says the upstream API itself is unhealthy
+
+    Connection errors, timeouts, 429 and 5xx responses count; malformed
+    queries and other client-side errors do not trip the circuit.
+    """
+    if isinstance(error, (requests.exceptions.ConnectionError,
+                          requests.exceptions.Timeout,
+                          requests.exceptions.ChunkedEncodingError)):
+        return True
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return False
+
+class CircuitBreaker:
+    """
+    Per-upstream circuit breaker with jittered exponential backoff retries
+
+    closed:    calls go through; consecutive upstream failures are counted
+    open:      calls fail fast with CircuitOpenError until reset_timeout passes
+    half_open: one trial call is let through; success closes the circuit,
+               failure opens it again
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self,
+                 name: str,
+                 failure_threshold: int = 5,
+                 reset_timeout: float = 60,
+                 max_retries: int = 2,
+                 backoff_base: float = 0.5,
+                 backoff_max: float = 8,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            name: Upstream this breaker guards (used in errors and stats)
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a trial call
+            max_retries: Retries per call while the circuit stays closed
+            backoff_base: First retry delay in seconds, doubled on every retry
+            backoff_max: Upper bound on a single retry delay
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._clock = clock
+        self._sleep = sleep
+        self._random = random.Random()
+        self._lock = threading.Lock()
+
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._stats = {
+            'calls': 0,
+            'successes': 0,
+            'failures': 0,
+            'retries': 0,
+            'rejected': 0,
+            'opened': 0
+        }
+
+    @property
+    def state(self) -> str:
+        """Current state, moving from open to half-open once the reset timeout has passed"""
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    def retry_after(self) -> float:
+        """Seconds until an open circuit lets a trial call through"""
+        with self._lock:
+            if self._current_state() != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (self._clock() - self._opened_at))
+
+    def allow_request(self) -> bool:
+        """Claim permission for one call; in half-open state only one caller gets it"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self._stats['rejected'] += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._stats['successes'] += 1
+            self._failures = 0
+            self._state = self.CLOSED
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._stats['failures'] += 1
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self._stats['opened'] += 1
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+                self._trial_in_flight = False
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Call fn through the breaker
+
+        Upstream failures are retried with exponential backoff and full
+        jitter for as long as the circuit stays closed; once it opens, or
+        for the single half-open trial, the error is raised immediately.
+
+        Raises:
+            CircuitOpenError: When the circuit is open
+        """
+        attempt = 0
+        while True:
+            if not self.allow_request():
+                raise CircuitOpenError(self.name, self.retry_after())
+            with self._lock:
+                self._stats['calls'] += 1
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if not is_upstream_failure(e):
+                    # The API answered; the request itself was wrong
+                    self.record_success()
+                    raise
+                self.record_failure()
+                if attempt >= self.max_retries or self.state != self.CLOSED:
+                    raise
+                with self._lock:
+                    self._stats['retries'] += 1
+                self._sleep(self.backoff_delay(attempt))
+                attempt += 1
+                continue
+            self.record_success()
+            return result
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Full-jitter delay before retry number attempt (0-based)"""
+        return self._random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def reset(self) -> None:
+        """Close the circuit and forget past failures"""
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def to_dict(self) -> Dict:
+        """State and counters for status endpoints"""
+        with self._lock:
+            state = self._current_state()
+            return {
+                'state': state,
+                'consecutive_failures': self._failures,
+                'retry_after': round(max(0.0, self.reset_timeout - (self._clock() - self._opened_at)), 1)
+                if state == self.OPEN else 0.0,
+                **self._stats
+            }
+
+# One breaker per upstream API, shared by every tool instance and thread
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def _breaker_settings() -> Dict:
+    """Read breaker settings from the app config"""
+    config = current_app.config if has_app_context() else {}
+    # With transport retries on, each call already repeats its request;
+    # retrying the call as well would multiply the attempts
+    transport_retries = config.get('HTTP_MAX_RETRIES', 0)
+    return {
+        'failure_threshold': config.get('CIRCUIT_FAILURE_THRESHOLD', 5),
+        'reset_timeout': config.get('CIRCUIT_RESET_TIMEOUT', 60),
+        'max_retries': 0 if transport_retries else config.get('CIRCUIT_MAX_RETRIES', 2),
+        'backoff_base': config.get('CIRCUIT_BACKOFF_BASE', 0.5),
+        'backoff_max': config.get('CIRCUIT_BACKOFF_MAX', 8)
+    }
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Get the shared breaker for an upstream API, creating it on first use"""
+    name = name.upper()
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name, **_breaker_settings())
+            _breakers[name] = breaker
+        return breaker
+
+def reset_breakers() -> None:
+    """Forget every breaker so the next lookup is built from the current config"""
+    with _breakers_lock:
+        _breakers.clear()
@@ -1,6 +1,10 @@
 from datetime import datetime
-from typing import Dict, Any
+from typing import AsyncIterator, Callable, Dict, Any, Iterable, Iterator, List, Optional, Tuple
+import asyncio
 import json
+import queue
+import threading
+from flask import current_app
 
 def format_datetime(dt: datetime) -> str:
     """Format datetime to ISO format"""
@@ -44,3 +48,111 @@ def parse_date_range(start: str, end: str = None) -> Dict:
         }
     except Exception as e:
         raise ValueError(f"Invalid date format: {str(e)}")
+
+def parse_year_range(start: Optional[str] = None,
+                     end: Optional[str] = None,
+                     default_start: int = 2023,
+                     default_end: int = 2024) -> Tuple[int, int]:
+    """Reduce ISO dates or year strings to an inclusive (start, end) year range"""
+    start_year = int(str(start)[:4]) if start else default_start
+    end_year = int(str(end)[:4]) if end else default_end
+    return start_year, max(start_year, end_year)
+
+def parse_regions(region: Any) -> List[str]:
+    """Split 'GHA;NGA', 'GHA,NGA' or a list into unique upper-case country codes"""
+    if isinstance(region, (list, tuple)):
+        parts = region
+    else:
+        parts = str(region or "GHA").replace(',', ';').split(';')
+    return list(dict.fromkeys(part.strip().upper() for part in parts if part and part.strip()))
+
+def year_ranges(years: Iterable[int], max_gap: int = 0) -> List[Tuple[int, int]]:
+    """
+    Collapse years into sorted inclusive (start, end) ranges
+    
+    Ranges separated by at most max_gap absent years are merged, trading a
+    few extra years for fewer requests.
+    """
+    ranges = []
+    for year in sorted(set(years)):
+        if ranges and year - ranges[-1][1] <= max_gap + 1:
+            ranges[-1] = (ranges[-1][0], year)
+        else:
+            ranges.append((year, year))
+    return ranges
+
+def select_series(catalog: Dict[str, Dict[str, str]],
+                  topics: Iterable[str],
+                  indicators: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, str]]:
+    """
+    Pick the series a request asks for from a {topic: {name: code}} catalog
+    
+    Indicators may be given by name or by upstream code. Without indicators
+    every series of the requested topics is selected; topics with nothing
+    selected are left out.
+    
+    Returns:
+        {topic: {name: code}} in request order
+    """
+    wanted = {indicator.strip() for indicator in indicators or [] if indicator and indicator.strip()}
+    selected = {}
+    for topic in topics:
+        series = {
+            name: code for name, code in catalog.get(topic, {}).items()
+            if not wanted or name in wanted or code in wanted
+        }
+        if series:
+            selected[topic] = series
+    return selected
+
+_extensions_lock = threading.Lock()
+
+def app_extension(name: str, factory: Callable[[], Any]) -> Any:
+    """Get an object shared app-wide through app.extensions, creating it once"""
+    extensions = current_app.extensions
+    if name not in extensions:
+        with _extensions_lock:
+            if name not in extensions:
+                extensions[name] = factory()
+    return extensions[name]
+
+_exhausted = object()
+
+class _Raised:
+    """Exception handed from the iterating thread to the consumer"""
+    def __init__(self, error: Exception):
+        self.error = error
+
+def iterate_in_thread(app, factory: Callable[[], AsyncIterator]) -> Iterator:
+    """
+    Consume an async iterator on its own thread and event loop, yielding its items here
+
+    Lets synchronous code such as a streamed Flask response relay an async
+    pipeline. factory is called on that thread inside an app context. The
+    thread runs the iterator to its end even if the consumer stops early,
+    so work it does after its last item (e.g. persisting) still happens.
+    Exceptions raised by the iterator are re-raised to the consumer.
+    """
+    items = queue.Queue()
+
+    def run():
+        async def drain():
+            async for item in factory():
+                items.put(item)
+
+        with app.app_context():
+            try:
+                asyncio.run(drain())
+            except Exception as e:
+                items.put(_Raised(e))
+            finally:
+                items.put(_exhausted)
+
+    threading.Thread(target=run, name='async-iterator', daemon=True).start()
+    while True:
+        item = items.get()
+        if item is _exhausted:
+            return
+        if isinstance(item, _Raised):
+            raise item.error
+        yield item
@@ -0,0 +1,76 @@
+import threading
+from typing import Dict, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from flask import current_app, has_app_context
+
+# One pooled session per upstream API, shared by every tool instance and thread
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+def _pool_settings() -> Dict:
+    """Read connection pool settings from the app config"""
+    config = current_app.config if has_app_context() else {}
+    return {
+        'pool_connections': config.get('HTTP_POOL_CONNECTIONS', 10),
+        'pool_maxsize': config.get('HTTP_POOL_MAXSIZE', 20),
+        'max_retries': config.get('HTTP_MAX_RETRIES', 3),
+        'backoff_factor': config.get('HTTP_BACKOFF_FACTOR', 0.5)
+    }
+
+def request_timeout() -> Tuple[float, float]:
+    """(connect, read) timeout for upstream calls from the app config"""
+    config = current_app.config if has_app_context() else {}
+    return (config.get('HTTP_CONNECT_TIMEOUT', 5), config.get('HTTP_READ_TIMEOUT', 30))
+
+def build_session(pool_connections: int = 10,
+                  pool_maxsize: int = 20,
+                  max_retries: int = 3,
+                  backoff_factor: float = 0.5) -> requests.Session:
+    """
+    Build a keep-alive session with a bounded connection pool
+
+    Args:
+        pool_connections: Number of per-host pools to keep
+        pool_maxsize: Maximum open connections per host
+        max_retries: Transport-level retries for idempotent requests
+        backoff_factor: Exponential backoff factor between retries
+    """
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=retry
+    )
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+    return session
+
+def get_session(name: str) -> requests.Session:
+    """Get the shared session for an upstream API, creating it on first use"""
+    with _sessions_lock:
+        session = _sessions.get(name)
+        if session is None:
+            session = build_session(**_pool_settings())
+            _sessions[name] = session
+        return session
+
+def close_sessions() -> None:
+    """Close all shared sessions and their pooled connections"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
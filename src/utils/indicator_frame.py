@@ -0,0 +1,245 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from collections import deque
+import math
+import numpy as np
+
+# String columns are stored as fixed-width unicode arrays, numeric ones as
+# contiguous int32/float64 arrays with NaN marking a missing value
+STRING_COLUMNS = ('source', 'topic', 'indicator', 'region')
+NUMERIC_COLUMNS = ('year', 'value', 'ci_low', 'ci_high')
+COLUMNS = STRING_COLUMNS + NUMERIC_COLUMNS
+
+class IndicatorFrame:
+    """Columnar, array-backed table of indicator observations"""
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        lengths = {len(columns[name]) for name in COLUMNS}
+        if len(lengths) > 1:
+            raise ValueError(f"Column lengths differ: {sorted(lengths)}")
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.columns['year'])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    @classmethod
+    def empty(cls) -> 'IndicatorFrame':
+        """Frame with no rows"""
+        return FrameBuilder().build()
+
+    @classmethod
+    def concat(cls, frames: Iterable['IndicatorFrame']) -> 'IndicatorFrame':
+        """Stack frames row-wise"""
+        frames = [frame for frame in frames if len(frame)]
+        if not frames:
+            return cls.empty()
+        return cls({
+            name: np.concatenate([frame.columns[name] for frame in frames])
+            for name in COLUMNS
+        })
+
+    def filter(self, mask: np.ndarray) -> 'IndicatorFrame':
+        """Rows where a boolean mask is set"""
+        return IndicatorFrame({name: column[mask] for name, column in self.columns.items()})
+
+    def valid_mask(self) -> np.ndarray:
+        """Rows with a finite value and a plausible year"""
+        return np.isfinite(self.columns['value']) & (self.columns['year'] > 0)
+
+    def series(self) -> Iterator[Tuple[Tuple[str, str, str, str], np.ndarray, np.ndarray]]:
+        """
+        Iterate over (source, topic, indicator, region) series
+
+        Yields:
+            The series key, its years and its values, sorted by year
+        """
+        if not len(self):
+            return
+        keys = [self.columns[name] for name in STRING_COLUMNS]
+        order = np.lexsort([self.columns['year']] + keys[::-1])
+        sorted_keys = [key[order] for key in keys]
+
+        # A new series starts wherever any key column changes
+        change = np.zeros(len(order), dtype=bool)
+        change[0] = True
+        for key in sorted_keys:
+            change[1:] |= key[1:] != key[:-1]
+        starts = np.flatnonzero(change)
+        ends = np.append(starts[1:], len(order))
+
+        years = self.columns['year'][order]
+        values = self.columns['value'][order]
+        for start, end in zip(starts, ends):
+            key = tuple(str(column[start]) for column in sorted_keys)
+            yield key, years[start:end], values[start:end]
+
+    def to_records(self) -> List[Dict]:
+        """Row-oriented view with None for missing numbers"""
+        records = []
+        for i in range(len(self)):
+            record = {name: str(self.columns[name][i]) for name in STRING_COLUMNS}
+            record['year'] = int(self.columns['year'][i])
+            for name in ('value', 'ci_low', 'ci_high'):
+                number = float(self.columns[name][i])
+                record[name] = None if math.isnan(number) else number
+            records.append(record)
+        return records
+
+class FrameBuilder:
+    """Accumulate rows and materialize them as contiguous arrays once"""
+
+    def __init__(self):
+        self._rows = {name: [] for name in COLUMNS}
+
+    def __len__(self) -> int:
+        return len(self._rows['year'])
+
+    def append(self,
+               source: str,
+               topic: str,
+               indicator: str,
+               region: str,
+               year: int,
+               value: Optional[float],
+               ci_low: Optional[float] = None,
+               ci_high: Optional[float] = None) -> None:
+        """Add one observation"""
+        rows = self._rows
+        rows['source'].append(source)
+        rows['topic'].append(topic)
+        rows['indicator'].append(indicator)
+        rows['region'].append(region)
+        rows['year'].append(year)
+        rows['value'].append(_to_float(value))
+        rows['ci_low'].append(_to_float(ci_low))
+        rows['ci_high'].append(_to_float(ci_high))
+
+    def build(self) -> IndicatorFrame:
+        """Materialize the accumulated rows"""
+        columns = {name: np.array(self._rows[name], dtype=str) for name in STRING_COLUMNS}
+        columns['year'] = np.array(self._rows['year'], dtype=np.int32)
+        for name in ('value', 'ci_low', 'ci_high'):
+            columns[name] = np.array(self._rows[name], dtype=np.float64)
+        return IndicatorFrame(columns)
+
+def _to_float(value) -> float:
+    """Convert a number to float, mapping anything else to NaN"""
+    if isinstance(value, bool) or value is None:
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+def _parse_year(key) -> Optional[int]:
+    """Year from keys such as 2023, "2023" or "2023-Q1" """
+    text = str(key)
+    return int(text[:4]) if len(text) >= 4 and text[:4].isdigit() else None
+
+def _is_year_keyed(node: Dict) -> bool:
+    return bool(node) and all(_parse_year(key) is not None for key in node)
+
+def _append_year_series(builder: FrameBuilder, source: str, topic: str,
+                        indicator: str, region: str, node: Dict) -> None:
+    """Append a {year: value} or {year: {rate, confidence_interval}} series"""
+    for key, point in node.items():
+        ci_low = ci_high = None
+        if isinstance(point, dict):
+            interval = point.get('confidence_interval') or [None, None]
+            ci_low, ci_high = (list(interval) + [None, None])[:2]
+            point = point.get('rate', point.get('value'))
+        builder.append(source, topic, indicator, region, _parse_year(key), point, ci_low, ci_high)
+
+def from_nested(data: Dict, source: str, region: str = "GHA") -> IndicatorFrame:
+    """
+    Normalize year-keyed nested dicts (UNICEF and WHO tool output)
+
+    Walks topic -> [group ->] indicator -> {year: value}. The topic is the
+    innermost group above the indicator, so WHO's health -> immunization ->
+    dtp3_coverage becomes topic "immunization".
+    """
+    builder = FrameBuilder()
+    region = (data.get('metadata') or {}).get('region') or region
+
+    queue = deque((topic, topic, node) for topic, node in data.items()
+                  if topic != 'metadata' and isinstance(node, dict))
+    while queue:
+        topic, name, node = queue.popleft()
+        if _is_year_keyed(node):
+            _append_year_series(builder, source, topic, name, region, node)
+            continue
+        for key, child in node.items():
+            if isinstance(child, dict):
+                queue.append((name if _is_year_keyed(child) else key, key, child))
+
+    return builder.build()
+
+def from_unicef(data: Dict, region: str = "GHA") -> IndicatorFrame:
+    """Normalize UNICEFDataTool output"""
+    return from_nested(data, 'UNICEF', region)
+
+def from_who(data: Dict, region: str = "GHA") -> IndicatorFrame:
+    """Normalize WHODataTool output"""
+    return from_nested(data, 'WHO', region)
+
+def from_worldbank(data: Dict, region: str = "GHA") -> IndicatorFrame:
+    """Normalize WorldBankTool output ({topic: [World Bank items]})"""
+    builder = FrameBuilder()
+    for topic, items in data.items():
+        if not isinstance(items, list):
+            continue
+        for item in items:
+            year = _parse_year(item.get('date'))
+            if year is None:
+                continue
+            indicator = (item.get('indicator') or {}).get('id') or topic
+            country = item.get('countryiso3code') or (item.get('country') or {}).get('id') or region
+            builder.append('WORLDBANK', topic, indicator, country, year, item.get('value'))
+    return builder.build()
+
+def to_nested(frame: IndicatorFrame) -> Dict:
+    """
+    Rebuild {topic: {indicator: {year: value}}} from a frame
+
+    Points with a confidence interval become {"rate", "confidence_interval"}
+    like the WHO tool returns them.
+    """
+    data = {}
+    for record in frame.to_records():
+        if record['ci_low'] is not None or record['ci_high'] is not None:
+            point = {"rate": record['value'], "confidence_interval": [record['ci_low'], record['ci_high']]}
+        else:
+            point = record['value']
+        series = data.setdefault(record['topic'], {}).setdefault(record['indicator'], {})
+        series[str(record['year'])] = point
+    return data
+
+def to_worldbank(frame: IndicatorFrame) -> Dict:
+    """Rebuild {topic: [World Bank items]} from a frame"""
+    data = {}
+    for record in frame.to_records():
+        data.setdefault(record['topic'], []).append({
+            "indicator": {"id": record['indicator']},
+            "country": {"id": record['region']},
+            "countryiso3code": record['region'],
+            "date": str(record['year']),
+            "value": record['value']
+        })
+    return data
+
+NORMALIZERS = {
+    'unicef': from_unicef,
+    'who': from_who,
+    'worldbank': from_worldbank
+}
+
+def frame_from_sources(data: Dict, region: str = "GHA") -> IndicatorFrame:
+    """Normalize DataService.get_data output ({source: payload}) into one frame"""
+    frames = []
+    for source, payload in data.items():
+        normalizer = NORMALIZERS.get(source.lower())
+        if normalizer and isinstance(payload, dict) and 'error' not in payload:
+            frames.append(normalizer(payload, region))
+    return IndicatorFrame.concat(frames)
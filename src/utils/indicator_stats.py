@@ -0,0 +1,148 @@
+from typing import Dict, List, Optional
+import numpy as np
+from src.utils.indicator_frame import IndicatorFrame, frame_from_sources
+
+# Fewest shared years for a correlation, and the |r| reported as strong
+MIN_OVERLAP = 3
+STRONG_CORRELATION = 0.7
+
+def _number(value: float, digits: int = 4) -> Optional[float]:
+    return round(float(value), digits) if np.isfinite(value) else None
+
+def _year_ranges(years: np.ndarray) -> List[str]:
+    """Compress sorted years into ranges, e.g. [2000, 2001, 2002, 2005] -> ["2000-2002", "2005"]"""
+    if not len(years):
+        return []
+    breaks = np.flatnonzero(np.diff(years) != 1)
+    starts = np.append(years[0], years[breaks + 1])
+    ends = np.append(years[breaks], years[-1])
+    return [str(start) if start == end else f"{start}-{end}" for start, end in zip(starts, ends)]
+
+def _labels(frame: IndicatorFrame) -> np.ndarray:
+    """source/topic/indicator for each row, with @region when the frame spans several"""
+    labels = np.char.add(np.char.add(np.char.add(frame['source'], '/'), np.char.add(frame['topic'], '/')), frame['indicator'])
+    if len(np.unique(frame['region'])) > 1:
+        labels = np.char.add(np.char.add(labels, '@'), frame['region'])
+    return labels
+
+def frame_statistics(frame: IndicatorFrame, min_overlap: int = MIN_OVERLAP) -> Dict:
+    """
+    Exact descriptive statistics for every series in a frame
+
+    Series are pivoted into an indicator x year matrix (NaN where a value
+    is missing) covering every year from the earliest to the latest
+    observation, and each statistic is computed for all indicators at once.
+
+    Returns:
+        {'years': [first, last],
+         'indicators': {label: {points, first_year, last_year, latest,
+                                yoy, yoy_pct, cagr, slope}},
+         'correlations': {'indicators', 'matrix', 'strong'},
+         'gaps': {label: missing year ranges}}
+    """
+    dated = frame.filter(frame['year'] > 0)
+    valid = np.isfinite(dated['value'])
+    if not valid.any():
+        return {'years': None, 'indicators': {}, 'correlations': {'indicators': [], 'matrix': [], 'strong': []},
+                'gaps': {str(label): ['all'] for label in np.unique(_labels(dated))}}
+
+    labels, rows = np.unique(_labels(dated), return_inverse=True)
+    years = np.arange(dated['year'][valid].min(), dated['year'][valid].max() + 1)
+    values = np.full((len(labels), len(years)), np.nan)
+    values[rows[valid], dated['year'][valid] - years[0]] = dated['value'][valid]
+
+    observed = np.isfinite(values)
+    points = observed.sum(axis=1)
+    index = np.arange(len(labels))
+    first = np.argmax(observed, axis=1)
+    last = len(years) - 1 - np.argmax(observed[:, ::-1], axis=1)
+    first_value, last_value = values[index, first], values[index, last]
+    span = (last - first).astype(float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Year-over-year changes, only between adjacent observed years
+        yoy = np.diff(values, axis=1)
+        yoy_pct = 100 * yoy / np.abs(values[:, :-1])
+        growing = (span > 0) & (first_value > 0) & (last_value > 0)
+        cagr = np.where(growing, (last_value / first_value) ** (1 / np.where(span > 0, span, 1)) - 1, np.nan)
+
+        # Least-squares slope over each series' own observations
+        x = np.where(observed, years.astype(float), 0.0)
+        x_mean = x.sum(axis=1) / points
+        y_mean = np.where(observed, values, 0.0).sum(axis=1) / points
+        dx = np.where(observed, years - x_mean[:, None], 0.0)
+        dy = np.where(observed, values - y_mean[:, None], 0.0)
+        sxx = (dx * dx).sum(axis=1)
+        slope = np.where(sxx > 0, (dx * dy).sum(axis=1) / np.where(sxx > 0, sxx, 1), np.nan)
+
+    indicators, gaps = {}, {}
+    for i, label in enumerate(labels.tolist()):
+        missing = years[~observed[i]]
+        if len(missing):
+            gaps[label] = _year_ranges(missing)
+        if not points[i]:
+            continue
+        changed = np.flatnonzero(np.isfinite(yoy[i]))
+        indicators[label] = {
+            'points': int(points[i]),
+            'first_year': int(years[first[i]]),
+            'last_year': int(years[last[i]]),
+            'latest': _number(last_value[i]),
+            'yoy': {str(years[j + 1]): _number(yoy[i, j]) for j in changed},
+            'yoy_pct': {str(years[j + 1]): _number(yoy_pct[i, j], 2) for j in changed},
+            'cagr': _number(cagr[i], 6),
+            'slope': _number(slope[i])
+        }
+    # Series that never had a value still count as gaps
+    for label in np.unique(_labels(dated.filter(~valid))).tolist():
+        if label not in indicators:
+            gaps[label] = ['all']
+
+    return {
+        'years': [int(years[0]), int(years[-1])],
+        'indicators': indicators,
+        'correlations': correlation_matrix(labels[points > 0], values[points > 0], min_overlap),
+        'gaps': gaps
+    }
+
+def correlation_matrix(labels: np.ndarray, values: np.ndarray, min_overlap: int = MIN_OVERLAP) -> Dict:
+    """
+    Pearson correlations between all rows of an indicator x year matrix
+
+    Each pair is correlated over the years both observed, computed for
+    every pair at once from masked sums; pairs sharing fewer than
+    min_overlap years, or constant over them, are None.
+
+    Returns:
+        {'indicators': labels, 'matrix': rows of r, 'strong': pairs with
+         |r| >= STRONG_CORRELATION, strongest first}
+    """
+    observed = np.isfinite(values).astype(float)
+    filled = np.where(observed > 0, values, 0.0)
+    n = observed @ observed.T
+    sum_x = filled @ observed.T
+    sum_xx = (filled * filled) @ observed.T
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = filled @ filled.T - sum_x * sum_x.T / n
+        var_x = sum_xx - sum_x ** 2 / n
+        r = cov / np.sqrt(var_x * var_x.T)
+    tolerance = 1e-12 * np.maximum(sum_xx, 1)
+    r[(n < min_overlap) | (var_x <= tolerance) | (var_x.T <= tolerance.T)] = np.nan
+    r = np.clip(r, -1, 1)
+
+    upper = np.triu(np.isfinite(r) & (np.abs(r) >= STRONG_CORRELATION), k=1)
+    pairs = np.argwhere(upper)
+    pairs = pairs[np.argsort(-np.abs(r[upper]), kind='stable')]
+    labels = labels.tolist()
+    return {
+        'indicators': labels,
+        'matrix': [[_number(value, 3) for value in row] for row in r],
+        'strong': [
+            {'a': labels[i], 'b': labels[j], 'r': _number(r[i, j], 3), 'years': int(n[i, j])}
+            for i, j in pairs
+        ]
+    }
+
+def compute_statistics(data: Dict, region: str = "GHA", min_overlap: int = MIN_OVERLAP) -> Dict:
+    """Statistics for DataService.get_data output ({source: payload})"""
+    return frame_statistics(frame_from_sources(data, region), min_overlap)